@@ -0,0 +1,277 @@
+"""Concurrent end-to-end load generator.
+
+Drives `save`, `get`, `filter().all()`, `update` and `insert` through the
+ODM with 1 to 1000 concurrent coroutines, and reports the p50/p95/p99
+latency and the throughput of each operation at each concurrency level::
+
+    # throwaway mongod (from $PATH or --mongod), removed on exit
+    python -m benchmarks.load --concurrency 1 10 100 1000 > load.json
+
+    # existing server, sizing the Motor pool
+    python -m benchmarks.load --uri mongodb://localhost:27017 \\
+        --connect-option maxPoolSize=50 --connect-option waitQueueTimeoutMS=500
+
+    # in-process stand-in, measures the ODM overhead only
+    python -m benchmarks.load --backend memory
+
+`--connect-option` values are passed to `connect()` as is (parsed as JSON
+when possible), so any Motor pool setting can be compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Type
+
+import aiomongoengine
+from aiomongoengine import connect
+from aiomongoengine import disconnect
+from aiomongoengine import Document
+
+from .schemas import make_document
+from .schemas import make_values
+
+DATABASE_NAME = 'aiomongoengine_load'
+MONGOD_START_TIMEOUT = 30
+
+OPERATIONS = ('insert', 'save', 'get', 'filter_all', 'update')
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def throwaway_mongod(binary: str = 'mongod') -> Iterator[str]:
+    """ Start a mongod on a temporary dbpath, yield its uri. """
+    from pymongo import MongoClient
+    from pymongo.errors import ServerSelectionTimeoutError
+
+    dbpath = tempfile.mkdtemp(prefix='aiomongoengine-load-')
+    port = _free_port()
+    process = subprocess.Popen(
+        [binary, '--dbpath', dbpath, '--port', str(port),
+         '--bind_ip', '127.0.0.1', '--nounixsocket', '--quiet'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    uri = f'mongodb://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + MONGOD_START_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{binary} exited with {process.returncode}")
+            try:
+                MongoClient(uri, serverSelectionTimeoutMS=500) \
+                    .admin.command('ping')
+                break
+            except ServerSelectionTimeoutError:
+                if time.monotonic() > deadline:
+                    raise
+        yield uri
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(dbpath, ignore_errors=True)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """ Nearest-rank percentile of already sorted values. """
+    if not sorted_values:
+        return 0.0
+    index = max(0, int(round(p / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class Workload(object):
+    """ The timed operations, on a `n_fields` wide benchmark Document. """
+
+    def __init__(self, n_fields: int, seed_docs: int):
+        self.n_fields = n_fields
+        self.seed_docs = seed_docs
+        self.document = make_document(n_fields)  # type: Type[Document]
+        self.docs = []  # type: List[Document]
+
+    def new(self) -> Document:
+        values = make_values(self.n_fields)
+        values['field_1'] = random.randrange(self.seed_docs)
+        return self.document(**values)
+
+    async def setup(self):
+        await self.document.drop_collection()
+        # filter_all() is a range query on field_1
+        await self.document._get_collection().create_index('field_1')
+        self.docs = [self.new() for _ in range(self.seed_docs)]
+        await self.document.objects.insert(self.docs)
+
+    def operation(self, name: str) -> Callable[[], Awaitable]:
+        return getattr(self, name)
+
+    async def insert(self):
+        await self.document.objects.insert(self.new())
+
+    async def save(self):
+        doc = random.choice(self.docs)
+        doc.field_1 = random.randrange(self.seed_docs)
+        await doc.save()
+
+    async def get(self):
+        await self.document.objects.get(id=random.choice(self.docs).id)
+
+    async def filter_all(self):
+        await self.document.objects \
+            .filter(field_1__gte=random.randrange(self.seed_docs)) \
+            .limit(20).all()
+
+    async def update(self):
+        await self.document.objects \
+            .filter(id=random.choice(self.docs).id) \
+            .update(set__field_1=random.randrange(self.seed_docs))
+
+
+async def drive(operation: Callable[[], Awaitable], concurrency: int,
+                total: int) -> dict:
+    """ Run `total` operations with `concurrency` coroutines. """
+    latencies = []  # type: List[float]
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                await operation()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'operations': total,
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'ops_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1e3,
+        'p95_ms': percentile(latencies, 95) * 1e3,
+        'p99_ms': percentile(latencies, 99) * 1e3,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1e3,
+    }
+
+
+async def run(workload: Workload, operations: List[str],
+              levels: List[int], total: int) -> List[dict]:
+    await workload.setup()
+    results = []
+    for concurrency in levels:
+        for name in operations:
+            result = {'operation': name, 'concurrency': concurrency}
+            result.update(await drive(workload.operation(name), concurrency,
+                                      total))
+            results.append(result)
+            print(f"{name} x{concurrency}: {result['ops_per_sec']:.0f} ops/s "
+                  f"p99={result['p99_ms']:.2f}ms", file=sys.stderr)
+    return results
+
+
+def _parse_option(option: str) -> Dict[str, object]:
+    key, _, value = option.partition('=')
+    try:
+        return {key: json.loads(value)}
+    except ValueError:
+        return {key: value}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--backend', choices=('motor', 'memory'),
+                        default='motor')
+    parser.add_argument('--uri', help="existing server, instead of starting "
+                                      "a throwaway mongod")
+    parser.add_argument('--mongod', default=os.environ.get('MONGOD', 'mongod'),
+                        help="mongod binary (default: %(default)s)")
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 10, 100, 1000],
+                        help="coroutines per run (default: %(default)s)")
+    parser.add_argument('--operations', default=','.join(OPERATIONS),
+                        help="comma separated operations to run")
+    parser.add_argument('--requests', type=int, default=2000,
+                        help="operations per run (default: %(default)s)")
+    parser.add_argument('--fields', type=int, default=10,
+                        help="benchmark schema size (default: %(default)s)")
+    parser.add_argument('--seed-docs', type=int, default=1000,
+                        help="documents inserted before the runs")
+    parser.add_argument('--connect-option', action='append', default=[],
+                        metavar='KEY=VALUE',
+                        help="extra connect() keyword, eg. maxPoolSize=100")
+    args = parser.parse_args(argv)
+
+    operations = args.operations.split(',')
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+    if not all(1 <= level <= 1000 for level in args.concurrency):
+        parser.error("--concurrency must be between 1 and 1000")
+
+    connect_options = {}
+    for option in args.connect_option:
+        connect_options.update(_parse_option(option))
+
+    with _server(args) as uri:
+        if args.backend == 'memory':
+            connect(DATABASE_NAME, backend='memory', **connect_options)
+        else:
+            connect(DATABASE_NAME, host=uri, **connect_options)
+        try:
+            workload = Workload(args.fields, args.seed_docs)
+            results = asyncio.get_event_loop().run_until_complete(
+                run(workload, operations, args.concurrency, args.requests))
+        finally:
+            disconnect()
+
+    json.dump({
+        'version': aiomongoengine.__version__,
+        'python': platform.python_version(),
+        'backend': args.backend,
+        'connect_options': connect_options,
+        'fields': args.fields,
+        'results': results,
+    }, sys.stdout, indent=2, default=str)
+    sys.stdout.write('\n')
+
+
+@contextmanager
+def _server(args) -> Iterator[str]:
+    if args.backend == 'memory' or args.uri:
+        yield args.uri
+    else:
+        with throwaway_mongod(args.mongod) as uri:
+            yield uri
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""Micro-benchmarks of the ODM hot paths, no database needed.
+
+Run from the repository root::
+
+    python -m benchmarks.micro > results.json
+    python -m benchmarks.micro --fields 50 --bench to_son,from_son
+    python -m benchmarks.micro --compare results.json
+
+Every benchmark runs on the 10/50/200 fields schemas of
+:mod:`benchmarks.schemas`. Timings are taken with `time.perf_counter` (via
+`timeit`), the best of `--repeat` runs being the reference. Allocations are
+measured on a separate call with `tracemalloc`: `peak_bytes` is the memory
+allocated at the peak of one call, `retained_bytes` the size of what the
+call returns.
+
+The JSON written on stdout can be given back with `--compare` to report the
+change of each benchmark against a previous run.
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import aiomongoengine
+from aiomongoengine import Document
+from aiomongoengine import Q
+from aiomongoengine.backends.memory import MemoryClient
+from aiomongoengine.query_builder.field_list import QueryFieldList
+from aiomongoengine.query_builder.transform import transform_query
+from aiomongoengine.queryset.queryset import QuerySet
+
+from .schemas import field_names
+from .schemas import make_attrs
+from .schemas import make_document
+from .schemas import make_values
+from .schemas import SCHEMA_SIZES
+
+BENCHMARKS = {}  # type: Dict[str, Callable[[int], Callable[[], object]]]
+
+
+def benchmark(func):
+    """ Register a benchmark, `func(n_fields)` returns the callable to time. """
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def _query(n_fields: int) -> dict:
+    # field_0 is a StringField, field_1 an IntField, field_2 a FloatField,
+    # field_5 a ListField(IntField()), see schemas.FIELD_KINDS
+    query = {
+        'field_0__icontains': 'value',
+        'field_1__gt': 3,
+        'field_2__lte': 10.5,
+        'field_5__in': [1, 2, 3],
+    }
+    if n_fields > 8:
+        query['field_8'] = 'value 8'
+    return query
+
+
+@benchmark
+def from_son(n_fields: int):
+    document = make_document(n_fields)
+    son = document(**make_values(n_fields)).to_son()
+    return lambda: document.from_son(son)
+
+
+@benchmark
+def to_son(n_fields: int):
+    doc = make_document(n_fields)(**make_values(n_fields))
+    return doc.to_son
+
+
+@benchmark
+def validate(n_fields: int):
+    doc = make_document(n_fields)(**make_values(n_fields))
+    return doc.validate
+
+
+@benchmark
+def transform(n_fields: int):
+    document = make_document(n_fields)
+    query = _query(n_fields)
+    return lambda: transform_query(document, **query)
+
+
+@benchmark
+def q_to_query(n_fields: int):
+    document = make_document(n_fields)
+    q = Q()
+    for i, (key, value) in enumerate(_query(n_fields).items()):
+        q = q | Q(**{key: value}) if i % 2 else q & Q(**{key: value})
+    return lambda: q.to_query(document)
+
+
+@benchmark
+def field_list_add(n_fields: int):
+    names = field_names(n_fields)
+    half = n_fields // 2
+
+    def combine():
+        fields = QueryFieldList(names[:half], value=QueryFieldList.ONLY,
+                                _only_called=True)
+        fields += QueryFieldList(names[half:], value=QueryFieldList.ONLY,
+                                 _only_called=True)
+        fields += QueryFieldList(names[:half // 2],
+                                 value=QueryFieldList.EXCLUDE)
+        return fields
+
+    return combine
+
+
+@benchmark
+def queryset_clone(n_fields: int):
+    document = make_document(n_fields)
+    collection = MemoryClient()['benchmarks'][document.__collection__]
+    queryset = QuerySet(document, collection) \
+        .filter(**_query(n_fields)) \
+        .only(*field_names(n_fields)[:5]) \
+        .order_by('-field_1') \
+        .limit(10)
+    return queryset.clone
+
+
+@benchmark
+def metaclass_new(n_fields: int):
+    attrs = make_attrs(n_fields)
+    name = f'Bench{n_fields}Class'
+    return lambda: type(name, (Document,), dict(attrs))
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    timings = [t / number for t in timer.repeat(repeat, number)]
+    best = min(timings)
+    mean = sum(timings) / len(timings)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = func()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        'number': number,
+        'repeat': repeat,
+        'best_us': best * 1e6,
+        'mean_us': mean * 1e6,
+        'ops_per_sec': 1 / best,
+        'peak_bytes': peak - before,
+        'retained_bytes': after - before,
+    }
+
+
+def run(benchmarks: List[str], sizes: List[int], repeat: int) -> List[dict]:
+    results = []
+    for name in benchmarks:
+        for n_fields in sizes:
+            result = {'name': name, 'fields': n_fields}
+            result.update(measure(BENCHMARKS[name](n_fields), repeat))
+            results.append(result)
+            print(f"{name}[{n_fields}]: {result['best_us']:.2f}us",
+                  file=sys.stderr)
+    return results
+
+
+def compare(results: List[dict], baseline: dict):
+    """ Add the change of `best_us` against `baseline` to `results`. """
+    previous = {(r['name'], r['fields']): r for r in baseline['results']}
+    for result in results:
+        before = previous.get((result['name'], result['fields']))
+        if before is None:
+            continue
+        result['baseline_best_us'] = before['best_us']
+        result['change'] = result['best_us'] / before['best_us'] - 1
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--fields', type=int, nargs='+',
+                        default=list(SCHEMA_SIZES),
+                        help="schema sizes to run (default: %(default)s)")
+    parser.add_argument('--bench', default=','.join(BENCHMARKS),
+                        help="comma separated benchmarks to run")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="timed runs per benchmark (default: 5)")
+    parser.add_argument('--compare', metavar='JSON',
+                        help="previous output to compare against")
+    args = parser.parse_args(argv)
+
+    names = args.bench.split(',')
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = run(names, args.fields, args.repeat)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+    json.dump({
+        'version': aiomongoengine.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.utcnow().isoformat(),
+        'results': results,
+    }, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
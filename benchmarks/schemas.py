@@ -0,0 +1,71 @@
+"""Synthetic Document schemas shared by the benchmarks.
+
+`make_document(n)` builds a Document class with `n` fields cycling through
+scalar, list and embedded document fields, so the cost of the ODM layer can
+be compared across schema widths.
+"""
+from datetime import datetime
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Type
+
+from aiomongoengine import Document
+from aiomongoengine import fields
+
+SCHEMA_SIZES = (10, 50, 200)
+
+
+class Address(Document):
+    meta = {'abstract': True}
+
+    street = fields.StringField()
+    city = fields.StringField()
+    zip_code = fields.IntField()
+    tags = fields.ListField(fields.StringField())
+
+
+def _address(i: int) -> Address:
+    return Address(street=f'{i} Main street', city='Springfield',
+                   zip_code=10000 + i, tags=['home', 'billing'])
+
+
+# (field factory, value factory) pairs, cycled over the schema fields
+FIELD_KINDS = (
+    (fields.StringField, lambda i: f'value {i}'),
+    (fields.IntField, lambda i: i),
+    (fields.FloatField, lambda i: i / 3),
+    (fields.BooleanField, lambda i: bool(i % 2)),
+    (fields.DateTimeField, lambda i: datetime(2020, 1, 1 + i % 28)),
+    (lambda: fields.ListField(fields.IntField()),
+     lambda i: list(range(i % 10))),
+    (lambda: fields.EmbeddedDocumentField(Address), _address),
+    (lambda: fields.ListField(fields.EmbeddedDocumentField(Address)),
+     lambda i: [_address(i), _address(i + 1)]),
+)  # type: Tuple[Tuple[Callable, Callable], ...]
+
+
+def field_names(n_fields: int) -> List[str]:
+    return [f'field_{i}' for i in range(n_fields)]
+
+
+def make_attrs(n_fields: int) -> Dict[str, fields.BaseField]:
+    """ Class attributes of a `n_fields` wide Document. """
+    return {
+        name: FIELD_KINDS[i % len(FIELD_KINDS)][0]()
+        for i, name in enumerate(field_names(n_fields))
+    }
+
+
+def make_document(n_fields: int) -> Type[Document]:
+    """ Build (and register) the `n_fields` wide benchmark Document. """
+    return type(f'Bench{n_fields}', (Document,), make_attrs(n_fields))
+
+
+def make_values(n_fields: int) -> dict:
+    """ Keyword arguments of a fully populated `n_fields` wide Document. """
+    return {
+        name: FIELD_KINDS[i % len(FIELD_KINDS)][1](i)
+        for i, name in enumerate(field_names(n_fields))
+    }
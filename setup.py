@@ -35,6 +35,7 @@ setup(
         "arrow>=0.15.1",
         "pymongo>=3.10,<4",
         "typing-extensions",
+        "contextvars; python_version < '3.7'",
     ],
     extras_require={
         'dev': ['pytest', 'coverage', 'pytest-asyncio', 'autopep8']
@@ -2,9 +2,16 @@ from .connection import connect
 from .connection import disconnect
 from .connection import get_collection_list
 from .connection import get_collections
+from .counters import close_counters
+from .counters import CounterAggregator
 from .document import Document
 from .fields import *
+from .indexes import ensure_all_indexes
+from .indexes import index_usage_report
+from .profiling import Profiler
 from .query_builder.node import Q
 from .query_builder.node import QNot
+from .replication import start_replication
+from .replication import stop_replication
 
 __version__ = "0.0.1.dev3"
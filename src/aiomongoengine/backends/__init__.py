@@ -0,0 +1 @@
+from .memory import MemoryClient
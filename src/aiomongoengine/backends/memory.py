@@ -0,0 +1,1500 @@
+"""In-process stand-in for motor, selected with `connect(..., backend='memory')`.
+
+It implements the subset of `AsyncIOMotorClient`, `AsyncIOMotorDatabase`,
+`AsyncIOMotorCollection` and `AsyncIOMotorCursor` used by aiomongoengine, so
+tests and benchmarks can run without a mongod and measure the ORM's own
+overhead. Data lives in the client instance and is lost on `disconnect()`.
+
+Queries are evaluated with :func:`~aiomongoengine.query_builder.predicate.
+compile_query`, and equality lookups on the first field of an index are
+answered from that index. Transactions are emulated by a snapshot of the
+client's data, restored on abort; they are not isolated from the writes of
+other tasks. Change streams are not supported.
+"""
+from collections import defaultdict
+from copy import copy
+from copy import deepcopy
+from datetime import datetime
+from itertools import count
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Pattern
+from typing import Tuple
+from typing import Union
+
+from bson import BSON
+from bson import json_util
+from bson import ObjectId
+from bson import SON
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+from pymongo import ASCENDING
+from pymongo import IndexModel
+from pymongo import ReadPreference
+from pymongo import ReturnDocument
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError
+from pymongo.errors import DuplicateKeyError
+from pymongo.errors import OperationFailure
+from pymongo.errors import WriteError
+from pymongo.operations import DeleteMany
+from pymongo.operations import DeleteOne
+from pymongo.operations import InsertOne
+from pymongo.operations import ReplaceOne
+from pymongo.operations import UpdateMany
+from pymongo.operations import UpdateOne
+from pymongo.read_concern import ReadConcern
+from pymongo.results import BulkWriteResult
+from pymongo.results import DeleteResult
+from pymongo.results import InsertManyResult
+from pymongo.results import InsertOneResult
+from pymongo.results import UpdateResult
+
+from ..query_builder.predicate import compile_query
+from ..utils import bson_sort_key
+from ..utils import sort_son_documents
+
+__all__ = ('MemoryClient', 'MemoryDatabase', 'MemoryCollection',
+           'MemoryCursor', 'MemoryCommandCursor', 'MemorySession')
+
+_MISSING = object()
+
+
+def _hkey(value):
+    """ Hashable key of a BSON value, equal for values MongoDB finds equal. """
+    if isinstance(value, (dict, list)):
+        return '__bson__', json_util.dumps(value, sort_keys=True)
+    if isinstance(value, bool):
+        return '__bool__', value
+    return value
+
+
+def _copy(doc: dict) -> dict:
+    return deepcopy(doc)
+
+
+def _get_path(doc, parts: List[str]):
+    value = doc
+    for part in parts:
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            index = int(part)
+            value = value[index] if index < len(value) else _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(doc, parts: List[str], value):
+    target = doc
+    for i, part in enumerate(parts[:-1]):
+        if isinstance(target, list):
+            index = int(part)
+            while len(target) <= index:
+                target.append(None)
+            if not isinstance(target[index], (dict, list)):
+                target[index] = {}
+            target = target[index]
+        else:
+            child = target.get(part)
+            if not isinstance(child, (dict, list)):
+                child = target[part] = {}
+            target = child
+    last = parts[-1]
+    if isinstance(target, list):
+        index = int(last)
+        while len(target) <= index:
+            target.append(None)
+        target[index] = value
+    else:
+        target[last] = value
+
+
+def _unset_path(doc, parts: List[str]):
+    target = _get_path(doc, parts[:-1]) if len(parts) > 1 else doc
+    last = parts[-1]
+    if isinstance(target, dict):
+        target.pop(last, None)
+    elif isinstance(target, list) and last.isdigit() and int(last) < len(target):
+        target[int(last)] = None
+
+
+def _lookup_values(doc, path: str) -> list:
+    """ Values of `path`, traversing arrays, used by indexes and distinct. """
+    values = [doc]
+    for part in path.split('.'):
+        next_values = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    next_values.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    next_values.append(value[int(part)])
+                next_values.extend(v[part] for v in value
+                                   if isinstance(v, dict) and part in v)
+        values = next_values
+    return values
+
+
+def _eval(expression, doc):
+    """ Evaluate an aggregation expression (field paths and literals). """
+    if isinstance(expression, str) and expression.startswith('$'):
+        value = _get_path(doc, expression[1:].split('.'))
+        if value is _MISSING:
+            values = _lookup_values(doc, expression[1:])
+            return values if values else None
+        return value
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            op, arg = next(iter(expression.items()))
+            if op == '$literal':
+                return arg
+            if op in _EXPRESSION_OPERATORS:
+                return _EXPRESSION_OPERATORS[op](
+                    [_eval(a, doc) for a in (arg if isinstance(arg, list) else [arg])])
+        return {k: _eval(v, doc) for k, v in expression.items()}
+    if isinstance(expression, list):
+        return [_eval(v, doc) for v in expression]
+    return expression
+
+
+def _sum(values):
+    total = 0
+    for value in values:
+        if isinstance(value, list):
+            total += _sum(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total += value
+    return total
+
+
+def _product(values):
+    total = 1
+    for value in values:
+        total *= value
+    return total
+
+
+_EXPRESSION_OPERATORS = {
+    '$add': _sum,
+    '$sum': _sum,
+    '$multiply': _product,
+    '$subtract': lambda values: values[0] - values[1],
+    '$size': lambda values: len(values[0] or []),
+    '$toLower': lambda values: (values[0] or '').lower(),
+    '$toUpper': lambda values: (values[0] or '').upper(),
+}
+
+
+def _project(doc: dict, projection: Union[dict, list, None]) -> dict:
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+
+    include_id = projection.get('_id', 1)
+    fields = {k: v for k, v in projection.items() if k != '_id'}
+    inclusion = any(
+        (v and not isinstance(v, dict)) or
+        (isinstance(v, dict) and '$slice' not in v and '$meta' not in v)
+        for v in fields.values()
+    ) or (not fields and include_id)
+
+    if inclusion:
+        result = {}
+        for field, value in fields.items():
+            if isinstance(value, dict) and '$meta' in value:
+                continue
+            found = _get_path(doc, field.split('.'))
+            if found is not _MISSING:
+                _set_path(result, field.split('.'), found)
+    else:
+        result = _copy(doc)
+        for field, value in fields.items():
+            if not value:
+                _unset_path(result, field.split('.'))
+
+    for field, value in fields.items():
+        if isinstance(value, dict) and '$slice' in value:
+            found = _get_path(doc if inclusion else result, field.split('.'))
+            if isinstance(found, list):
+                _set_path(result, field.split('.'), _slice(found, value['$slice']))
+
+    if not include_id:
+        result.pop('_id', None)
+    elif '_id' in doc:
+        result = {'_id': doc['_id'], **result}
+    return result
+
+
+def _slice(values: list, spec) -> list:
+    if isinstance(spec, list):
+        skip, limit = spec
+        return values[skip:skip + limit] if skip >= 0 else \
+            values[skip:][:limit]
+    return values[:spec] if spec >= 0 else values[spec:]
+
+
+def _ordering(sort) -> List[Tuple[str, int]]:
+    if not sort:
+        return []
+    if isinstance(sort, dict):
+        return list(sort.items())
+    if isinstance(sort, str):
+        return [(sort, ASCENDING)]
+    return [(key, direction) for key, direction in sort]
+
+
+class _Index(object):
+    """ An index definition, with a lookup table on its first field. """
+
+    def __init__(self, name: str, keys: List[Tuple[str, Any]], **options):
+        self.name = name
+        self.keys = keys
+        self.fields = [field for field, _ in keys]
+        self.unique = options.get('unique', False)
+        self.sparse = options.get('sparse', False)
+        self.options = options
+        self.entries = defaultdict(set)  # type: Dict[Any, set]
+        self.ops = 0
+        self.since = datetime.utcnow()
+
+    @property
+    def lookup_field(self) -> str:
+        return self.fields[0]
+
+    @property
+    def usable(self) -> bool:
+        return self.keys[0][1] not in ('text', '2d', '2dsphere')
+
+    def document(self) -> dict:
+        doc = {'v': 2, 'key': SON(self.keys), 'name': self.name}
+        doc.update(self.options)
+        return doc
+
+    def values(self, doc: dict) -> list:
+        values = _lookup_values(doc, self.lookup_field)
+        keys = []
+        for value in values:
+            keys.append(_hkey(value))
+            if isinstance(value, list):
+                keys.extend(_hkey(v) for v in value)
+        return keys or [None]
+
+    def add(self, key, doc: dict):
+        for value in self.values(doc):
+            self.entries[value].add(key)
+
+    def remove(self, key, doc: dict):
+        for value in self.values(doc):
+            keys = self.entries.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.entries[value]
+
+    def unique_key(self, doc: dict):
+        values = [_lookup_values(doc, field) for field in self.fields]
+        if self.sparse and not any(values):
+            return _MISSING
+        return tuple(_hkey(v[0] if len(v) == 1 else (v or None))
+                     for v in values)
+
+
+class MemoryCursor(object):
+    """ Stand-in for `AsyncIOMotorCursor`. """
+
+    def __init__(self, collection: 'MemoryCollection', filter=None,
+                 projection=None, sort=None, skip=0, limit=0, **kwargs):
+        self.collection = collection
+        self._filter = filter or {}
+        self._projection = projection
+        self._sort = _ordering(sort)
+        self._skip = skip or 0
+        self._limit = limit or 0
+        self._hint = None
+        self._comment = None
+        self._batch_size = None
+        self._results = None
+        self._position = 0
+
+    def sort(self, key_or_list, direction=None):
+        if direction is not None:
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = _ordering(key_or_list)
+        return self
+
+    def limit(self, limit):
+        self._limit = limit or 0
+        return self
+
+    def skip(self, skip):
+        self._skip = skip or 0
+        return self
+
+    def hint(self, index):
+        self._hint = index
+        return self
+
+    def collation(self, collation):
+        return self
+
+    def batch_size(self, batch_size):
+        self._batch_size = batch_size
+        return self
+
+    def comment(self, comment):
+        self._comment = comment
+        return self
+
+    def max_time_ms(self, max_time_ms):
+        return self
+
+    def where(self, code):
+        raise NotImplementedError("$where is not supported by the memory backend")
+
+    def clone(self) -> 'MemoryCursor':
+        cursor = MemoryCursor(self.collection, self._filter, self._projection,
+                              self._sort, self._skip, self._limit)
+        cursor._hint = self._hint
+        cursor._comment = self._comment
+        cursor._batch_size = self._batch_size
+        return cursor
+
+    def rewind(self):
+        self._results = None
+        self._position = 0
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self._results is None or self._position < len(self._results)
+
+    def _execute(self) -> List[dict]:
+        if self._results is None:
+            docs, _ = self.collection._find(
+                self._filter, self._sort, self._skip, self._limit)
+            self._results = [_project(doc, self._projection) for doc in docs]
+        return self._results
+
+    async def to_list(self, length=None) -> List[dict]:
+        results = self._execute()
+        end = len(results) if length is None else self._position + length
+        docs = results[self._position:end]
+        self._position += len(docs)
+        return docs
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        results = self._execute()
+        if self._position >= len(results):
+            raise StopAsyncIteration
+        self._position += 1
+        return results[self._position - 1]
+
+    async def next(self) -> dict:
+        return await self.__anext__()
+
+    async def distinct(self, key: str) -> list:
+        return await self.collection.distinct(key, self._filter)
+
+    async def explain(self) -> dict:
+        return self.collection._explain(self._filter, self._sort, self._skip,
+                                        self._limit)
+
+
+class MemoryCommandCursor(MemoryCursor):
+    """ Stand-in for `AsyncIOMotorCommandCursor` (aggregate, list_indexes). """
+
+    def __init__(self, collection: 'MemoryCollection', docs: List[dict]):
+        super().__init__(collection)
+        self._results = docs
+
+
+class _Options(object):
+    """ The options of a database or collection, set by `with_options`. """
+
+    def __init__(self):
+        self.codec_options = DEFAULT_CODEC_OPTIONS
+        self.read_preference = ReadPreference.PRIMARY
+        self.write_concern = WriteConcern()
+        self.read_concern = ReadConcern()
+
+    def with_options(self, codec_options=None, read_preference=None,
+                     write_concern=None, read_concern=None):
+        """A view sharing the data, with other options. They are kept but,
+        with a single in-process node, don't change the reads and writes.
+        """
+        view = copy(self)
+        if codec_options is not None:
+            view.codec_options = codec_options
+        if read_preference is not None:
+            view.read_preference = read_preference
+        if write_concern is not None:
+            view.write_concern = write_concern
+        if read_concern is not None:
+            view.read_concern = read_concern
+        return view
+
+
+class MemoryCollection(_Options):
+    """ Stand-in for `AsyncIOMotorCollection`. """
+
+    def __init__(self, database: 'MemoryDatabase', name: str):
+        super().__init__()
+        self.database = database
+        self.name = name
+        self._docs = {}  # type: Dict[Any, dict]
+        self._seq = {}  # type: Dict[Any, int]
+        self._counter = count()
+        self._indexes = {'_id_': _Index('_id_', [('_id', 1)])}
+
+    @property
+    def full_name(self) -> str:
+        return f'{self.database.name}.{self.name}'
+
+    def __getitem__(self, name) -> 'MemoryCollection':
+        return self.database[f'{self.name}.{name}']
+
+    # Reads
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0,
+             **kwargs) -> MemoryCursor:
+        return MemoryCursor(self, filter, projection, sort, skip, limit)
+
+    async def find_one(self, filter=None, projection=None, sort=None,
+                       **kwargs) -> Union[dict, None]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        docs = await self.find(filter, projection, sort, limit=1).to_list(1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter, skip=0, limit=0, **kwargs) -> int:
+        docs, _ = self._find(filter, skip=skip or 0, limit=limit or 0,
+                             copy=False)
+        return len(docs)
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    async def distinct(self, key: str, filter=None, **kwargs) -> list:
+        docs, _ = self._find(filter, copy=False)
+        seen = {}
+        for doc in docs:
+            for value in _lookup_values(doc, key):
+                for item in (value if isinstance(value, list) else [value]):
+                    seen.setdefault(_hkey(item), item)
+        return list(seen.values())
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> MemoryCommandCursor:
+        return MemoryCommandCursor(self, self._aggregate(pipeline))
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure(
+            "The $changeStream stage is only supported on replica sets",
+            code=40573)
+
+    # Writes
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        document.setdefault('_id', ObjectId())
+        self._insert(document)
+        return InsertOneResult(document['_id'], True)
+
+    async def insert_many(self, documents: List[dict], ordered=True,
+                          **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        for doc in documents:
+            doc.setdefault('_id', ObjectId())
+        result = self._bulk_write([InsertOne(doc) for doc in documents],
+                                  ordered)
+        return InsertManyResult(
+            [doc['_id'] for doc in documents][:result['nInserted']]
+            if ordered else [doc['_id'] for doc in documents], True)
+
+    async def update_one(self, filter, update, upsert=False,
+                         array_filters=None, **kwargs) -> UpdateResult:
+        return UpdateResult(
+            self._update(filter, update, upsert, False, array_filters), True)
+
+    async def update_many(self, filter, update, upsert=False,
+                          array_filters=None, **kwargs) -> UpdateResult:
+        return UpdateResult(
+            self._update(filter, update, upsert, True, array_filters), True)
+
+    async def replace_one(self, filter, replacement, upsert=False,
+                          **kwargs) -> UpdateResult:
+        return UpdateResult(
+            self._update(filter, replacement, upsert, False, replace=True),
+            True)
+
+    async def delete_one(self, filter, **kwargs) -> DeleteResult:
+        return DeleteResult({'n': self._delete(filter, False), 'ok': 1.0},
+                            True)
+
+    async def delete_many(self, filter, **kwargs) -> DeleteResult:
+        return DeleteResult({'n': self._delete(filter, True), 'ok': 1.0},
+                            True)
+
+    async def find_one_and_update(self, filter, update, projection=None,
+                                  sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE,
+                                  array_filters=None, **kwargs):
+        docs, _ = self._find(filter, _ordering(sort), limit=1, copy=False)
+        if not docs:
+            if not upsert:
+                return None
+            result = self._update(filter, update, True, False, array_filters)
+            if return_document != ReturnDocument.AFTER:
+                return None
+            return _project(_copy(self._docs[_hkey(result['upserted'])]),
+                            projection)
+        before = _copy(docs[0])
+        self._update({'_id': before['_id']}, update, False, False,
+                     array_filters, query=filter)
+        if return_document == ReturnDocument.AFTER:
+            return _project(_copy(self._docs[_hkey(before['_id'])]),
+                            projection)
+        return _project(before, projection)
+
+    async def find_one_and_replace(self, filter, replacement, projection=None,
+                                   sort=None, upsert=False,
+                                   return_document=ReturnDocument.BEFORE,
+                                   **kwargs):
+        docs, _ = self._find(filter, _ordering(sort), limit=1, copy=False)
+        target = {'_id': docs[0]['_id']} if docs else filter
+        before = _copy(docs[0]) if docs else None
+        result = self._update(target, replacement, upsert, False, replace=True)
+        if return_document == ReturnDocument.AFTER:
+            _id = before['_id'] if before else result.get('upserted')
+            doc = self._docs.get(_hkey(_id))
+            return _project(_copy(doc), projection) if doc else None
+        return _project(before, projection) if before else None
+
+    async def find_one_and_delete(self, filter, projection=None, sort=None,
+                                  **kwargs):
+        docs, _ = self._find(filter, _ordering(sort), limit=1, copy=False)
+        if not docs:
+            return None
+        doc = _copy(docs[0])
+        self._delete({'_id': doc['_id']}, False)
+        return _project(doc, projection)
+
+    async def bulk_write(self, requests, ordered=True,
+                         **kwargs) -> BulkWriteResult:
+        return BulkWriteResult(self._bulk_write(list(requests), ordered), True)
+
+    # Indexes
+
+    async def create_indexes(self, indexes: List[IndexModel],
+                             **kwargs) -> List[str]:
+        names = []
+        for index in indexes:
+            document = dict(index.document)
+            keys = list(document.pop('key').items())
+            name = document.pop('name')
+            self._create_index(name, keys, **document)
+            names.append(name)
+        return names
+
+    async def create_index(self, keys, **kwargs) -> str:
+        model = IndexModel(keys, **kwargs)
+        return (await self.create_indexes([model]))[0]
+
+    def list_indexes(self, **kwargs) -> MemoryCommandCursor:
+        return MemoryCommandCursor(
+            self, [index.document() for index in self._indexes.values()])
+
+    async def index_information(self, **kwargs) -> dict:
+        info = {}
+        for index in self._indexes.values():
+            doc = index.document()
+            doc['key'] = list(doc['key'].items())
+            info[doc.pop('name')] = doc
+        return info
+
+    async def drop_index(self, index_or_name, **kwargs):
+        name = index_or_name
+        if not isinstance(name, str):
+            name = '_'.join(f'{k}_{v}' for k, v in _ordering(index_or_name))
+        if name == '_id_' or name not in self._indexes:
+            raise OperationFailure(f"index not found with name [{name}]",
+                                   code=27)
+        del self._indexes[name]
+
+    async def drop_indexes(self, **kwargs):
+        self._indexes = {'_id_': self._indexes['_id_']}
+
+    async def drop(self, **kwargs):
+        # Documents keep a reference to their collection, empty it in place
+        self._docs.clear()
+        self._seq.clear()
+        self._indexes = {'_id_': _Index('_id_', [('_id', 1)])}
+
+    # Engine
+
+    def _snapshot(self) -> Tuple[Dict[Any, dict], Dict[Any, int]]:
+        return deepcopy(self._docs), dict(self._seq)
+
+    def _restore(self, snapshot: Tuple[Dict[Any, dict], Dict[Any, int]]):
+        docs, seq = snapshot
+        self._docs.clear()
+        self._docs.update(docs)
+        self._seq.clear()
+        self._seq.update(seq)
+        for index in self._secondary_indexes():
+            index.entries.clear()
+            for key, doc in self._docs.items():
+                index.add(key, doc)
+
+    def _create_index(self, name, keys, **options):
+        existing = self._indexes.get(name)
+        if existing is not None:
+            if existing.keys != keys:
+                raise OperationFailure(
+                    f"Index with name: {name} already exists with a different "
+                    f"key", code=86)
+            return
+        index = _Index(name, keys, **options)
+        if index.unique:
+            seen = set()
+            for doc in self._docs.values():
+                key = index.unique_key(doc)
+                if key is _MISSING:
+                    continue
+                if key in seen:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: "
+                        f"{self.full_name} index: {name}", 11000)
+                seen.add(key)
+        for key, doc in self._docs.items():
+            index.add(key, doc)
+        self._indexes[name] = index
+
+    def _candidates(self, filter: dict):
+        """ Use an index for an equality on its first field, if any. """
+        for field, condition in _field_conditions(filter):
+            if isinstance(condition, dict) and condition and \
+                    all(k.startswith('$') for k in condition):
+                if '$eq' in condition:
+                    values = [condition['$eq']]
+                elif isinstance(condition.get('$in'), list) and not any(
+                        isinstance(v, (Pattern, Regex, dict)) for v in condition['$in']):
+                    values = condition['$in']
+                else:
+                    continue
+            elif isinstance(condition, (Pattern, Regex)):
+                continue
+            else:
+                values = [condition]
+
+            if field == '_id':
+                keys = {_hkey(v) for v in values}
+                return {k for k in keys if k in self._docs}, self._indexes['_id_']
+            for index in self._indexes.values():
+                if index.usable and index.lookup_field == field:
+                    keys = set()
+                    for value in values:
+                        keys |= index.entries.get(_hkey(value), set())
+                        if value is None:
+                            keys |= {k for k, doc in self._docs.items()
+                                     if not _lookup_values(doc, field)}
+                    return keys, index
+        return None, None
+
+    def _sort_index(self, sort):
+        if not sort:
+            return None
+        for index in self._indexes.values():
+            if index.usable and index.keys[:len(sort)] == sort:
+                return index
+        return None
+
+    def _find(self, filter=None, sort=None, skip=0, limit=0, copy=True,
+              _plan=None) -> Tuple[List[dict], dict]:
+        filter = filter or {}
+        sort = _ordering(sort)
+        candidates, index = self._candidates(filter)
+        if candidates is None:
+            keys = list(self._docs)
+        else:
+            keys = sorted(candidates, key=self._seq.__getitem__)
+        if index is not None:
+            index.ops += 1
+        elif self._sort_index(sort) is not None:
+            index = self._sort_index(sort)
+            index.ops += 1
+
+        match = compile_query(filter) if filter else None
+        docs = [self._docs[key] for key in keys
+                if match is None or match(self._docs[key])]
+        stats = {
+            'index': index,
+            'keys_examined': len(keys) if index is not None else 0,
+            'docs_examined': len(keys),
+        }
+        if sort:
+            docs = sort_son_documents(list(docs), sort)
+        docs = docs[skip:]
+        if limit:
+            docs = docs[:abs(limit)]
+        stats['returned'] = len(docs)
+        if copy:
+            docs = [_copy(doc) for doc in docs]
+        return docs, stats
+
+    def _explain(self, filter=None, sort=None, skip=0, limit=0) -> dict:
+        filter = filter or {}
+        sort = _ordering(sort)
+        _, stats = self._find(filter, sort, skip, limit, copy=False)
+        index = stats['index']
+        if index is None:
+            plan = {'stage': 'COLLSCAN', 'filter': filter,
+                    'direction': 'forward'}
+        elif index.name == '_id_' and [
+                field for field, _ in _field_conditions(filter)] == ['_id']:
+            plan = {'stage': 'IDHACK'}
+        else:
+            plan = {
+                'stage': 'FETCH',
+                'inputStage': {
+                    'stage': 'IXSCAN',
+                    'keyPattern': SON(index.keys),
+                    'indexName': index.name,
+                    'isMultiKey': False,
+                    'direction': 'forward',
+                }
+            }
+        if sort and (index is None or index.keys[:len(sort)] != sort):
+            plan = {'stage': 'SORT', 'sortPattern': SON(sort),
+                    'inputStage': plan}
+        if limit:
+            plan = {'stage': 'LIMIT', 'limitAmount': abs(limit),
+                    'inputStage': plan}
+        return {
+            'queryPlanner': {
+                'namespace': self.full_name,
+                'parsedQuery': filter,
+                'winningPlan': plan,
+                'rejectedPlans': [],
+            },
+            'executionStats': {
+                'executionSuccess': True,
+                'nReturned': stats['returned'],
+                'executionTimeMillis': 0,
+                'totalKeysExamined': stats['keys_examined'],
+                'totalDocsExamined': stats['docs_examined'],
+                'executionStages': plan,
+            },
+            'ok': 1.0,
+        }
+
+    def _check_unique(self, key, doc: dict, inserting: bool = False):
+        if inserting and key in self._docs:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} "
+                f"index: _id_ dup key: {{ _id: {doc['_id']!r} }}", 11000)
+        for index in self._secondary_indexes():
+            if not index.unique:
+                continue
+            value = index.unique_key(doc)
+            if value is _MISSING:
+                continue
+            candidates = set()
+            for entry in index.values(doc):
+                candidates |= index.entries.get(entry, set())
+            for other_key in candidates - {key}:
+                if index.unique_key(self._docs[other_key]) == value:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: "
+                        f"{self.full_name} index: {index.name} dup key: "
+                        f"{dict(zip(index.fields, value))!r}", 11000)
+
+    def _secondary_indexes(self) -> List[_Index]:
+        # `_id_` is served by `_docs` itself
+        return [index for name, index in self._indexes.items()
+                if name != '_id_']
+
+    def _insert(self, document: dict):
+        doc = BSON.encode(document).decode()
+        doc = {'_id': doc['_id'], **doc}
+        key = _hkey(doc['_id'])
+        self._check_unique(key, doc, inserting=True)
+        self._store(key, doc)
+
+    def _store(self, key, doc: dict):
+        self._docs[key] = doc
+        self._seq.setdefault(key, next(self._counter))
+        for index in self._secondary_indexes():
+            index.add(key, doc)
+
+    def _unstore(self, key) -> dict:
+        doc = self._docs.pop(key)
+        for index in self._secondary_indexes():
+            index.remove(key, doc)
+        return doc
+
+    def _update(self, filter, update, upsert, multi, array_filters=None,
+                replace=False, query=None) -> dict:
+        query = filter if query is None else query
+        docs, _ = self._find(filter, limit=0 if multi else 1, copy=False)
+        if not docs:
+            if not upsert:
+                return {'n': 0, 'nModified': 0, 'ok': 1.0,
+                        'updatedExisting': False}
+            doc = self._upsert_document(filter, update, replace,
+                                        array_filters)
+            self._insert(doc)
+            return {'n': 1, 'nModified': 0, 'ok': 1.0,
+                    'updatedExisting': False, 'upserted': doc['_id']}
+
+        modified = 0
+        for old in docs:
+            if replace:
+                new = dict(update)
+                new['_id'] = old['_id']
+            else:
+                new = _copy(old)
+                _apply_update(new, update, query, array_filters)
+            if new.get('_id', _MISSING) != old['_id']:
+                raise WriteError("Performing an update on the path '_id' "
+                                 "would modify the immutable field '_id'",
+                                 66)
+            if new == old:
+                continue
+            key = _hkey(old['_id'])
+            new = BSON.encode(new).decode()
+            self._check_unique(key, new)
+            self._unstore(key)
+            self._store(key, new)
+            modified += 1
+        return {'n': len(docs), 'nModified': modified, 'ok': 1.0,
+                'updatedExisting': True}
+
+    @staticmethod
+    def _upsert_document(filter, update, replace, array_filters) -> dict:
+        doc = {}
+        for key, value in (filter or {}).items():
+            if key.startswith('$'):
+                continue
+            if isinstance(value, dict) and any(k.startswith('$') for k in value):
+                if '$eq' in value:
+                    _set_path(doc, key.split('.'), value['$eq'])
+                continue
+            _set_path(doc, key.split('.'), value)
+        if replace:
+            doc = dict(update, **({'_id': doc['_id']} if '_id' in doc else {}))
+        else:
+            _apply_update(doc, update, filter, array_filters, is_insert=True)
+        doc.setdefault('_id', ObjectId())
+        return doc
+
+    def _delete(self, filter, multi) -> int:
+        docs, _ = self._find(filter, limit=0 if multi else 1, copy=False)
+        for doc in docs:
+            key = _hkey(doc['_id'])
+            self._unstore(key)
+            del self._seq[key]
+        return len(docs)
+
+    def _bulk_write(self, requests, ordered) -> dict:
+        result = {
+            'writeErrors': [], 'writeConcernErrors': [], 'nInserted': 0,
+            'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0,
+            'upserted': [],
+        }
+        for i, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    request._doc.setdefault('_id', ObjectId())
+                    self._insert(request._doc)
+                    result['nInserted'] += 1
+                    continue
+                if isinstance(request, (DeleteOne, DeleteMany)):
+                    result['nRemoved'] += self._delete(
+                        request._filter, isinstance(request, DeleteMany))
+                    continue
+                if isinstance(request, ReplaceOne):
+                    raw = self._update(request._filter, request._doc,
+                                       request._upsert, False, replace=True)
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    raw = self._update(request._filter, request._doc,
+                                       request._upsert,
+                                       isinstance(request, UpdateMany),
+                                       request._array_filters)
+                else:
+                    raise TypeError(f"{request!r} is not a valid request")
+                if 'upserted' in raw:
+                    result['nUpserted'] += 1
+                    result['upserted'].append(
+                        {'index': i, '_id': raw['upserted']})
+                else:
+                    result['nMatched'] += raw['n']
+                    result['nModified'] += raw['nModified']
+            except (DuplicateKeyError, WriteError) as e:
+                result['writeErrors'].append({
+                    'index': i, 'code': e.code or 2, 'errmsg': str(e),
+                    'op': getattr(request, '_doc', None) or
+                    getattr(request, '_filter', None),
+                })
+                if ordered:
+                    break
+        if result['writeErrors']:
+            raise BulkWriteError(result)
+        return result
+
+    def _aggregate(self, pipeline: List[dict]) -> List[dict]:
+        if pipeline and '$indexStats' in pipeline[0]:
+            docs = [{
+                'name': index.name,
+                'key': SON(index.keys),
+                'host': 'memory',
+                'accesses': {'ops': index.ops, 'since': index.since},
+                'spec': index.document(),
+            } for index in self._indexes.values()]
+            pipeline = pipeline[1:]
+        elif pipeline and '$match' in pipeline[0]:
+            docs, _ = self._find(pipeline[0]['$match'])
+            pipeline = pipeline[1:]
+        else:
+            docs = [_copy(doc) for doc in self._docs.values()]
+
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            handler = getattr(self, '_stage_' + name[1:], None)
+            if handler is None:
+                raise OperationFailure(
+                    f"Unrecognized pipeline stage name: '{name}'", code=40324)
+            docs = handler(docs, spec)
+        return docs
+
+    @staticmethod
+    def _stage_match(docs, spec):
+        match = compile_query(spec)
+        return [doc for doc in docs if match(doc)]
+
+    @staticmethod
+    def _stage_sort(docs, spec):
+        return sort_son_documents(docs, _ordering(spec))
+
+    @staticmethod
+    def _stage_skip(docs, spec):
+        return docs[spec:]
+
+    @staticmethod
+    def _stage_limit(docs, spec):
+        return docs[:spec]
+
+    @staticmethod
+    def _stage_count(docs, spec):
+        return [{spec: len(docs)}] if docs else []
+
+    @staticmethod
+    def _stage_project(docs, spec):
+        computed = {k: v for k, v in spec.items()
+                    if not isinstance(v, (int, bool)) and k != '_id'}
+        simple = {k: v for k, v in spec.items() if k not in computed}
+        result = []
+        for doc in docs:
+            projected = _project(doc, simple or {'_id': 1})
+            for key, expression in computed.items():
+                _set_path(projected, key.split('.'), _eval(expression, doc))
+            result.append(projected)
+        return result
+
+    @staticmethod
+    def _stage_addFields(docs, spec):
+        for doc in docs:
+            for key, expression in spec.items():
+                _set_path(doc, key.split('.'), _eval(expression, doc))
+        return docs
+
+    _stage_set = _stage_addFields
+
+    @staticmethod
+    def _stage_unset(docs, spec):
+        for doc in docs:
+            for key in ([spec] if isinstance(spec, str) else spec):
+                _unset_path(doc, key.split('.'))
+        return docs
+
+    @staticmethod
+    def _stage_unwind(docs, spec):
+        if isinstance(spec, str):
+            spec = {'path': spec}
+        parts = spec['path'][1:].split('.')
+        keep_empty = spec.get('preserveNullAndEmptyArrays', False)
+        result = []
+        for doc in docs:
+            values = _get_path(doc, parts)
+            if isinstance(values, list) and values:
+                for value in values:
+                    item = _copy(doc)
+                    _set_path(item, parts, value)
+                    result.append(item)
+            elif values not in (_MISSING, None) and not isinstance(values, list):
+                result.append(doc)
+            elif keep_empty:
+                result.append(doc)
+        return result
+
+    @staticmethod
+    def _stage_group(docs, spec):
+        spec = dict(spec)
+        id_expression = spec.pop('_id')
+        groups = {}
+        for doc in docs:
+            group_id = _eval(id_expression, doc)
+            groups.setdefault(_hkey(group_id), (group_id, []))[1].append(doc)
+
+        result = []
+        for group_id, group_docs in groups.values():
+            row = {'_id': group_id}
+            for field, accumulator in spec.items():
+                (op, expression), = accumulator.items()
+                values = [_eval(expression, doc) for doc in group_docs]
+                row[field] = _accumulate(op, values)
+            result.append(row)
+        return result
+
+    def _stage_lookup(self, docs, spec):
+        foreign = self.database[spec['from']]
+        for doc in docs:
+            local = _lookup_values(doc, spec['localField'])
+            local = {_hkey(v) for value in local
+                     for v in (value if isinstance(value, list) else [value])}
+            doc[spec['as']] = [
+                _copy(other) for other in foreign._docs.values()
+                if local & {_hkey(v) for v in
+                            _lookup_values(other, spec['foreignField'])}
+            ]
+        return docs
+
+
+def _accumulate(op: str, values: list):
+    numbers = [v for v in values
+               if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    present = [v for v in values if v is not None]
+    if op == '$sum':
+        return sum(numbers)
+    if op == '$avg':
+        return sum(numbers) / len(numbers) if numbers else None
+    if op == '$min':
+        return min(present, key=bson_sort_key) if present else None
+    if op == '$max':
+        return max(present, key=bson_sort_key) if present else None
+    if op == '$first':
+        return values[0] if values else None
+    if op == '$last':
+        return values[-1] if values else None
+    if op == '$push':
+        return values
+    if op == '$addToSet':
+        return list({_hkey(v): v for v in values}.values())
+    if op == '$count':
+        return len(values)
+    raise OperationFailure(f"unknown group operator '{op}'", code=15952)
+
+
+def _field_conditions(query: dict) -> List[Tuple[str, Any]]:
+    """The conditions of `query` on fields, with the ones of its ``$and``
+    operands like mongod's planner (filters compile to
+    ``{'$and': [{}, {...}]}``).
+    """
+    conditions = []
+    for key, value in (query or {}).items():
+        if key == '$and' and isinstance(value, list):
+            for operand in value:
+                conditions.extend(_field_conditions(operand))
+        elif not key.startswith('$'):
+            conditions.append((key, value))
+    return conditions
+
+
+def _positional_index(doc: dict, prefix: str, query: dict) -> int:
+    """ Index of the array element at `prefix` matched by `query` (`$`). """
+    conditions = []
+    for key, value in _field_conditions(query):
+        if key == prefix:
+            conditions.append({'e': value})
+        elif key.startswith(prefix + '.'):
+            conditions.append({'e' + key[len(prefix):]: value})
+    array = _get_path(doc, prefix.split('.'))
+    if conditions and isinstance(array, list):
+        match = compile_query({'$and': conditions})
+        for i, item in enumerate(array):
+            if match({'e': item}):
+                return i
+    raise WriteError("The positional operator did not find the match needed "
+                     "from the query.", 2)
+
+
+def _filter_matcher(identifier: str, array_filters: list):
+    for array_filter in array_filters or []:
+        conditions = {}
+        for key, value in array_filter.items():
+            if key == identifier:
+                conditions['e'] = value
+            elif key.startswith(identifier + '.'):
+                conditions['e' + key[len(identifier):]] = value
+        if conditions:
+            match = compile_query(conditions)
+            return lambda item: match({'e': item})
+    raise WriteError(f"No array filter found for identifier '{identifier}'",
+                     2)
+
+
+def _resolve_paths(doc: dict, path: str, query: dict,
+                   array_filters: list) -> List[List[str]]:
+    """ Concrete paths of `path`, resolving `$`, `$[]` and `$[<id>]`. """
+    paths = [[]]
+    for part in path.split('.'):
+        resolved = []
+        for prefix in paths:
+            if part == '$':
+                resolved.append(prefix + [str(
+                    _positional_index(doc, '.'.join(prefix), query))])
+            elif part.startswith('$['):
+                array = _get_path(doc, prefix)
+                if not isinstance(array, list):
+                    continue
+                if part == '$[]':
+                    match = None
+                else:
+                    match = _filter_matcher(part[2:-1], array_filters)
+                resolved.extend(prefix + [str(i)]
+                                for i, item in enumerate(array)
+                                if match is None or match(item))
+            else:
+                resolved.append(prefix + [part])
+        paths = resolved
+    return paths
+
+
+def _values_equal(a, b) -> bool:
+    return bson_sort_key(a) == bson_sort_key(b)
+
+
+def _pull_matcher(condition):
+    if isinstance(condition, dict) and condition:
+        if all(k.startswith('$') for k in condition):
+            match = compile_query({'e': condition})
+            return lambda item: match({'e': item})
+        match = compile_query(condition)
+        return lambda item: isinstance(item, dict) and match(item)
+    if isinstance(condition, (Pattern, Regex)):
+        match = compile_query({'e': condition})
+        return lambda item: match({'e': item})
+    return lambda item: _values_equal(item, condition)
+
+
+def _apply_update(doc: dict, update, query=None, array_filters=None,
+                  is_insert=False):
+    """ Apply an update document (or pipeline) to `doc` in place. """
+    if isinstance(update, list):
+        for stage in update:
+            (name, spec), = stage.items()
+            handler = getattr(MemoryCollection, '_stage_' + name[1:], None)
+            if handler is None or name in ('$group', '$lookup', '$match'):
+                raise OperationFailure(
+                    f"{name} is not allowed to be used within an update",
+                    code=72)
+            result = handler([doc], spec)
+            if result[0] is not doc:
+                doc.clear()
+                doc.update(result[0])
+        return
+
+    if update and not any(k.startswith('$') for k in update):
+        _id = doc.get('_id', _MISSING)
+        doc.clear()
+        doc.update(update)
+        if _id is not _MISSING:
+            doc['_id'] = _id
+        return
+
+    for op, fields in update.items():
+        if op == '$setOnInsert' and not is_insert:
+            continue
+        for path, value in fields.items():
+            for parts in _resolve_paths(doc, path, query, array_filters):
+                _apply_operator(doc, op, parts, value)
+
+
+def _apply_operator(doc: dict, op: str, parts: List[str], value):
+    current = _get_path(doc, parts)
+    if op in ('$set', '$setOnInsert'):
+        _set_path(doc, parts, value)
+    elif op == '$unset':
+        _unset_path(doc, parts)
+    elif op in ('$inc', '$mul'):
+        if current is _MISSING or current is None:
+            current = 0
+        if not isinstance(current, (int, float)) or isinstance(current, bool):
+            raise WriteError(f"Cannot apply {op} to a value of non-numeric "
+                             f"type", 14)
+        _set_path(doc, parts, current + value if op == '$inc'
+                  else current * value)
+    elif op in ('$min', '$max'):
+        if current is _MISSING or (
+                op == '$min' and bson_sort_key(value) < bson_sort_key(current)
+        ) or (
+                op == '$max' and bson_sort_key(value) > bson_sort_key(current)
+        ):
+            _set_path(doc, parts, value)
+    elif op == '$rename':
+        if current is not _MISSING:
+            _unset_path(doc, parts)
+            _set_path(doc, value.split('.'), current)
+    elif op == '$currentDate':
+        now = datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        if isinstance(value, dict) and value.get('$type') == 'timestamp':
+            _set_path(doc, parts, Timestamp(now, 1))
+        else:
+            _set_path(doc, parts, now)
+    elif op in ('$push', '$addToSet'):
+        if current is _MISSING or current is None:
+            current = []
+            _set_path(doc, parts, current)
+        if not isinstance(current, list):
+            raise WriteError(f"The field '{'.'.join(parts)}' must be an "
+                             f"array", 2)
+        if isinstance(value, dict) and '$each' in value:
+            items = list(value['$each'])
+        else:
+            items = [value]
+            value = {}
+        if op == '$addToSet':
+            for item in items:
+                if not any(_values_equal(item, v) for v in current):
+                    current.append(item)
+            return
+        position = value.get('$position')
+        if position is None:
+            current.extend(items)
+        else:
+            current[position:position] = items
+        if '$sort' in value:
+            spec = value['$sort']
+            if isinstance(spec, dict):
+                sort_son_documents(current, list(spec.items()))
+            else:
+                current.sort(key=bson_sort_key, reverse=spec == -1)
+        if '$slice' in value:
+            current[:] = _slice(current, value['$slice'])
+    elif op in ('$pull', '$pullAll'):
+        if not isinstance(current, list):
+            return
+        if op == '$pullAll':
+            current[:] = [item for item in current
+                          if not any(_values_equal(item, v) for v in value)]
+        else:
+            match = _pull_matcher(value)
+            current[:] = [item for item in current if not match(item)]
+    elif op == '$pop':
+        if isinstance(current, list) and current:
+            current.pop(0 if value == -1 else -1)
+    else:
+        raise WriteError(f"Unknown modifier: {op}", 9)
+
+
+class MemoryDatabase(_Options):
+    """ Stand-in for `AsyncIOMotorDatabase`. """
+
+    def __init__(self, client: 'MemoryClient', name: str):
+        super().__init__()
+        self.client = client
+        self.name = name
+        self._collections = {}  # type: Dict[str, MemoryCollection]
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return self[name].with_options(**kwargs) if kwargs else self[name]
+
+    async def list_collection_names(self, **kwargs) -> List[str]:
+        return list(self._collections)
+
+    async def drop_collection(self, name_or_collection, **kwargs):
+        name = getattr(name_or_collection, 'name', name_or_collection)
+        if name in self._collections:
+            await self._collections[name].drop()
+
+    async def command(self, command, value=1, **kwargs) -> dict:
+        if isinstance(command, str):
+            command = SON([(command, value)])
+        name, value = next(iter(command.items()))
+        if name in ('ping', 'ismaster', 'isMaster', 'hello', 'buildinfo',
+                    'buildInfo'):
+            return {'ok': 1.0, 'ismaster': True, 'version': '0.0.0-memory'}
+        if name == 'collStats':
+            return self._coll_stats(value)
+        if name == 'explain':
+            return self._explain(value)
+        if name == 'replSetGetStatus':
+            raise OperationFailure("not running with --replSet", code=76)
+        raise OperationFailure(f"no such command: '{name}'", code=59)
+
+    def _coll_stats(self, name: str) -> dict:
+        collection = self[name]
+        sizes = [len(BSON.encode(doc)) for doc in collection._docs.values()]
+        # Rough estimate, mongod uses prefix compressed btrees
+        index_sizes = {'_id_': 4096 + 32 * len(sizes)}
+        for index in collection._secondary_indexes():
+            index_sizes[index.name] = 4096 + 32 * sum(
+                len(keys) for keys in index.entries.values())
+        return {
+            'ns': collection.full_name,
+            'count': len(sizes),
+            'size': sum(sizes),
+            'avgObjSize': sum(sizes) // len(sizes) if sizes else 0,
+            'storageSize': sum(sizes),
+            'nindexes': len(index_sizes),
+            'totalIndexSize': sum(index_sizes.values()),
+            'indexSizes': index_sizes,
+            'ok': 1.0,
+        }
+
+    def _explain(self, command: dict) -> dict:
+        if 'find' in command:
+            return self[command['find']]._explain(
+                command.get('filter'), command.get('sort'),
+                command.get('skip', 0), command.get('limit', 0))
+        if 'aggregate' in command:
+            pipeline = command.get('pipeline') or []
+            match = pipeline[0]['$match'] if pipeline and \
+                '$match' in pipeline[0] else {}
+            sort = next((stage['$sort'] for stage in pipeline
+                         if '$sort' in stage), None)
+            return self[command['aggregate']]._explain(match, sort)
+        if 'count' in command:
+            return self[command['count']]._explain(command.get('query'))
+        for name in ('update', 'delete'):
+            if name in command:
+                statement = command[name + 's'][0]
+                return self[command[name]]._explain(statement['q'])
+        raise OperationFailure("Explain failed: unsupported command", code=2)
+
+
+class _MemoryTransaction(object):
+    """ Returned by `MemorySession.start_transaction()`. """
+
+    def __init__(self, session: 'MemorySession'):
+        self._session = session
+
+    async def __aenter__(self) -> '_MemoryTransaction':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if not self._session.in_transaction:
+            return
+        if exc_type is None:
+            await self._session.commit_transaction()
+        else:
+            await self._session.abort_transaction()
+
+
+class MemorySession(object):
+    """ Stand-in for `AsyncIOMotorClientSession`. """
+
+    def __init__(self, client: 'MemoryClient'):
+        self.client = client
+        self.has_ended = False
+        self._snapshot = None  # type: Union[Dict[MemoryCollection, Tuple], None]
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._snapshot is not None
+
+    def start_transaction(self, **kwargs) -> _MemoryTransaction:
+        if self.in_transaction:
+            raise OperationFailure("Transaction already in progress", code=251)
+        self._snapshot = self.client._snapshot()
+        return _MemoryTransaction(self)
+
+    async def commit_transaction(self):
+        if not self.in_transaction:
+            raise OperationFailure("No transaction started", code=251)
+        self._snapshot = None
+
+    async def abort_transaction(self):
+        if not self.in_transaction:
+            raise OperationFailure("No transaction started", code=251)
+        snapshot, self._snapshot = self._snapshot, None
+        self.client._restore(snapshot)
+
+    async def end_session(self):
+        if self.in_transaction:
+            await self.abort_transaction()
+        self.has_ended = True
+
+    async def __aenter__(self) -> 'MemorySession':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.end_session()
+
+
+class MemoryClient(object):
+    """ Stand-in for `AsyncIOMotorClient`, connection options are ignored. """
+
+    def __init__(self, *args, **kwargs):
+        self._databases = {}  # type: Dict[str, MemoryDatabase]
+        self.closed = False
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self, name)
+        return self._databases[name]
+
+    def __getattr__(self, name: str) -> MemoryDatabase:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name: str, **kwargs) -> MemoryDatabase:
+        return self[name]
+
+    async def list_database_names(self, **kwargs) -> List[str]:
+        return list(self._databases)
+
+    async def drop_database(self, name_or_database, **kwargs):
+        name = getattr(name_or_database, 'name', name_or_database)
+        self._databases.pop(name, None)
+
+    async def start_session(self, **kwargs) -> MemorySession:
+        return MemorySession(self)
+
+    def _collections(self) -> List[MemoryCollection]:
+        return [collection for database in self._databases.values()
+                for collection in database._collections.values()]
+
+    def _snapshot(self) -> Dict[MemoryCollection, Tuple]:
+        return {collection: collection._snapshot()
+                for collection in self._collections()}
+
+    def _restore(self, snapshot: Dict[MemoryCollection, Tuple]):
+        # Collections created by the transaction are emptied
+        for collection in self._collections():
+            collection._restore(snapshot.get(collection, ({}, {})))
+
+    def close(self):
+        self.closed = True
@@ -32,6 +32,17 @@ class ConnectionFailure(Exception):
     pass
 
 
+def _get_client_class(backend: str) -> type:
+    """ Return the client class of a `connect(backend=...)` value. """
+    if backend == 'motor':
+        return AsyncIOMotorClient
+    if backend == 'memory':
+        from .backends.memory import MemoryClient
+        return MemoryClient
+    raise ConnectionFailure(f"Unknown backend {backend!r}, expected 'motor' "
+                            f"or 'memory'")
+
+
 def get_collections() -> Dict[str, 'Document']:
     """ Return all registered document as Dict[class_name,'Document']. """
     return registered_collections
@@ -279,7 +290,15 @@ def get_connection(
             for key in none_key:
                 del auth_kwargs[key]
         del conn_settings['name']
-        connection = AsyncIOMotorClient(**conn_settings, **auth_kwargs)
+        if conn_settings.pop('monitoring', False):
+            from .monitoring import get_command_monitor
+            conn_settings['event_listeners'] = list(
+                conn_settings.get('event_listeners') or []
+            ) + [get_command_monitor()]
+        client_class = _get_client_class(conn_settings.pop('backend', 'motor'))
+        connection = client_class(**conn_settings, **auth_kwargs)
+    except ConnectionFailure:
+        raise
     except Exception as e:
         raise ConnectionFailure("Cannot connect to database %s :\n%s" % (alias, e))
     _connections[alias] = connection
@@ -296,7 +315,7 @@ def get_db(
     if alias not in _dbs:
         conn_setting = _connection_settings[alias].copy()
         db_name = conn_setting['name']
-        db = _connections[alias][db_name]
+        db = get_connection(alias)[db_name]
         _dbs[alias] = db
     return _dbs[alias]
 
@@ -318,6 +337,12 @@ def connect(
     In order to replace a connection identified by a given alias, you'll
     need to call ``disconnect`` first
 
+    Pass ``backend='memory'`` to keep the data in process instead, with
+    :class:`~aiomongoengine.backends.memory.MemoryClient` (tests, benchmarks).
+
+    Pass ``monitoring=True`` to aggregate command metrics per Document, see
+    :func:`~aiomongoengine.monitoring.get_command_monitor`.
+
     See the docstring for `register_connection` for more details about all
     supported kwargs.
     """
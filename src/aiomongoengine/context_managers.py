@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+from typing import Iterator
+from typing import TYPE_CHECKING
+
+from pymongo import WriteConcern
+
+if TYPE_CHECKING:
+    from motor.core import AgnosticCollection
+
+__all__ = ('set_write_concern',)
+
+
+@contextmanager
+def set_write_concern(collection: 'AgnosticCollection',
+                      write_concerns: dict = None
+                      ) -> Iterator['AgnosticCollection']:
+    """`collection` with its write concern updated with `write_concerns`,
+    eg. ``{'w': 2, 'j': True}``. ::
+
+        with set_write_concern(collection, {'w': 'majority'}) as collection:
+            await collection.insert_one(doc)
+    """
+    if not write_concerns:
+        yield collection
+        return
+    combined = dict(collection.write_concern.document)
+    combined.update(write_concerns)
+    yield collection.with_options(write_concern=WriteConcern(**combined))
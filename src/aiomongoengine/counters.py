@@ -0,0 +1,204 @@
+import asyncio
+import logging
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
+from weakref import WeakSet
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.errors import PyMongoError
+from pymongo.errors import ServerSelectionTimeoutError
+
+from aiomongoengine.context_managers import set_write_concern
+from aiomongoengine.errors import InvalidQueryError
+from aiomongoengine.queryset.batching import BufferedWriter
+from aiomongoengine.queryset.cache import get_result_cache
+from aiomongoengine.replication import invalidate_replica
+
+if TYPE_CHECKING:
+    from aiomongoengine.document import Document
+
+__all__ = ('CounterAggregator', 'close_counters')
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_MS = 100
+MAX_PENDING = 1000
+MAX_RETRIES = 3
+
+Number = Union[int, float]
+_Deltas = Dict[object, Dict[str, Number]]
+
+_aggregators = WeakSet()  # type: WeakSet['CounterAggregator']
+
+
+class CounterAggregator(BufferedWriter):
+    """Combine the ``$inc`` of hot counters in memory, and write them with
+    one ``bulk_write`` of an ``UpdateOne`` per document. ::
+
+        views = CounterAggregator(Post)
+        views.inc(post.id, views=1)
+        ...
+        await views.close()
+
+    Increments are written at most `interval_ms` after being added, or as
+    soon as `max_pending` of them are waiting, so the stored counters are
+    behind by at most `interval_ms` (plus the time of the write) while the
+    writes succeed.
+
+    Increments are never written twice: only the ones known not to be
+    applied are retried with the next flush, at most `max_retries` times
+    (the ``writeErrors`` of the bulk write, or all of them when no server
+    could be selected). When a write fails after being sent (eg. a network
+    error or a timeout), the server may have applied it: its increments are
+    dropped and logged, so the counters can be short, never doubled.
+    :meth:`close` writes the increments left, see :func:`close_counters` to
+    close every aggregator at shutdown.
+    """
+
+    def __init__(self,
+                 document: 'Document',
+                 interval_ms: float = FLUSH_INTERVAL_MS,
+                 max_pending: int = MAX_PENDING,
+                 upsert: bool = False,
+                 write_concern: dict = None,
+                 alias: str = None,
+                 max_retries: int = MAX_RETRIES):
+        """
+        :param document: Document class of the counters.
+        :param interval_ms: maximum milliseconds an increment waits for
+            being written.
+        :param max_pending: number of increments waiting which triggers a
+            write.
+        :param upsert: create the documents not found.
+        :param write_concern: write concern of the writes.
+        :param alias: connection alias.
+        :param max_retries: maximum number of times the increments of a
+            document not applied are retried.
+        """
+        super().__init__()
+        self._document = document
+        self.interval_ms = interval_ms
+        self.max_pending = max_pending
+        self.upsert = upsert
+        self.write_concern = write_concern or {}
+        self.alias = alias
+        self.max_retries = max_retries
+        # Deltas waiting, by _id then by db field
+        self._deltas = {}  # type: _Deltas
+        self._pending = 0
+        # Number of failed writes of the deltas waiting, by _id
+        self._retries = {}  # type: Dict[object, int]
+        self.flushes = 0
+        self.increments = 0
+        _aggregators.add(self)
+
+    def inc(self, document_id, **fields: Number):
+        """Add to the counters `fields` (names of the fields, and deltas) of
+        the document with `document_id`, eg. ``inc(post.id, views=1)``.
+        """
+        if self._closed:
+            raise RuntimeError("The counter aggregator is closed")
+        if not fields:
+            return
+        deltas = self._deltas.setdefault(document_id, {})
+        for name, delta in fields.items():
+            field = self._document._fields.get(name)
+            if field is None:
+                raise InvalidQueryError(
+                    f"{self._document.__name__} has no field {name}")
+            deltas[field.db_field] = deltas.get(field.db_field, 0) + delta
+        self._pending += 1
+        self._schedule(self.interval_ms, self._pending >= self.max_pending)
+
+    def pending(self, document_id, name: str) -> Number:
+        """ The delta of a counter not written yet. """
+        db_field = self._document._fields[name].db_field
+        return self._deltas.get(document_id, {}).get(db_field, 0)
+
+    async def close(self):
+        """ Stop accepting increments, and write the ones waiting. """
+        await super().close()
+        _aggregators.discard(self)
+        if self._deltas:
+            logger.error("Dropped %d increments of %s which couldn't be "
+                         "written", self._pending, self._document.__name__)
+
+    def _take_pending(self) -> List[Tuple[_Deltas, int]]:
+        if not self._deltas:
+            return []
+        deltas, self._deltas = self._deltas, {}
+        pending, self._pending = self._pending, 0
+        return [(deltas, pending)]
+
+    async def _write(self, pending: Tuple[_Deltas, int]):
+        deltas, pending = pending
+        ids = list(deltas)
+        requests = [UpdateOne({'_id': _id}, {'$inc': deltas[_id]},
+                              upsert=self.upsert) for _id in ids]
+        collection = self._document._get_collection(self.alias)
+        failed = {}  # type: _Deltas
+        try:
+            with set_write_concern(collection, self.write_concern) as target:
+                await target.bulk_write(requests, ordered=False)
+        except BulkWriteError as error:
+            # Only the operations of the writeErrors were not applied
+            for item in (error.details or {}).get('writeErrors', ()):
+                _id = ids[item['index']]
+                failed[_id] = deltas[_id]
+                logger.warning("Writing the increments %s of %s %s failed: "
+                               "%s", deltas[_id], self._document.__name__,
+                               _id, item.get('errmsg'))
+        except ServerSelectionTimeoutError as error:
+            # Nothing was sent
+            logger.warning("Writing the counters of %s failed: %s",
+                           self._document.__name__, error)
+            self._restore(deltas)
+            return
+        except PyMongoError as error:
+            logger.error("Dropped %d increments of %s, their write failed and "
+                         "may have been applied: %s", pending,
+                         self._document.__name__, error)
+            for _id in ids:
+                self._retries.pop(_id, None)
+            return
+        for _id in ids:
+            if _id not in failed:
+                self._retries.pop(_id, None)
+        if failed:
+            self._restore(failed)
+        get_result_cache().invalidate(self._document.__collection__)
+        invalidate_replica(self._document)
+        self.flushes += 1
+        self.increments += pending
+
+    def _restore(self, deltas: _Deltas):
+        """ Wait again with the deltas of a write known not to be applied. """
+        restored = False
+        for _id, fields in deltas.items():
+            retries = self._retries.get(_id, 0) + 1
+            if retries > self.max_retries:
+                logger.error("Dropped the increments %s of %s %s after %d "
+                             "retries", fields, self._document.__name__, _id,
+                             self.max_retries)
+                self._retries.pop(_id, None)
+                continue
+            self._retries[_id] = retries
+            waiting = self._deltas.setdefault(_id, {})
+            for db_field, delta in fields.items():
+                waiting[db_field] = waiting.get(db_field, 0) + delta
+            self._pending += 1
+            restored = True
+        if restored:
+            self._schedule(self.interval_ms)
+
+
+async def close_counters():
+    """ Close every counter aggregator, writing their increments left. To
+    call at shutdown, before `disconnect()`.
+    """
+    await asyncio.gather(*(aggregator.close()
+                           for aggregator in list(_aggregators)))
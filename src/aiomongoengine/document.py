@@ -1,21 +1,30 @@
 from __future__ import annotations
 
 from typing import Dict
+from typing import List
 from typing import NoReturn
 from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import Union
 
+from aiomongoengine.context_managers import set_write_concern
 from aiomongoengine.errors import PartlyLoadedDocumentError
 from aiomongoengine.errors import ValidationError
 from aiomongoengine.query.queryset import QuerySet
+from aiomongoengine.queryset.cache import get_result_cache
+from aiomongoengine.queryset.cascade import register_delete_rule
+from aiomongoengine.replication import invalidate_replica
 
-from .connection import get_connection
+from .connection import DEFAULT_CONNECTION_NAME
+from .connection import get_db
+from .indexes import index_usage
 from .metaclasses import DocumentMetaClass
 from .utils import parse_indexes
 
 if TYPE_CHECKING:
     from bson import ObjectId
+    from .indexes import IndexUsageDict
+    from .queryset.change_stream import ChangeStream
     from motor.core import AgnosticCollection
     from motor.core import AgnosticClient
     from .fields.base_field import BaseField
@@ -51,6 +60,10 @@ class BaseDocument(object):
         from .fields.dynamic_field import DynamicField
 
         self._data = {}  # storage document field and value
+        # Names of the fields assigned since loaded or saved
+        self._changed_fields = set()
+        # Names of the fields loaded when partly loaded
+        self._loaded_fields = None
         self.is_partly_loaded = _is_partly_loaded
         self._reference_loaded_fields = _reference_loaded_fields or {}
         self._dynamic_fields = {}
@@ -71,11 +84,8 @@ class BaseDocument(object):
     @classmethod
     def _get_collection(cls, alias: str = None) -> AgnosticCollection:
         """Get motor collection class"""
-        if not cls._collection:
-            if alias is not None:
-                db = get_connection(alias=alias)
-            else:
-                db = get_connection()
+        if cls._collection is None:
+            db = get_db(alias or DEFAULT_CONNECTION_NAME)
             collection = db[cls.__collection__]
             cls._collection = collection
         return cls._collection
@@ -85,6 +95,9 @@ class BaseDocument(object):
                  dic,
                  _is_partly_loaded=False,
                  _reference_loaded_fields=None):
+        from .fields.list_field import ListField
+        from .fields.list_field import TrackedList
+
         field_values = {}
         for name, value in dic.items():
             field = cls.get_field_by_db_name(name)
@@ -93,11 +106,84 @@ class BaseDocument(object):
             else:
                 field_values[name] = value
 
-        return cls(
+        document = cls(
             _is_partly_loaded=_is_partly_loaded,
             _reference_loaded_fields=_reference_loaded_fields,
             **field_values
         )
+        document._clear_changes()
+        # $push can't add to a stored null: these lists are saved whole
+        for name, value in dic.items():
+            field = cls.get_field_by_db_name(name)
+            if value is None and isinstance(field, ListField):
+                loaded = getattr(document, field.name)
+                if isinstance(loaded, TrackedList):
+                    loaded._replace()
+        return document
+
+    @classmethod
+    def _from_son(cls, son: dict, only_fields: List[str] = None):
+        """Document loaded by a queryset, `only_fields` being the names of
+        the loaded fields when they were not all loaded.
+        """
+        document = cls.from_son(son, _is_partly_loaded=bool(only_fields))
+        if only_fields:
+            document._loaded_fields = frozenset(only_fields)
+        return document
+
+    def _clear_changes(self):
+        """ Forget the changes made to the fields, once saved or loaded. """
+        from .fields.list_field import TrackedList
+
+        self._changed_fields = set()
+        for value in self._data.values():
+            if isinstance(value, TrackedList):
+                value._clear_changes()
+
+    def _list_updates(self, doc: dict) -> dict:
+        """Update operators for the lists changed by appending, removing or
+        setting items, their fields are removed from `doc` (the ``$set``).
+        """
+        from .fields.list_field import ListField
+        from .fields.list_field import TrackedList
+
+        updates = {}
+        for field in self._fields.values():
+            value = self._data.get(field.db_field)
+            if not isinstance(field, ListField) or \
+                    not isinstance(value, TrackedList):
+                continue
+            update = value.updates(field, field.db_field)
+            if not update:
+                continue
+            doc.pop(field.db_field, None)
+            for operator, values in update.items():
+                updates.setdefault(operator, {}).update(values)
+        return updates
+
+    def _changed_field_names(self) -> List[str]:
+        """Names of the fields saved by a partly loaded document: the ones
+        assigned, the loaded lists changed in place and the fields set on
+        each save.
+        """
+        from .fields.list_field import TrackedList
+
+        names = set(self._changed_fields)
+        for name, field in self._fields.items():
+            value = self._data.get(field.db_field)
+            if name in names:
+                continue
+            if isinstance(value, TrackedList) and value.changed:
+                # None when the loaded fields are unknown: all of them
+                if self._loaded_fields is not None and \
+                        name not in self._loaded_fields:
+                    raise PartlyLoadedDocumentError(
+                        f"{self._class_name}.{name} wasn't loaded, assign "
+                        f"it to save it")
+                names.add(name)
+            elif getattr(field, 'auto_now_on_update', False):
+                names.add(name)
+        return sorted(names)
 
     def to_son(self, fields=None, on_save=False) -> dict:
         """ Instance to bson"""
@@ -119,11 +205,13 @@ class BaseDocument(object):
             del data['_id']
         return data
 
-    def validate(self) -> NoReturn:
-        """validate all field"""
+    def validate(self, fields: List[str] = None) -> NoReturn:
+        """validate all field, or only the fields named in `fields`"""
         errors = {}
 
         for name, field in self._fields.items():
+            if fields is not None and name not in fields:
+                continue
             value = self.get_field_value(name)
             if not field.is_empty(value):
                 try:
@@ -198,47 +286,104 @@ class Document(BaseDocument, metaclass=DocumentMetaClass):
     async def save(self,
                    validate: bool = True,
                    alias: str = None,
-                   upsert: bool = False):
-        """ Creates or updates the current instance of this document. """
+                   upsert: bool = False,
+                   write_concern: dict = None,
+                   return_document: bool = None):
+        """Creates or updates the current instance of this document. Lists
+        changed by appending, removing or setting items are updated with
+        ``$push``, ``$pullAll`` or ``field.N`` sets, see
+        :class:`~aiomongoengine.fields.list_field.TrackedList`.
+
+        A partly loaded document (with `only`, `exclude` or `fields`) only
+        validates and sets the fields assigned since it was loaded, and its
+        loaded lists changed in place.
+
+        :param write_concern: write concern of the save, eg.
+            ``{'w': 1, 'j': False}``, defaults to ``meta['write_concern']``
+            then to the collection's.
+        :param return_document: return the document as stored before
+            (:attr:`~pymongo.collection.ReturnDocument.BEFORE`) or after
+            (:attr:`~pymongo.collection.ReturnDocument.AFTER`) the save,
+            rather than this document. Updates then go through
+            ``find_one_and_update``, otherwise through ``update_one`` which
+            doesn't send the document back.
+        """
+        from .fields.list_field import TrackedList
+
+        fields = None
         if self.is_partly_loaded:
-            msg = (
-                "Partly loaded document {0} can't be saved. Document should "
-                "be loaded without 'only', 'exclude' or 'fields' "
-                "QuerySet's modifiers"
-            )
-            raise PartlyLoadedDocumentError(
-                msg.format(self.__class__.__name__)
-            )
+            if self.id is None:
+                raise PartlyLoadedDocumentError(
+                    f"Partly loaded document {self._class_name} can't be "
+                    f"saved without its id")
+            fields = self._changed_field_names()
+            if not fields:
+                return self if return_document is None else \
+                    await self.objects.get(id=self.id)
 
         if validate:
-            self.validate()
+            self.validate(fields)
+        if write_concern is None:
+            write_concern = self._meta.get('write_concern') or {}
 
-        doc = self.to_son(on_save=True)
+        doc = self.to_son(fields and ['id'] + fields, on_save=True)
         _id = doc.pop('_id', None)
         if _id is not None:
-            await self._get_collection(alias).find_one_and_update(
-                {'_id': _id},
-                {'$set': doc},
-                upsert=upsert
-            )
+            # An upsert may insert the document: lists are set whole then
+            values = dict(doc)
+            update = {} if upsert else self._list_updates(values)
+            if values:
+                update.setdefault('$set', {}).update(values)
+            with set_write_concern(self._get_collection(alias),
+                                   write_concern) as collection:
+                if return_document is None:
+                    await collection.update_one(
+                        {'_id': _id}, update, upsert=upsert)
+                else:
+                    stored = await collection.find_one_and_update(
+                        {'_id': _id}, update, upsert=upsert,
+                        return_document=return_document)
         else:
-            ret = await self._get_collection(alias).insert_one(doc)
+            with set_write_concern(self._get_collection(alias),
+                                   write_concern) as collection:
+                ret = await collection.insert_one(doc)
             self.id = ret.inserted_id
-        self._data.update(doc)
-        return self
+            stored = dict(doc, _id=self.id) if return_document else None
+        if fields is None:
+            get_result_cache().invalidate_document(
+                self.__collection__, dict(doc, _id=self.id))
+        else:
+            # The other fields are unknown to match the cached queries
+            get_result_cache().invalidate(self.__collection__)
+        invalidate_replica(type(self))
+        # Keep the tracked lists, their values are the saved ones
+        self._data.update({
+            key: value for key, value in doc.items()
+            if not isinstance(self._data.get(key), TrackedList)})
+        self._clear_changes()
+        if return_document is None:
+            return self
+        return self.from_son(stored) if stored is not None else None
 
     async def update(self, **kwargs):
         return await self.objects.filter(id=self.id).update(**kwargs)
 
-    async def delete(self, alias=None):
-        """ Deletes the current instance of this Document. """
-        return await self.objects.filter(id=self.id).delete()
+    async def delete(self, alias=None, **kwargs):
+        """Deletes the current instance of this Document, applying the
+        delete rules of its class. `kwargs` are passed to
+        :meth:`~aiomongoengine.queryset.BaseQuerySet.delete`, eg.
+        ``transaction=True``.
+        """
+        return await self.objects.filter(id=self.id).delete(**kwargs)
 
     async def reload(self):
         """刷新对象"""
         if self.id:
             obj = await self.objects.get(id=self.id)
             self._data = obj._data
+            self._changed_fields = set()
+            self._loaded_fields = None
+            self.is_partly_loaded = False
             return self
         else:
             return self
@@ -249,6 +394,31 @@ class Document(BaseDocument, metaclass=DocumentMetaClass):
         ret = await cls._get_collection(alias).create_indexes(indexes, **kwargs)
         return ret
 
+    @classmethod
+    async def index_usage(cls, alias=None) -> List[IndexUsageDict]:
+        """Operations served by each index of the collection since the
+        server started, their size on disk, and whether they are unused.
+        See :func:`~aiomongoengine.indexes.index_usage_report` for all the
+        collections.
+        """
+        return await index_usage(cls, alias)
+
+    @classmethod
+    def register_delete_rule(cls, document_cls: 'Document', field_name: str,
+                             rule: int):
+        """Apply `rule` to `document_cls.field_name` when documents of this
+        class are deleted, for the fields which can't be declared with a
+        ``reverse_delete_rule``.
+        """
+        register_delete_rule(cls, document_cls, field_name, rule)
+
+    @classmethod
+    def watch(cls, **kwargs) -> ChangeStream:
+        """ Follow the changes of the collection, see
+        :meth:`~aiomongoengine.queryset.BaseQuerySet.watch`.
+        """
+        return cls.objects.watch(**kwargs)
+
     @classmethod
     async def drop_collection(cls, alias: str = None):
         return await cls._get_collection(alias=alias).drop()
@@ -0,0 +1,75 @@
+from typing import Iterator
+from typing import List
+
+from typing_extensions import TypedDict
+
+__all__ = ('ExplainSummary', 'summarize_explain')
+
+
+class ExplainSummary(TypedDict):
+    stages: List[str]
+    indexes: List[str]
+    collscan: bool
+    in_memory_sort: bool
+    keys_examined: int
+    docs_examined: int
+    returned: int
+    winning_plan: dict
+
+
+def summarize_explain(explain: dict) -> ExplainSummary:
+    """Extract what matters from the output of an explain command (find,
+    count, update, delete or aggregate, on a standalone, a replica set or a
+    sharded cluster): the stages of the winning plan, the indexes it uses,
+    and the number of keys and documents examined to return the results.
+    """
+    planner = _find_section(explain, 'queryPlanner') or {}
+    stats = _find_section(explain, 'executionStats') or {}
+    winning_plan = planner.get('winningPlan') or {}
+
+    stages, indexes = [], []
+    for stage in _walk_plan(winning_plan):
+        stages.append(stage['stage'])
+        if stage.get('indexName') and stage['indexName'] not in indexes:
+            indexes.append(stage['indexName'])
+
+    return ExplainSummary(
+        stages=stages,
+        indexes=indexes,
+        collscan='COLLSCAN' in stages,
+        in_memory_sort='SORT' in stages,
+        keys_examined=stats.get('totalKeysExamined', 0),
+        docs_examined=stats.get('totalDocsExamined', 0),
+        returned=stats.get('nReturned', 0),
+        winning_plan=winning_plan
+    )
+
+
+def _find_section(explain: dict, name: str):
+    """ `explain[name]`, or the one of the first `$cursor` stage for
+    aggregations on servers reporting them per stage.
+    """
+    if name in explain:
+        return explain[name]
+    for stage in explain.get('stages') or ():
+        cursor = stage.get('$cursor')
+        if cursor and name in cursor:
+            return cursor[name]
+    return None
+
+
+def _walk_plan(plan: dict) -> Iterator[dict]:
+    if not plan:
+        return
+    # `queryPlan` wraps the plans of the slot based engine (MongoDB 5.1+)
+    if 'queryPlan' in plan:
+        yield from _walk_plan(plan['queryPlan'])
+        return
+    if 'stage' in plan:
+        yield plan
+    if 'inputStage' in plan:
+        yield from _walk_plan(plan['inputStage'])
+    for child in plan.get('inputStages') or ():
+        yield from _walk_plan(child)
+    for shard in plan.get('shards') or ():
+        yield from _walk_plan(shard.get('winningPlan') or {})
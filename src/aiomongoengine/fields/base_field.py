@@ -80,6 +80,7 @@ class BaseField(object):
 
     def __set__(self, instance, value):
         instance._data[self.db_field] = self.get_value(value)
+        instance._changed_fields.add(self.name)
 
     def is_empty(self, value) -> bool:
         """Indicates that the field is empty
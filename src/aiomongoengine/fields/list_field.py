@@ -1,8 +1,124 @@
+from typing import Iterable
+from typing import Union
+
 from aiomongoengine.errors import ValidationError
 
 from .base_field import BaseField
 
 
+class TrackedList(list):
+    """Value of a :class:`ListField`, recording how it changed since it was
+    loaded or saved, so saving the document sends the change (``$push``,
+    ``$pullAll`` or ``field.N`` sets) rather than the whole list.
+
+    Only ``append``, ``extend``, ``+=``, ``remove`` and assigning an index
+    are tracked, one kind of them per save; any other change saves the
+    whole list. Items changed in place (eg. a field of an embedded
+    document) are not tracked: assign them back (``doc.items[3] = item``).
+    """
+
+    def __init__(self, iterable: Iterable = (), replaced: bool = False):
+        super().__init__(iterable)
+        self._clear_changes()
+        self._replaced = replaced
+
+    def _clear_changes(self):
+        self._replaced = False
+        # Number of items appended at the end
+        self._appended = 0
+        self._removed = []
+        self._set_indexes = set()
+
+    def __reduce_ex__(self, protocol):
+        # Restore the changes, not replay the items through `extend`
+        return self.__class__, (list(self),), self.__dict__
+
+    def _replace(self):
+        self._replaced = True
+
+    def append(self, value):
+        super().append(value)
+        self._appended += 1
+
+    def extend(self, values):
+        values = list(values)
+        super().extend(values)
+        self._appended += len(values)
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def remove(self, value):
+        super().remove(value)
+        self._removed.append(value)
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        if isinstance(index, int):
+            self._set_indexes.add(index % len(self))
+        else:
+            self._replace()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._replace()
+
+    def __imul__(self, n):
+        self._replace()
+        return super().__imul__(n)
+
+    def insert(self, index, value):
+        super().insert(index, value)
+        self._replace()
+
+    def pop(self, index=-1):
+        self._replace()
+        return super().pop(index)
+
+    def clear(self):
+        super().clear()
+        self._replace()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._replace()
+
+    def reverse(self):
+        super().reverse()
+        self._replace()
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._replaced or self._appended or self._removed or
+                    self._set_indexes)
+
+    def updates(self, field: 'ListField', db_field: str) -> Union[dict, None]:
+        """The update applying the changes to the saved list, empty when
+        the list didn't change, None when the whole list must be set.
+        """
+        kinds = bool(self._appended) + bool(self._removed) + \
+            bool(self._set_indexes)
+        if self._replaced or kinds > 1:
+            return None
+        to_son = field._base_field.to_son
+        if self._appended:
+            return {'$push': {db_field: {'$each': [
+                to_son(value) for value in self[-self._appended:]]}}}
+        if self._removed:
+            # `remove` removes the first occurrence, $pullAll all of them
+            if any(value in self for value in self._removed):
+                return None
+            return {'$pullAll': {db_field: [
+                to_son(value) for value in self._removed]}}
+        if not self._set_indexes:
+            return {}
+        if len(self._set_indexes) * 2 > len(self):
+            return None
+        return {'$set': {f'{db_field}.{index}': to_son(self[index])
+                         for index in sorted(self._set_indexes)}}
+
+
 class ListField(BaseField):
     """ Field responsible for storing :py:class:`list`. """
 
@@ -19,6 +135,24 @@ class ListField(BaseField):
 
         self._base_field = base_field
 
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance._data.get(self.db_field)
+        if value is None:
+            value = self.get_value(None)
+        if isinstance(value, list) and not isinstance(value, TrackedList):
+            # Store the default, and the saved lists, to track their changes
+            value = instance._data[self.db_field] = TrackedList(value)
+        return value
+
+    def __set__(self, instance, value):
+        value = self.get_value(value)
+        if isinstance(value, list):
+            value = TrackedList(value, replaced=True)
+        instance._data[self.db_field] = value
+        instance._changed_fields.add(self.name)
+
     def validate(self, value):
         errors = {}
         base_field_name = self._base_field.__class__.__name__
@@ -18,11 +18,18 @@ class ReferenceField(BaseField):
 
     def __init__(self,
                  document_type_obj: Union[str, 'Document'],
-                 *args, **kw):
+                 *args,
+                 reverse_delete_rule: int = 0,
+                 **kw):
         """
 
         :param document_type_obj: The type of document that this field
             accepts as a referenced document.
+        :param reverse_delete_rule: what deleting a referenced document
+            does to the documents referencing it: one of ``DO_NOTHING``
+            (the default), ``NULLIFY``, ``CASCADE``, ``DENY`` or ``PULL``
+            (for lists of references), see
+            :mod:`aiomongoengine.queryset.cascade`.
         """
 
         super(ReferenceField, self).__init__(*args, **kw)
@@ -35,6 +42,7 @@ class ReferenceField(BaseField):
             )
 
         self.document_type_obj = document_type_obj
+        self.reverse_delete_rule = reverse_delete_rule
 
     @property
     def reference_type(self):
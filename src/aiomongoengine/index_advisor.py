@@ -0,0 +1,310 @@
+import re
+from collections import Counter
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
+
+from bson.regex import Regex
+from typing_extensions import TypedDict
+
+from .connection import get_collection_list
+from .utils import gather_with_concurrency
+from .utils import index_key_name
+from .utils import index_keys
+from .utils import is_index_prefix
+from .utils import parse_indexes
+
+if TYPE_CHECKING:
+    from .document import Document
+
+__all__ = ('QueryShape', 'query_shapes', 'IndexAdvisor', 'IndexReportDict',
+           'ShapeReportDict', 'format_index_report', 'get_index_advisor')
+
+IndexKeys = List[Tuple[str, Any]]
+
+# Operators matching single values, an index scans them as equality
+_EQUALITY_OPERATORS = frozenset(('$eq', '$in'))
+# Options making an index more than a lookup structure
+_INDEX_CONSTRAINTS = ('unique', 'sparse', 'partialFilterExpression',
+                      'expireAfterSeconds', 'collation')
+_REGEX_TYPES = (type(re.compile('')), Regex)
+
+REPORT_CONCURRENCY = 8
+
+
+class QueryShape(NamedTuple):
+    """ The fields of a query, as seen by the query planner. """
+    equality: Tuple[str, ...]
+    sort: Tuple[Tuple[str, int], ...]
+    range: Tuple[str, ...]
+    projection: Tuple[str, ...]
+
+    def index_keys(self) -> IndexKeys:
+        """Keys of the index serving this shape, following the
+        equality-sort-range rule: the equality fields first, so that the
+        index is walked in the sort order, then the range fields.
+        """
+        return [(field, 1) for field in self.equality] + \
+            list(self.sort) + [(field, 1) for field in self.range]
+
+    def served_by(self, keys: IndexKeys) -> bool:
+        """ Whether the index on `keys` serves the shape without scanning
+        out of range keys or sorting in memory.
+        """
+        fields = [field for field, _ in keys]
+        start = len(self.equality)
+        if set(fields[:start]) != set(self.equality):
+            return False
+        end = start + len(self.sort)
+        sort = keys[start:end]
+        if [field for field, _ in sort] != [field for field, _ in self.sort]:
+            return False
+        if sort:
+            directions = [(d, wanted) for (_, d), (_, wanted)
+                          in zip(sort, self.sort)]
+            if not (all(d == wanted for d, wanted in directions)
+                    or all(d == -wanted for d, wanted in directions)):
+                return False
+        return set(fields[end:end + len(self.range)]) == set(self.range)
+
+    def uses(self, keys: IndexKeys) -> bool:
+        """ Whether the planner could pick the index on `keys` at all. """
+        first = keys[0][0]
+        return first in self.equality or first in self.range or \
+            bool(self.sort) and self.sort[0][0] == first
+
+
+def query_shapes(query: dict,
+                 ordering: Iterable[Tuple[str, Any]] = None,
+                 projection: dict = None) -> List[QueryShape]:
+    """Normalise a mongo query, sort and projection into shapes: one per
+    clause of its ``$or``, since the planner serves each of them with its
+    own index.
+    """
+    equality, ranges, alternatives = set(), set(), []
+    _collect_fields(query or {}, equality, ranges, alternatives)
+    projected = tuple(sorted(key for key, value in (projection or {}).items()
+                             if value and not isinstance(value, dict)))
+    if not alternatives:
+        return [_make_shape(equality, ranges, ordering, projected)]
+
+    shapes = []
+    for clauses in alternatives:
+        for clause in clauses:
+            clause_equality, clause_ranges = set(equality), set(ranges)
+            _collect_fields(clause, clause_equality, clause_ranges, [])
+            shapes.append(_make_shape(clause_equality, clause_ranges,
+                                      ordering, projected))
+    return shapes
+
+
+def _collect_fields(query: dict, equality: set, ranges: set,
+                    alternatives: list):
+    for key, value in query.items():
+        if key == '$and':
+            for clause in value:
+                _collect_fields(clause, equality, ranges, alternatives)
+        elif key == '$or':
+            alternatives.append(value)
+        elif key.startswith('$'):
+            # $nor, $text, $where, $expr: not served by a b-tree prefix
+            continue
+        elif isinstance(value, dict) and \
+                any(op.startswith('$') for op in value):
+            if set(value) <= _EQUALITY_OPERATORS:
+                equality.add(key)
+            else:
+                ranges.add(key)
+        elif isinstance(value, _REGEX_TYPES):
+            ranges.add(key)
+        else:
+            equality.add(key)
+
+
+def _make_shape(equality: set, ranges: set, ordering, projection) \
+        -> QueryShape:
+    # A field compared for equality is constant, sorting on it is free
+    sort = tuple((key, direction) for key, direction in ordering or ()
+                 if isinstance(direction, int) and key not in equality)
+    sorted_fields = {key for key, _ in sort}
+    return QueryShape(
+        equality=tuple(sorted(equality)),
+        sort=sort,
+        range=tuple(sorted(ranges - equality - sorted_fields)),
+        projection=projection
+    )
+
+
+class ShapeReportDict(TypedDict):
+    equality: List[str]
+    sort: List[Tuple[str, int]]
+    range: List[str]
+    projection: List[str]
+    count: int
+    # Recommended index keys
+    keys: IndexKeys
+    # Name of the declared, and of the existing index serving the shape
+    declared: Union[str, None]
+    existing: Union[str, None]
+
+
+class IndexReportDict(TypedDict):
+    document: str
+    collection: str
+    shapes: List[ShapeReportDict]
+    # Declared indexes none of the recorded queries can use
+    unused: List[str]
+    # (index, index of which it is a prefix)
+    redundant: List[Tuple[str, str]]
+
+
+class IndexAdvisor(object):
+    """Record the shape of the queries run by each Document and recommend
+    indexes for them::
+
+        advisor = get_index_advisor()
+        advisor.start()
+        ...  # run the workload
+        print(format_index_report(await advisor.report()))
+
+    Shapes are compared with the indexes declared in ``meta['indexes']``
+    and with the ones existing on the server.
+    """
+
+    def __init__(self):
+        self.recording = False
+        self._shapes = {}  # type: Dict[str, Counter]
+
+    def start(self):
+        self.recording = True
+
+    def stop(self):
+        self.recording = False
+
+    def reset(self):
+        self._shapes.clear()
+
+    def record(self, document: 'Document', query: dict,
+               ordering: Iterable[Tuple[str, Any]] = None,
+               projection: dict = None):
+        counter = self._shapes.get(document._class_name)
+        if counter is None:
+            counter = self._shapes[document._class_name] = Counter()
+        counter.update(query_shapes(query, ordering, projection))
+
+    def shapes(self, document: 'Document') -> Counter:
+        """ Number of queries recorded for `document`, per QueryShape. """
+        return Counter(self._shapes.get(document._class_name, ()))
+
+    async def report(self, documents: Iterable['Document'] = None) \
+            -> List[IndexReportDict]:
+        """Recommend indexes for `documents`, by default every registered
+        Document with recorded queries.
+        """
+        if documents is None:
+            documents = [document for document in get_collection_list()
+                         if document._class_name in self._shapes]
+        return list(await gather_with_concurrency(
+            REPORT_CONCURRENCY,
+            *(self._report(document) for document in documents)
+        ))
+
+    async def _report(self, document: 'Document') -> IndexReportDict:
+        declared = {model.document['name']: model.document
+                    for model in parse_indexes(document._meta['indexes'])}
+        cursor = document._get_collection().list_indexes()
+        existing = {index['name']: index
+                    for index in await cursor.to_list(length=None)}
+        existing.pop('_id_', None)
+
+        counter = self._shapes.get(document._class_name, Counter())
+        shapes = []
+        for shape, count in counter.most_common():
+            # Queries on _id are served by the _id index
+            if '_id' in shape.equality or not shape.index_keys():
+                continue
+            shapes.append(ShapeReportDict(
+                equality=list(shape.equality),
+                sort=list(shape.sort),
+                range=list(shape.range),
+                projection=list(shape.projection),
+                count=count,
+                keys=shape.index_keys(),
+                declared=_serving_index(shape, declared),
+                existing=_serving_index(shape, existing)
+            ))
+
+        unused = []
+        if counter:
+            unused = [name for name, index in declared.items()
+                      if not _is_constraint(index) and
+                      not any(shape.uses(index_keys(index))
+                              for shape in counter)]
+
+        indexes = dict(declared, **existing)
+        redundant = [
+            (name, other)
+            for name, index in indexes.items() if not _is_constraint(index)
+            for other, other_index in indexes.items()
+            if other != name and
+            _is_redundant(index_keys(index), index_keys(other_index),
+                          name > other)
+        ]
+        return IndexReportDict(
+            document=document._class_name,
+            collection=document.__collection__,
+            shapes=shapes,
+            unused=unused,
+            redundant=redundant
+        )
+
+
+def _serving_index(shape: QueryShape, indexes: Dict[str, dict]) \
+        -> Union[str, None]:
+    for name, index in indexes.items():
+        if shape.served_by(index_keys(index)):
+            return name
+    return None
+
+
+def _is_redundant(keys: IndexKeys, other_keys: IndexKeys,
+                  keep_other: bool) -> bool:
+    # Of two indexes on the same keys, only one is reported
+    return is_index_prefix(keys, other_keys) and \
+        (len(keys) < len(other_keys) or keep_other)
+
+
+def _is_constraint(index: dict) -> bool:
+    return any(index.get(option) for option in _INDEX_CONSTRAINTS)
+
+
+def format_index_report(reports: List[IndexReportDict]) -> str:
+    """ Render reports as text, missing indexes first. """
+    lines = []
+    for report in reports:
+        lines.append(f"{report['document']} ({report['collection']})")
+        for shape in report['shapes']:
+            name = index_key_name(shape['keys'])
+            if shape['existing'] is None:
+                state = 'missing' if shape['declared'] is None \
+                    else f"declared as {shape['declared']}, not created"
+            else:
+                state = f"served by {shape['existing']}"
+            lines.append(f"  {shape['count']:>8} x {name}: {state}")
+        for name in report['unused']:
+            lines.append(f"  unused declared index {name}")
+        for name, other in report['redundant']:
+            lines.append(f"  redundant index {name}, prefix of {other}")
+    return '\n'.join(lines)
+
+
+_index_advisor = IndexAdvisor()
+
+
+def get_index_advisor() -> IndexAdvisor:
+    return _index_advisor
@@ -0,0 +1,311 @@
+import logging
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from typing_extensions import TypedDict
+
+from .connection import get_collection_list
+from .utils import gather_with_concurrency
+from .utils import index_keys
+from .utils import parse_indexes
+
+if TYPE_CHECKING:
+    from .document import Document
+
+__all__ = ('IndexSyncDict', 'IndexMismatchDict', 'ensure_all_indexes',
+           'diff_indexes', 'IndexUsageDict', 'CollectionIndexUsageDict',
+           'index_usage', 'index_usage_report')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+
+# Fields of an index document which are not options of the index
+_NON_OPTIONS = frozenset(('v', 'ns', 'key', 'name', 'background'))
+# Options compared even when not declared, the server fills in the others
+# (eg. the weights and language of text indexes)
+_CONSTRAINT_OPTIONS = frozenset(('unique', 'sparse', 'partialFilterExpression',
+                                 'expireAfterSeconds', 'collation', 'hidden'))
+
+
+class IndexMismatchDict(TypedDict):
+    name: str
+    keys: List[Tuple[str, Any]]
+    # option: (declared value, existing value)
+    options: Dict[str, Tuple[Any, Any]]
+
+
+class IndexSyncDict(TypedDict):
+    collection: str
+    documents: List[str]
+    # Names of the indexes created, or to create on a dry run
+    created: List[str]
+    # Indexes existing with other options than the declared ones
+    mismatched: List[IndexMismatchDict]
+    # Names of the existing indexes which are not declared
+    extra: List[str]
+
+
+class IndexUsageDict(TypedDict):
+    name: str
+    keys: List[Tuple[str, Any]]
+    # Operations using the index since `since` (the server start or the
+    # index creation), summed over the hosts
+    ops: int
+    since: Union[datetime, None]
+    # Bytes on disk
+    size: int
+    declared: bool
+    exists: bool
+    # Existing, never used, and dropping it would not change the behavior
+    # of the collection (not the _id, a unique or a TTL index)
+    unused: bool
+
+
+class CollectionIndexUsageDict(TypedDict):
+    collection: str
+    documents: List[str]
+    total_size: int
+    indexes: List[IndexUsageDict]
+
+
+def diff_indexes(declared: List[IndexModel], existing: List[dict]) \
+        -> Tuple[List[IndexModel], List[IndexMismatchDict], List[str]]:
+    """Compare the declared indexes of a collection with the existing ones
+    (as returned by `list_indexes`).
+
+    Indexes are matched on their keys, or on their name when the server
+    stores other keys than the declared ones (text indexes).
+
+    :returns: the missing indexes, the mismatched ones and the names of the
+        extra ones.
+    """
+    by_keys = {_keys_id(index): index for index in existing}
+    by_name = {index['name']: index for index in existing}
+    matched = {'_id_'}
+    missing, mismatched = [], []
+    for model in declared:
+        document = model.document
+        index = by_keys.get(_keys_id(document)) or by_name.get(
+            document['name'])
+        if index is None:
+            missing.append(model)
+            continue
+        matched.add(index['name'])
+        options = _options_diff(document, index)
+        if options:
+            mismatched.append(IndexMismatchDict(
+                name=index['name'],
+                keys=index_keys(document),
+                options=options
+            ))
+    extra = [name for name in by_name if name not in matched]
+    return missing, mismatched, extra
+
+
+async def ensure_all_indexes(concurrency: int = DEFAULT_CONCURRENCY,
+                             dry_run: bool = False,
+                             documents: Iterable['Document'] = None) \
+        -> List[IndexSyncDict]:
+    """Create the indexes declared in ``meta['indexes']`` missing from the
+    collections of all registered Documents (or `documents`).
+
+    Existing indexes are listed first, so only the missing ones are sent
+    to the server; the collections are handled `concurrency` at a time.
+    Drift is reported but never repaired: indexes existing with other
+    options than the declared ones, and indexes which are not declared.
+
+    :param concurrency: maximum number of collections handled at once.
+    :param dry_run: only report what would be created.
+    :param documents: Documents to handle, all registered ones by default.
+    """
+    return list(await gather_with_concurrency(
+        concurrency,
+        *(_ensure_collection_indexes(docs, dry_run)
+          for docs in _group_by_collection(documents))
+    ))
+
+
+async def _ensure_collection_indexes(documents: List['Document'],
+                                     dry_run: bool) -> IndexSyncDict:
+    declared = _declared_indexes(documents)
+    collection = documents[0]._get_collection()
+    existing = await collection.list_indexes().to_list(length=None)
+    missing, mismatched, extra = diff_indexes(list(declared.values()),
+                                              existing)
+
+    created = [model.document['name'] for model in missing]
+    if missing and not dry_run:
+        created = await collection.create_indexes(missing)
+
+    for mismatch in mismatched:
+        logger.warning("Index %s of %s differs from its declaration: %s",
+                       mismatch['name'], collection.name, mismatch['options'])
+    for name in extra:
+        logger.warning("Index %s of %s is not declared", name,
+                       collection.name)
+
+    return IndexSyncDict(
+        collection=collection.name,
+        documents=sorted(document._class_name for document in documents),
+        created=created,
+        mismatched=mismatched,
+        extra=extra
+    )
+
+
+def _group_by_collection(documents: Iterable['Document'] = None) \
+        -> List[List['Document']]:
+    """ Documents (all registered ones by default) per collection. """
+    if documents is None:
+        documents = get_collection_list()
+    collections = {}  # type: Dict[str, List['Document']]
+    for document in documents:
+        if document._meta.get('abstract'):
+            continue
+        collections.setdefault(document.__collection__, []).append(document)
+    return [docs for _, docs in sorted(collections.items())]
+
+
+def _declared_indexes(documents: List['Document']) -> Dict[str, IndexModel]:
+    # Documents sharing a collection (inheritance) share its indexes
+    declared = {}  # type: Dict[str, IndexModel]
+    for document in documents:
+        for model in parse_indexes(document._meta['indexes']):
+            declared.setdefault(model.document['name'], model)
+    return declared
+
+
+def _keys_id(index: Union[dict, IndexModel]) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(index_keys(index))
+
+
+def _options(index: dict) -> Dict[str, Any]:
+    # An option set to False is the same as an option left out
+    return {key: value for key, value in index.items()
+            if key not in _NON_OPTIONS and value is not False}
+
+
+def _options_diff(declared: dict, existing: dict) \
+        -> Dict[str, Tuple[Any, Any]]:
+    declared, existing = _options(declared), _options(existing)
+    compared = set(declared) | (set(existing) & _CONSTRAINT_OPTIONS)
+    return {key: (declared.get(key), existing.get(key))
+            for key in sorted(compared)
+            if declared.get(key) != existing.get(key)}
+
+
+async def index_usage(document: 'Document', alias: str = None) \
+        -> List[IndexUsageDict]:
+    """Usage of the indexes of `document`'s collection, from ``$indexStats``
+    and ``collStats``, and of the indexes declared in ``meta['indexes']``
+    which don't exist.
+    """
+    return await _collection_index_usage([document], alias)
+
+
+async def index_usage_report(concurrency: int = DEFAULT_CONCURRENCY,
+                             documents: Iterable['Document'] = None) \
+        -> List[CollectionIndexUsageDict]:
+    """Index usage of the collections of all registered Documents (or
+    `documents`), see :func:`index_usage`.
+
+    :param concurrency: maximum number of collections handled at once.
+    :param documents: Documents to handle, all registered ones by default.
+    """
+    collections = _group_by_collection(documents)
+
+    async def report(docs: List['Document']) -> CollectionIndexUsageDict:
+        indexes = await _collection_index_usage(docs)
+        return CollectionIndexUsageDict(
+            collection=docs[0].__collection__,
+            documents=sorted(document._class_name for document in docs),
+            total_size=sum(index['size'] for index in indexes),
+            indexes=indexes
+        )
+
+    return list(await gather_with_concurrency(
+        concurrency, *(report(docs) for docs in collections)
+    ))
+
+
+async def _collection_index_usage(documents: List['Document'],
+                                  alias: str = None) -> List[IndexUsageDict]:
+    declared = _declared_indexes(documents)
+    collection = documents[0]._get_collection(alias)
+    stats = await collection.aggregate([{'$indexStats': {}}]).to_list(
+        length=None)
+    try:
+        coll_stats = await collection.database.command(
+            'collStats', collection.name)
+    except OperationFailure:
+        # The collection doesn't exist (yet)
+        coll_stats = {}
+    sizes = coll_stats.get('indexSizes') or {}
+
+    usage = {}  # type: Dict[str, IndexUsageDict]
+    for stat in stats:
+        name = stat['name']
+        accesses = stat.get('accesses') or {}
+        index = usage.get(name)
+        if index is None:
+            spec = stat.get('spec') or {'key': stat['key']}
+            index = usage[name] = IndexUsageDict(
+                name=name,
+                keys=list(stat['key'].items()),
+                ops=0,
+                since=None,
+                size=sizes.get(name, 0),
+                declared=False,
+                exists=True,
+                unused=name != '_id_' and not _is_constraint(spec)
+            )
+        # One document per host and index on replica sets and clusters
+        index['ops'] += int(accesses.get('ops', 0))
+        since = accesses.get('since')
+        if since is not None and (index['since'] is None or
+                                  since < index['since']):
+            index['since'] = since
+
+    missing, _, _ = diff_indexes(
+        list(declared.values()),
+        [{'name': index['name'], 'key': dict(index['keys'])}
+         for index in usage.values()])
+    missing_names = {model.document['name'] for model in missing}
+    for name, model in declared.items():
+        if name in missing_names:
+            usage[name] = IndexUsageDict(
+                name=name,
+                keys=index_keys(model),
+                ops=0,
+                since=None,
+                size=0,
+                declared=True,
+                exists=False,
+                unused=False
+            )
+        elif name in usage:
+            usage[name]['declared'] = True
+    # Declared indexes matched on their keys under another name
+    declared_keys = {_keys_id(model) for model in declared.values()}
+    for index in usage.values():
+        if tuple(index['keys']) in declared_keys:
+            index['declared'] = True
+
+    for index in usage.values():
+        index['unused'] = index['unused'] and index['exists'] and \
+            not index['ops']
+    return sorted(usage.values(), key=lambda index: index['name'])
+
+
+def _is_constraint(index: dict) -> bool:
+    return bool(index.get('unique') or index.get('expireAfterSeconds')
+                is not None)
@@ -8,6 +8,7 @@ from .connection import registered_collections
 from .errors import InvalidDocumentError
 from .fields.base_field import BaseField
 from .fields import ObjectIdField
+from .queryset.cascade import register_delete_rules
 
 if TYPE_CHECKING:
     from .document import Document
@@ -141,6 +142,7 @@ class DocumentMetaClass(type):
         for field in new_class._fields.values():
             if field.owner_document is None:
                 field.owner_document = new_class
+        register_delete_rules(new_class)
 
         return new_class
 
@@ -0,0 +1,234 @@
+import threading
+from bisect import bisect_left
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+from bson import BSON
+from pymongo import monitoring
+from typing_extensions import TypedDict
+
+from .connection import registered_collections
+
+__all__ = ('CommandMonitor', 'CommandMetricsDict', 'Histogram',
+           'get_command_monitor')
+
+# Seconds, the default buckets of the Prometheus client plus sub-ms ones
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes, 1KiB to 16MiB (the maximum BSON document size)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(8))
+
+# Commands whose value is the collection name, eg. {'find': 'user', ...}
+_COLLECTION_COMMANDS = frozenset((
+    'find', 'insert', 'update', 'delete', 'aggregate', 'count', 'distinct',
+    'findAndModify', 'findandmodify', 'createIndexes', 'dropIndexes',
+    'listIndexes', 'drop', 'collStats', 'create', 'mapReduce',
+))
+
+MetricsKey = Tuple[str, str, str]
+
+
+class Histogram(object):
+    """ Cumulative histogram with fixed upper bounds, like Prometheus'. """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """ Number of observations lower or equal to each bucket and +Inf. """
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Estimate the `q` quantile (0-1), by linear interpolation within
+        the bucket holding it. Observations above the last bucket are
+        reported as the last bucket bound.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1]
+
+
+class CommandMetricsDict(TypedDict):
+    document: str
+    collection: str
+    operation: str
+    count: int
+    errors: int
+    latency_sum: float
+    latency_p50: float
+    latency_p95: float
+    latency_p99: float
+    reply_bytes: int
+
+
+class _Metrics(object):
+    __slots__ = ('latency', 'reply_size', 'errors')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.reply_size = Histogram(SIZE_BUCKETS)
+        self.errors = 0
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Aggregate command latency, reply size and errors per Document class,
+    collection and operation (command name).
+
+    Registered on the clients created with ``connect(..., monitoring=True)``.
+    Pymongo calls listeners from its own threads, so the counters are
+    guarded by a lock.
+    """
+
+    def __init__(self, measure_reply_size: bool = True):
+        """
+        :param measure_reply_size: re-encode replies to measure their size,
+            which costs about as much as the driver decoding them.
+        """
+        self.measure_reply_size = measure_reply_size
+        self._metrics = {}  # type: Dict[MetricsKey, _Metrics]
+        self._pending = {}  # type: Dict[Tuple[int, object], MetricsKey]
+        self._lock = threading.Lock()
+
+    # CommandListener
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        key = self._key(event.command_name, event.command)
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = key
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        size = len(BSON.encode(event.reply)) if self.measure_reply_size else 0
+        self._observe(event, size, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._observe(event, 0, failed=True)
+
+    # Pull API
+
+    def snapshot(self) -> List[CommandMetricsDict]:
+        """ Current metrics, one entry per (document, collection, operation). """
+        with self._lock:
+            items = sorted(self._metrics.items())
+            return [CommandMetricsDict(
+                document=document,
+                collection=collection,
+                operation=operation,
+                count=metrics.latency.count,
+                errors=metrics.errors,
+                latency_sum=metrics.latency.sum,
+                latency_p50=metrics.latency.quantile(0.5),
+                latency_p95=metrics.latency.quantile(0.95),
+                latency_p99=metrics.latency.quantile(0.99),
+                reply_bytes=int(metrics.reply_size.sum),
+            ) for (document, collection, operation), metrics in items]
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def prometheus_text(self, prefix: str = 'aiomongoengine') -> str:
+        """ Render the metrics in the Prometheus text exposition format. """
+        with self._lock:
+            items = sorted(self._metrics.items())
+            lines = []
+            name = f'{prefix}_command_duration_seconds'
+            lines.append(f'# HELP {name} MongoDB command latency.')
+            lines.append(f'# TYPE {name} histogram')
+            for key, metrics in items:
+                lines.extend(_histogram_lines(name, key, metrics.latency))
+
+            name = f'{prefix}_command_reply_bytes'
+            lines.append(f'# HELP {name} MongoDB command reply size.')
+            lines.append(f'# TYPE {name} histogram')
+            for key, metrics in items:
+                lines.extend(_histogram_lines(name, key, metrics.reply_size))
+
+            name = f'{prefix}_command_errors_total'
+            lines.append(f'# HELP {name} Failed MongoDB commands.')
+            lines.append(f'# TYPE {name} counter')
+            for key, metrics in items:
+                lines.append(f'{name}{{{_labels(key)}}} {metrics.errors}')
+        return '\n'.join(lines) + '\n'
+
+    # Helpers
+
+    @staticmethod
+    def _key(command_name: str, command: dict) -> MetricsKey:
+        collection = ''
+        if command_name == 'getMore':
+            collection = command.get('collection', '')
+        elif command_name in _COLLECTION_COMMANDS:
+            value = command.get(command_name)
+            if isinstance(value, str):
+                collection = value
+        document = registered_collections.get(collection)
+        document_name = document._class_name if document is not None else ''
+        return document_name, collection, command_name
+
+    def _observe(self, event, reply_size: int, failed: bool):
+        with self._lock:
+            key = self._pending.pop((event.request_id, event.connection_id),
+                                    None)
+            if key is None:
+                key = ('', '', event.command_name)
+            metrics = self._metrics.get(key)
+            if metrics is None:
+                metrics = self._metrics[key] = _Metrics()
+            metrics.latency.observe(event.duration_micros / 1e6)
+            if failed:
+                metrics.errors += 1
+            else:
+                metrics.reply_size.observe(reply_size)
+
+
+def _labels(key: MetricsKey) -> str:
+    document, collection, operation = key
+    return (f'document="{_escape(document)}",'
+            f'collection="{_escape(collection)}",'
+            f'operation="{_escape(operation)}"')
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _histogram_lines(name: str, key: MetricsKey,
+                     histogram: Histogram) -> List[str]:
+    labels = _labels(key)
+    bounds = [repr(float(b)) for b in histogram.buckets] + ['+Inf']
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+             for bound, count in zip(bounds, histogram.cumulative())]
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+_command_monitor = CommandMonitor()
+
+
+def get_command_monitor() -> CommandMonitor:
+    """ Return the monitor registered by ``connect(..., monitoring=True)``. """
+    return _command_monitor
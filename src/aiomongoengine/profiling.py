@@ -0,0 +1,164 @@
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Union
+
+from typing_extensions import TypedDict
+
+__all__ = ('QueryProfile', 'QueryProfileDict', 'Profiler',
+           'add_profile_sink', 'remove_profile_sink', 'get_profiler')
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('build', 'cursor', 'network', 'decode')
+
+Sink = Callable[['QueryProfile'], None]
+
+
+class QueryProfileDict(TypedDict):
+    collection: str
+    source: str
+    documents: int
+    build: float
+    cursor: float
+    network: float
+    decode: float
+    total: float
+
+
+class QueryProfile(object):
+    """Seconds spent in each phase of the evaluation of a queryset:
+
+    * `build`: compiling the Q tree into the mongo query.
+    * `cursor`: creating and configuring the motor cursor.
+    * `network`: waiting for the raw documents, which includes the server
+      time and the BSON decoding done by the driver. When the documents come
+      from the result cache or a replica (see `source`), this is the lookup.
+    * `decode`: hydrating the raw documents into Document instances.
+    """
+    __slots__ = ('collection', 'source', 'documents', 'build', 'cursor',
+                 'network', 'decode', '_last')
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.source = 'database'
+        self.documents = 0
+        self.build = self.cursor = self.network = self.decode = 0.0
+        self._last = perf_counter()
+
+    def mark(self, phase: str):
+        """ Charge the time elapsed since the previous mark to `phase`. """
+        now = perf_counter()
+        setattr(self, phase, getattr(self, phase) + now - self._last)
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self.build + self.cursor + self.network + self.decode
+
+    def as_dict(self) -> QueryProfileDict:
+        return QueryProfileDict(
+            collection=self.collection,
+            source=self.source,
+            documents=self.documents,
+            build=self.build,
+            cursor=self.cursor,
+            network=self.network,
+            decode=self.decode,
+            total=self.total
+        )
+
+    def __repr__(self):
+        phases = ' '.join(f'{phase}={getattr(self, phase) * 1e3:.3f}ms'
+                          for phase in PHASES)
+        return (f'<QueryProfile {self.collection} {self.source} '
+                f'docs={self.documents} {phases}>')
+
+
+class Profiler(object):
+    """Collect the profile of every queryset evaluated in the current
+    context (and the tasks it starts)::
+
+        with Profiler() as profiler:
+            await handler(request)
+        print(profiler.totals())
+    """
+
+    def __init__(self, sink: Sink = None):
+        """
+        :param sink: optional callable, called with each QueryProfile.
+        """
+        self.sink = sink
+        self.profiles = []  # type: List[QueryProfile]
+        self._token = None
+
+    def record(self, profile: QueryProfile):
+        self.profiles.append(profile)
+        if self.sink is not None:
+            _emit(self.sink, profile)
+
+    def totals(self) -> Dict[str, Union[int, float]]:
+        """ Number of queries, documents and seconds spent per phase. """
+        totals = {'queries': len(self.profiles),
+                  'documents': sum(p.documents for p in self.profiles)}
+        for phase in PHASES + ('total',):
+            totals[phase] = sum(getattr(p, phase) for p in self.profiles)
+        return totals
+
+    def __enter__(self) -> 'Profiler':
+        self._token = _profiler.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _profiler.reset(self._token)
+        self._token = None
+
+
+_profiler = ContextVar('aiomongoengine_profiler', default=None)
+_sinks = []  # type: List[Sink]
+
+
+def get_profiler() -> Union[Profiler, None]:
+    """ Return the Profiler active in the current context, if any. """
+    return _profiler.get()
+
+
+def add_profile_sink(sink: Sink):
+    """ Profile every queryset evaluation and pass it to `sink`. """
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def remove_profile_sink(sink: Sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def start_profile(collection: str, force: bool = False) \
+        -> Union[QueryProfile, None]:
+    """ Start a profile if anything will receive it, None otherwise. """
+    if force or _sinks or _profiler.get() is not None:
+        return QueryProfile(collection)
+    return None
+
+
+def finish_profile(profile: QueryProfile, sink: Sink = None):
+    """ Hand a finished profile to the active Profiler and to the sinks. """
+    profiler = _profiler.get()
+    if profiler is not None:
+        profiler.record(profile)
+    for global_sink in list(_sinks):
+        _emit(global_sink, profile)
+    if sink is not None:
+        _emit(sink, profile)
+
+
+def _emit(sink: Sink, profile: QueryProfile):
+    # A failing sink must not fail the query it observes
+    try:
+        sink(profile)
+    except Exception:
+        logger.exception("Query profile sink %r failed", sink)
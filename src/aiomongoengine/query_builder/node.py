@@ -1,3 +1,5 @@
+from typing import Any
+from typing import Callable
 from typing import List
 from typing import Union
 from typing import TYPE_CHECKING
@@ -5,6 +7,7 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from aiomongoengine.document import Document
 
+from ..query_builder.predicate import compile_query
 from ..query_builder.transform import transform_query
 
 
@@ -45,6 +48,14 @@ class QNode(object):
     def to_query(self, document=None):
         raise NotImplementedError()
 
+    def to_predicate(self, document=None) -> Callable[[Any], bool]:
+        """ Compile the query into a python predicate, accepting `document`
+        instances and raw documents, see
+        :func:`~aiomongoengine.query_builder.predicate.compile_query`.
+        """
+        document = document or self.document
+        return compile_query(self.to_query(document), document)
+
     def __or__(self, other: 'QNode') -> 'QNode':
         return self._combine(other, '$or')
 
@@ -0,0 +1,256 @@
+import re
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Pattern
+from typing import TYPE_CHECKING
+
+from bson.objectid import ObjectId
+from bson.regex import Regex
+
+from ..errors import InvalidQueryError
+from ..utils import bson_sort_key
+
+if TYPE_CHECKING:
+    from aiomongoengine.document import Document
+
+__all__ = ('compile_query',)
+
+Predicate = Callable[[Any], bool]
+
+REGEX_FLAGS = {
+    'i': re.IGNORECASE,
+    'm': re.MULTILINE,
+    's': re.DOTALL,
+    'x': re.VERBOSE,
+}
+
+_MISSING = object()
+
+
+def compile_query(query: dict, document: 'Document' = None) -> Predicate:
+    """Compile a MongoDB query (eg. the output of `Q.to_query()`) into a
+    python predicate, returning True for the objects the query matches.
+
+    The predicate accepts raw documents (dict keyed by db fields, as returned
+    by pymongo) and, when `document` is given, instances of that Document.
+    Paths are resolved and regexes compiled once, here, so the predicate can
+    be applied to many objects cheaply.
+
+    :raises InvalidQueryError: when the query uses an operator that can't be
+        evaluated in python (eg. `$text`, `$where`, geo operators).
+    """
+    tests = [_compile_clause(key, value, document)
+             for key, value in query.items()]
+    if len(tests) == 1:
+        return tests[0]
+    return lambda obj: all(test(obj) for test in tests)
+
+
+def _compile_clause(key: str, value, document) -> Predicate:
+    if key == '$and':
+        tests = [compile_query(q, document) for q in value]
+        return lambda obj: all(test(obj) for test in tests)
+    if key == '$or':
+        tests = [compile_query(q, document) for q in value]
+        return lambda obj: any(test(obj) for test in tests)
+    if key == '$nor':
+        tests = [compile_query(q, document) for q in value]
+        return lambda obj: not any(test(obj) for test in tests)
+    if key.startswith('$'):
+        raise InvalidQueryError(f"Operator {key} can't be evaluated locally")
+
+    get_values = _compile_path(key, document)
+    test = _compile_condition(value)
+    return lambda obj: test(get_values(obj))
+
+
+def _compile_path(path: str, document) -> Callable[[Any], List]:
+    """ Return a function getting the values of `path` in an object. """
+    parts = path.split('.')
+    head, rest = parts[0], parts[1:]
+    field = document.get_field_by_db_name(head) if document else None
+
+    def get_values(obj):
+        if isinstance(obj, dict):
+            return _lookup(obj, parts)
+
+        # Document instance, `_data` is keyed by db field
+        value = obj._data.get(head, _MISSING)
+        if value is _MISSING:
+            value = getattr(obj, head, None) if field is None else \
+                field.get_value(None)
+        if value is None:
+            return [] if rest else [None]
+        if field is not None:
+            value = field.to_son(value)
+        return _lookup(value, rest)
+
+    return get_values
+
+
+def _lookup(value, parts: List[str]) -> list:
+    """Values reachable by `parts` from `value`. Like MongoDB, arrays met
+    on the way are traversed.
+    """
+    if not parts:
+        return [value]
+
+    part, rest = parts[0], parts[1:]
+    if isinstance(value, dict):
+        if part in value:
+            return _lookup(value[part], rest)
+        return []
+    if isinstance(value, list):
+        values = []
+        if part.isdigit() and int(part) < len(value):
+            values.extend(_lookup(value[int(part)], rest))
+        for item in value:
+            if isinstance(item, dict):
+                values.extend(_lookup(item, parts))
+        return values
+    return []
+
+
+def _expand(values: list):
+    """ Candidates of a comparison: values and the items of array values. """
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            for item in value:
+                yield item
+
+
+def _compile_condition(condition) -> Callable[[list], bool]:
+    if isinstance(condition, dict) and condition and \
+            all(k.startswith('$') for k in condition):
+        tests = [_compile_operator(op, arg, condition)
+                 for op, arg in condition.items() if op != '$options']
+        return lambda values: all(test(values) for test in tests)
+    return _compile_eq(condition)
+
+
+def _compile_eq(expected) -> Callable[[list], bool]:
+    if _is_regex(expected):
+        pattern = _to_pattern(expected)
+        return lambda values: any(_regex_match(pattern, v)
+                                  for v in _expand(values))
+    if expected is None:
+        return lambda values: not values or any(v is None
+                                                for v in _expand(values))
+    if isinstance(expected, bool):
+        return lambda values: any(v is expected for v in _expand(values))
+    if isinstance(expected, (str, ObjectId)):
+        return lambda values: any(v == expected for v in _expand(values))
+    if isinstance(expected, (int, float)):
+        return lambda values: any(v == expected and not isinstance(v, bool)
+                                  for v in _expand(values))
+    key = bson_sort_key(expected)
+    return lambda values: any(_key_or_none(v) == key for v in _expand(values))
+
+
+def _compile_operator(op: str, arg, condition: dict) -> Callable[[list], bool]:
+    if op == '$eq':
+        return _compile_eq(arg)
+    if op == '$ne':
+        test = _compile_eq(arg)
+        return lambda values: not test(values)
+    if op in ('$gt', '$gte', '$lt', '$lte'):
+        return _compile_comparison(op, arg)
+    if op == '$in':
+        if arg and all(isinstance(v, (str, ObjectId)) for v in arg):
+            # Fast path for the common `id__in=...` / `name__in=...`
+            expected = set(arg)
+            return lambda values: any(
+                isinstance(v, (str, ObjectId)) and v in expected
+                for v in _expand(values))
+        tests = [_compile_eq(v) for v in arg]
+        return lambda values: any(test(values) for test in tests)
+    if op == '$nin':
+        tests = [_compile_eq(v) for v in arg]
+        return lambda values: not any(test(values) for test in tests)
+    if op == '$exists':
+        return lambda values: bool(values) == bool(arg)
+    if op == '$regex':
+        pattern = _to_pattern(arg, condition.get('$options', ''))
+        return lambda values: any(_regex_match(pattern, v)
+                                  for v in _expand(values))
+    if op == '$not':
+        test = _compile_condition(arg) if isinstance(arg, dict) \
+            else _compile_eq(arg)
+        return lambda values: not test(values)
+    if op == '$all':
+        tests = [_compile_eq(v) for v in arg]
+        return lambda values: bool(values) and all(test(values)
+                                                   for test in tests)
+    if op == '$size':
+        return lambda values: any(isinstance(v, list) and len(v) == arg
+                                  for v in values)
+    if op == '$mod':
+        divisor, remainder = arg
+        return lambda values: any(
+            isinstance(v, (int, float)) and not isinstance(v, bool)
+            and v % divisor == remainder for v in _expand(values))
+    if op == '$elemMatch':
+        if all(k.startswith('$') for k in arg):
+            test = _compile_condition(arg)
+            return lambda values: any(
+                isinstance(v, list) and any(test([item]) for item in v)
+                for v in values)
+        match = compile_query(arg)
+        return lambda values: any(
+            isinstance(v, list) and any(isinstance(item, dict) and match(item)
+                                        for item in v)
+            for v in values)
+    raise InvalidQueryError(f"Operator {op} can't be evaluated locally")
+
+
+def _compile_comparison(op: str, arg) -> Callable[[list], bool]:
+    key = bson_sort_key(arg)
+    type_rank = key[0]
+    compare = {
+        '$gt': lambda k: k > key,
+        '$gte': lambda k: k >= key,
+        '$lt': lambda k: k < key,
+        '$lte': lambda k: k <= key,
+    }[op]
+
+    def test(values):
+        for value in _expand(values):
+            value_key = _key_or_none(value)
+            # Like MongoDB, only values of the same type are compared
+            if value_key is not None and value_key[0] == type_rank and \
+                    compare(value_key):
+                return True
+        return False
+
+    return test
+
+
+def _key_or_none(value):
+    try:
+        return bson_sort_key(value)
+    except TypeError:
+        return None
+
+
+def _is_regex(value) -> bool:
+    return isinstance(value, (Pattern, Regex))
+
+
+def _to_pattern(value, options: str = '') -> Pattern:
+    flags = 0
+    for option in options:
+        flags |= REGEX_FLAGS.get(option, 0)
+    if isinstance(value, Pattern):
+        if flags:
+            return re.compile(value.pattern, value.flags | flags)
+        return value
+    if isinstance(value, Regex):
+        pattern = value.try_compile()
+        return re.compile(pattern.pattern, pattern.flags | flags)
+    return re.compile(value, flags)
+
+
+def _regex_match(pattern: Pattern, value) -> bool:
+    return isinstance(value, str) and pattern.search(value) is not None
@@ -1,7 +1,24 @@
-import collections
+from collections.abc import Mapping
+from typing import Any
+from typing import List
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
 
-from ..query.base import QueryOperator
-from ..query.base import QUERY_OPERATORS
+from ..errors import InvalidQueryError
+from ..queryset.operators.base import QueryOperator
+from ..queryset.operators.base import QUERY_OPERATORS
+from ..queryset.operators.base import UPDATE_OPERATORS
+# Register the operators
+from ..queryset.operators import query_operators  # noqa: F401
+from ..queryset.operators import update_operators  # noqa: F401
+
+if TYPE_CHECKING:
+    from ..document import Document
+    from ..fields.base_field import BaseField
+
+# Positional path parts of updates, `S` being mongoengine's name for `$`
+_POSITIONAL = ('S', '$')
 
 
 class DefaultOperator(QueryOperator):
@@ -11,7 +28,7 @@ class DefaultOperator(QueryOperator):
 
 def update(d, u):
     for k, v in u.items():
-        if isinstance(v, collections.Mapping):
+        if isinstance(v, Mapping):
             r = update(d.get(k, {}), v)
             d[k] = r
         else:
@@ -103,3 +120,130 @@ def transform_field_list_query(document, query_field_list):
             fields[field_db_name] = query_field_list[key]
 
     return fields
+
+
+def _is_positional(part: str) -> bool:
+    return part in _POSITIONAL or part.isdigit() or (
+        part.startswith('$[') and part.endswith(']'))
+
+
+def _embedded_type(field: 'BaseField') -> Union['Document', None]:
+    if hasattr(field, '_base_field'):
+        return _embedded_type(field._base_field)
+    return getattr(field, 'embedded_type', None)
+
+
+def resolve_path(document: 'Document', parts: List[str]) \
+        -> Tuple[List[str], List[Union['BaseField', None]]]:
+    """Map a path (field names, array indexes and positional operators) to
+    its db fields, through embedded documents and lists of them.
+
+    :returns: the db path, and the field of each of its parts (the item
+        field after an index or a positional operator, None for the parts
+        which are not declared fields).
+    """
+    path, fields = [], []
+    field = None
+    for part in parts:
+        if path and _is_positional(part):
+            path.append('$' if part == 'S' else part)
+            field = getattr(field, '_base_field', None)
+        else:
+            owner = document if not path else _embedded_type(field)
+            field = owner._fields.get(part) if owner is not None else None
+            path.append(field.db_field or part if field is not None else part)
+        fields.append(field)
+    return path, fields
+
+
+def transform_update(document: 'Document' = None, **kwargs) \
+        -> Union[dict, List[dict]]:
+    """Compile Django-style keyword updates into an update document::
+
+        transform_update(User, inc__visits=1, push__tags=['a', 'b'],
+                         set__address__city='Paris', unset__nickname=True)
+
+    * keys are ``operator__path``, the operator defaulting to ``set`` (see
+      :mod:`aiomongoengine.queryset.operators.update_operators`), the path
+      being field names separated by ``__`` and mapped to their db fields.
+    * array indexes are numbers, ``S`` (or ``$``) is the positional
+      operator; ``$[]`` and ``$[name]`` (all and filtered positional, to
+      be used with ``array_filters``) are passed with ``**{}``.
+    * values are converted with the ``to_son`` of their field.
+    * ``pull`` accepts a query operator (``pull__scores__lt=50``) and the
+      fields of the items of a list of embedded documents
+      (``pull__comments__author='bob'``). For the other operators, a last
+      part named like a query operator is a field (``set__meta__type``).
+    * ``__raw__`` is merged as is. A list is a pipeline update and can't be
+      combined with other keys.
+    """
+    mongo_update = {}
+    for key, value in kwargs.items():
+        if key == '__raw__':
+            if isinstance(value, list):
+                if len(kwargs) > 1:
+                    raise InvalidQueryError(
+                        "Pipeline updates can't be combined with other "
+                        "update keys")
+                return value
+            for op, fields in value.items():
+                mongo_update.setdefault(op, {}).update(fields)
+            continue
+
+        parts = key.split('__')
+        op = 'set'
+        if len(parts) > 1 and parts[0] in UPDATE_OPERATORS:
+            op = parts.pop(0)
+        operator = UPDATE_OPERATORS[op]()
+        match = None
+        # The other operators take fields named like query operators, eg.
+        # set__meta__type
+        if operator.op == 'pull' and len(parts) > 1 and \
+                parts[-1] in QUERY_OPERATORS:
+            match = parts.pop()
+        # Allow to escape operator-like field name by __
+        if len(parts) > 1 and parts[-1] == '':
+            parts.pop()
+
+        path, fields = resolve_path(document, parts)
+        nested = len(path)
+        if operator.op in ('pull', 'pull_all'):
+            nested = _pull_split(path, fields)
+        if nested < len(path):
+            if operator.op == 'pull_all':
+                raise InvalidQueryError(
+                    f"Invalid update '{key}': pull_all only supports the "
+                    f"list itself")
+            value = _query_value(fields[-1], value, match)
+            for part in reversed(path[nested:]):
+                value = {part: value}
+        elif match:
+            value = _query_value(fields[-1], value, match, item=True)
+        else:
+            value = operator.get_value(fields[-1], value)
+
+        update = operator.to_update('.'.join(path[:nested]), value,
+                                    document=document)
+        for update_op, update_fields in update.items():
+            mongo_update.setdefault(update_op, {}).update(update_fields)
+    return mongo_update
+
+
+def _pull_split(path: List[str], fields: List[Any]) -> int:
+    """ Length of the path to the list a pull applies to. """
+    for i in range(len(path) - 1, 0, -1):
+        if hasattr(fields[i - 1], '_base_field') and \
+                not _is_positional(path[i]):
+            return i
+    return len(path)
+
+
+def _query_value(field: 'BaseField', value, match: str = None,
+                 item: bool = False) -> Any:
+    if item:
+        field = getattr(field, '_base_field', field)
+    if match is None:
+        return QueryOperator().get_value(field, value) \
+            if not isinstance(value, dict) else value
+    operator = QUERY_OPERATORS[match]()
+    return operator.to_query('_', operator.get_value(field, value))['_']
@@ -1,12 +1,17 @@
 from __future__ import absolute_import
 
+import asyncio
 import copy
 import itertools
 import re
 import warnings
 from builtins import DeprecationWarning
+from functools import partial
+from time import perf_counter
 from typing import Callable
+from typing import Dict
 from typing import List
+from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import Union
 from warnings import warn
@@ -21,17 +26,48 @@ from aiomongoengine.errors import InvalidQueryError
 from aiomongoengine.errors import LookUpError
 from aiomongoengine.errors import NotUniqueError
 from aiomongoengine.errors import OperationError
+from aiomongoengine.index_advisor import get_index_advisor
+from aiomongoengine.profiling import finish_profile
+from aiomongoengine.profiling import QueryProfile
+from aiomongoengine.profiling import start_profile
 from aiomongoengine.query_builder.field_list import QueryFieldList
 from aiomongoengine.query_builder.node import Q
 from aiomongoengine.query_builder.node import QNode
+from aiomongoengine.query_builder.transform import transform_update
+from aiomongoengine.queryset.batch_jobs import BatchJob
+from aiomongoengine.queryset.batch_jobs import JOB_BATCH_SIZE
+from aiomongoengine.queryset.batching import BatchedInserter
+from aiomongoengine.queryset.batching import MAX_BATCH
+from aiomongoengine.queryset.batching import MAX_DELAY_MS
+from aiomongoengine.queryset.cache import get_result_cache
+from aiomongoengine.queryset.cache import ResultCache
+from aiomongoengine.queryset.cascade import CASCADE
+from aiomongoengine.queryset.cascade import CascadePlanner
+from aiomongoengine.queryset.cascade import DEFAULT_MAX_CASCADE
+from aiomongoengine.queryset.cascade import DENY
+from aiomongoengine.queryset.cascade import DO_NOTHING
+from aiomongoengine.queryset.cascade import NULLIFY
+from aiomongoengine.queryset.cascade import PULL
+from aiomongoengine.queryset.change_stream import ChangeStream
+from aiomongoengine.queryset.change_stream import prefix_query
+from aiomongoengine.replication import get_replica
+from aiomongoengine.replication import invalidate_replica
+from aiomongoengine.slow_query import is_slow_query
+from aiomongoengine.slow_query import record_slow_query
+from aiomongoengine.testing import capture_query
 from aiomongoengine.utils import _import_class
 from aiomongoengine.utils import async_iteritems
+from aiomongoengine.utils import chunked
+from aiomongoengine.utils import gather_with_concurrency
+from aiomongoengine.utils import sort_son_documents
 from bson import SON
 from bson import json_util
 from bson.code import Code
+from pymongo import UpdateOne
 from pymongo import WriteConcern
 from pymongo.collection import ReturnDocument
 from pymongo.common import validate_read_preference
+from typing_extensions import TypedDict
 
 from ..fields.base_field import BaseField
 
@@ -41,12 +77,21 @@ if TYPE_CHECKING:
 
 __all__ = ("BaseQuerySet", "DO_NOTHING", "NULLIFY", "CASCADE", "DENY", "PULL")
 
-# Delete rules
-DO_NOTHING = 0
-NULLIFY = 1
-CASCADE = 2
-DENY = 3
-PULL = 4
+# Huge `$in` lists are split into sub-queries of at most IN_CHUNK_SIZE values,
+# at most IN_CHUNK_CONCURRENCY of them being sent at the same time.
+IN_CHUNK_SIZE = 10000
+IN_CHUNK_CONCURRENCY = 4
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class UpsertBatchDict(TypedDict):
+    matched: int
+    modified: int
+    upserted: int
+    # Index of the upserted documents in `docs`: their new _id
+    upserted_ids: Dict[int, object]
 
 
 # noinspection PyUnresolvedReferences
@@ -90,9 +135,12 @@ class BaseQuerySet:
         self._hint = -1  # Using -1 as None is a valid value for hint
         self._collation = None
         self._batch_size = None
-        self.only_fields = []
         self._max_time_ms = None
         self._comment = None
+        self._cache_ttl = None
+        self._profile_sink = None
+        self._profiling = False
+        self.last_profile = None  # type: Union[QueryProfile, None]
 
     def __call__(self, q_obj=None, **query):
         """Filter the selected documents by calling the
@@ -182,7 +230,8 @@ class BaseQuerySet:
         if not isinstance(raw_doc_or_docs, list):
             return_one = True
             raw_doc_or_docs = [raw_doc_or_docs]
-        docs = [self._document._from_son(raw_doc, only_fields=self.only_fields)
+        only_fields = self.only_fields
+        docs = [self._document._from_son(raw_doc, only_fields=only_fields)
                 for raw_doc in raw_doc_or_docs]
         if not return_one:
             return docs
@@ -193,8 +242,65 @@ class BaseQuerySet:
 
     async def all(self) -> List[Union['Document', dict]]:
         """Returns all object or document of the current QuerySet."""
-        raw_docs = await self._cursor.to_list(length=None)
-        return self._handle_result(raw_docs)
+        started = perf_counter()
+        self._record_query_shape()
+        profile = start_profile(self._document.__collection__,
+                                force=self._profiling)
+        raw_docs = await self._fetch_raw(profile)
+        result = self._handle_result(raw_docs)
+        if profile is not None:
+            profile.mark('decode')
+            profile.documents = len(raw_docs)
+            self.last_profile = profile
+            finish_profile(profile, self._profile_sink)
+        self._check_slow_query("find", started)
+        return result
+
+    async def _fetch_raw(self, profile: QueryProfile = None) -> List[dict]:
+        """Return the raw documents of this queryset, from a replica, the
+        result cache or the database, charging the time spent to `profile`.
+        """
+        query = self._query
+        if profile is not None:
+            profile.mark('build')
+
+        raw_docs = self._find_in_replica()
+        if raw_docs is not None:
+            if profile is not None:
+                profile.source = 'replica'
+                profile.mark('network')
+            return raw_docs
+
+        cache_key = self._get_cache_key() if self._cache_ttl else None
+        if cache_key is not None:
+            raw_docs = get_result_cache().get(cache_key)
+            if raw_docs is not None:
+                if profile is not None:
+                    profile.source = 'cache'
+                    profile.mark('network')
+                return raw_docs
+
+        queries = self._split_in_query()
+        if queries is None:
+            cursor = self._cursor
+            if profile is not None:
+                profile.mark('cursor')
+            raw_docs = await cursor.to_list(length=None)
+        else:
+            raw_docs = await self._chunked_find(queries)
+        if profile is not None:
+            profile.mark('network')
+
+        if cache_key is not None:
+            get_result_cache().set(
+                cache_key,
+                self._document.__collection__,
+                raw_docs,
+                self._cache_ttl,
+                self._collection.codec_options,
+                None if self._skip else query
+            )
+        return raw_docs
 
     def filter(self, *q_objs, **query):
         """An alias of :meth:`~aiomongoengine.queryset.QuerySet.__call__`"""
@@ -241,16 +347,15 @@ class BaseQuerySet:
         queryset = self.clone()
         queryset = queryset.order_by().limit(2)
         queryset = queryset.filter(*q_objs, **query)
-        result = async_iteritems(queryset)
+        result = await queryset.all()
+        self.last_profile = queryset.last_profile
         result_count = len(result)
 
         if result_count == 0:
+            msg = f"{queryset._document._class_name} matching query does not exist."
             raise queryset._document.DoesNotExist(msg)
         elif result_count == 1:
             return result[0]
-        # If we were able to retrieve the 2nd doc, rewind the cursor and
-        # raise the MultipleObjectsReturned exception.
-        queryset.rewind()
         message = f"{result_count} items returned, instead of 1"
         raise queryset._document.MultipleObjectsReturned(message)
 
@@ -260,9 +365,9 @@ class BaseQuerySet:
 
     async def first(self):
         """Retrieve the first object matching the query."""
-        queryset = self.clone()
-        queryset.limit(1)
-        result = async_iteritems(queryset)
+        queryset = self.limit(1)
+        result = await queryset.all()
+        self.last_profile = queryset.last_profile
         if result:
             return result[0]
         else:
@@ -341,6 +446,9 @@ class BaseQuerySet:
                 message = u"Tried to save duplicate unique keys (%s)"
                 raise NotUniqueError(message % six.text_type(err))
             raise OperationError(message % six.text_type(err))
+        finally:
+            # A failed insert_many may have written part of the documents
+            self._invalidate_cache()
 
         # Apply inserted_ids to documents
         for doc, doc_id in zip(docs, ids):
@@ -349,7 +457,7 @@ class BaseQuerySet:
         if not load_bulk:
             return ids[0] if return_one else ids
 
-        documents = self.in_bulk(ids)
+        documents = await self.in_bulk(ids)
         results = [documents.get(obj_id) for obj_id in ids]
         return results[0] if return_one else results
 
@@ -368,16 +476,42 @@ class BaseQuerySet:
             kwargs['limit'] = self._limit
             kwargs['skip'] = self._skip
 
-        count = self._document._get_collection().count_documents(self._query, **kwargs)
+        started = perf_counter()
+        self._record_query_shape(find=False)
+        collection = self._document._get_collection()
+        queries = None
+        if not with_limit_and_skip:
+            queries = self._split_in_query()
+        if queries is None:
+            count = await collection.count_documents(self._query, **kwargs)
+        else:
+            counts = await gather_with_concurrency(
+                IN_CHUNK_CONCURRENCY,
+                *(collection.count_documents(query, **kwargs) for query in queries)
+            )
+            count = sum(counts)
         self._cursor_obj = None
+
+        command = SON([("count", collection.name), ("query", self._query)])
+        if with_limit_and_skip:
+            command["limit"] = self._limit or 0
+            command["skip"] = self._skip or 0
+        self._check_slow_query("count", started, command)
         return count
 
-    async def delete(self, write_concern=None, _from_doc_delete=False, cascade_refs=None):
+    async def delete(self, write_concern=None, _from_doc_delete=False, cascade_refs=None,
+                     max_cascade=DEFAULT_MAX_CASCADE, transaction=False, session=None,
+                     chunk_size=IN_CHUNK_SIZE, chunk_delay=0):
         """Delete the documents matched by the query.
 
-        TODO: transaction support
+        The delete rules of the document (see the ``reverse_delete_rule`` of
+        :class:`~aiomongoengine.fields.ReferenceField`) are applied as set
+        operations by a :class:`~aiomongoengine.queryset.cascade.CascadePlanner`:
+        the matched ids are fetched once, every DENY rule is checked before
+        anything is written, then the CASCADE, NULLIFY and PULL rules run as
+        batched ``$in`` queries.
 
-        :param cascade_refs:
+        :param cascade_refs: ids of the documents not to delete.
         :param write_concern: Extra keyword arguments are passed down which
             will be used as options for the resultant
             ``getLastError`` command.  For example,
@@ -386,11 +520,21 @@ class BaseQuerySet:
             will force an fsync on the primary server.
         :param _from_doc_delete: True when called from document delete therefore
             signals will have been triggered so don't loop.
+        :param max_cascade: maximum number of documents deleted by the
+            CASCADE rules (the documents of the queryset not counted), an
+            OperationError is raised before deleting anything when the
+            delete would go over it.
+        :param transaction: run the delete and its rules in a transaction.
+        :param session: session to run the delete and its rules in.
+        :param chunk_size: with a skip or a limit, the ids of the window are
+            fetched first, then deleted by ``$in`` chunks of at most
+            `chunk_size` ids.
+        :param chunk_delay: seconds to pause between two chunks, to throttle
+            large purges.
 
         :returns number of deleted documents
         """
         queryset = self.clone()
-        doc = queryset._document
 
         if write_concern is None:
             write_concern = {}
@@ -402,62 +546,49 @@ class BaseQuerySet:
         #         or signals.post_delete.has_receivers_for(doc)
         # )
 
-        call_document_delete = (queryset._skip or queryset._limit) and not _from_doc_delete
-
-        if call_document_delete:
-            cnt = 0
-            # TODO: use asyncio.gather
-            async for doc in queryset:
-                await doc.delete(**write_concern)
-                cnt += 1
-            return cnt
+        # Deletes where skips or limits have been applied go through the ids
+        # of the window
+        window = bool(queryset._skip or queryset._limit) and not _from_doc_delete
+
+        queryset._record_query_shape(find=False)
+        if not transaction or session is not None:
+            return await queryset._delete(write_concern, cascade_refs, max_cascade, session,
+                                          window, chunk_size, chunk_delay)
+
+        client = queryset._collection.database.client
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                return await queryset._delete(write_concern, cascade_refs, max_cascade, session,
+                                              window, chunk_size, chunk_delay)
+
+    async def _delete(self, write_concern, cascade_refs, max_cascade, session,
+                      window=False, chunk_size=IN_CHUNK_SIZE, chunk_delay=0):
+        doc = self._document
+        if window:
+            ids = await self._window_ids()
+            if cascade_refs:
+                cascade_refs = set(cascade_refs)
+                ids = [_id for _id in ids if _id not in cascade_refs]
+            if not doc._meta.get("delete_rules"):
+                return await self._delete_ids(ids, write_concern, session,
+                                              chunk_size, chunk_delay)
+            planner = CascadePlanner(max_documents=max_cascade,
+                                     batch_size=chunk_size, session=session)
+            return await planner.execute(await planner.plan(doc, ids), write_concern)
+
+        if doc._meta.get("delete_rules") or cascade_refs:
+            planner = CascadePlanner(max_documents=max_cascade, session=session)
+            return await planner.delete(doc, self._query, write_concern,
+                                        exclude=cascade_refs)
 
-        delete_rules = doc._meta.get("delete_rules") or {}
-        delete_rules = list(delete_rules.items())
-
-        # Check for DENY rules before actually deleting/nullifying any other
-        # references
-        for rule_entry, rule in delete_rules:
-            document_cls, field_name = rule_entry
-            if document_cls._meta.get("abstract"):
-                continue
-
-            if rule == DENY:
-                exists = await document_cls.objects(**{field_name + "__in": self}).exists()
-                if exists:
-                    raise OperationError(
-                        "Could not delete document (%s.%s refers to it)"
-                        % (document_cls.__name__, field_name)
-                    )
-
-        # Check all the other rules
-        for rule_entry, rule in delete_rules:
-            document_cls, field_name = rule_entry
-            if document_cls._meta.get("abstract"):
-                continue
-
-            if rule == CASCADE:
-                cascade_refs = set() if cascade_refs is None else cascade_refs
-                # Handle recursive reference
-                if doc._collection == document_cls._collection:
-                    async for ref in queryset:
-                        cascade_refs.add(ref.id)
-                refs = document_cls.objects(
-                    **{field_name + "__in": self, "pk__nin": cascade_refs}
-                )
-                if await refs.exists():
-                    await refs.delete(write_concern=write_concern, cascade_refs=cascade_refs)
-            elif rule == NULLIFY:
-                await document_cls.objects(**{field_name + "__in": self}).update(
-                    write_concern=write_concern, **{"unset__%s" % field_name: 1}
-                )
-            elif rule == PULL:
-                await document_cls.objects(**{field_name + "__in": self}).update(
-                    write_concern=write_concern, **{"pull_all__%s" % field_name: self}
-                )
-
-        with set_write_concern(queryset._collection, write_concern) as collection:
-            result = await collection.delete_many(queryset._query)
+        with set_write_concern(self._collection, write_concern) as collection:
+            started = perf_counter()
+            result = await collection.delete_many(self._query, session=session)
+            self._invalidate_cache()
+            self._check_slow_query("delete", started, SON([
+                ("delete", collection.name),
+                ("deletes", [{"q": self._query, "limit": 0}]),
+            ]))
 
             # If we're using an unack'd write _queryconcern, we don't really know how
             # many items have been deleted at this point, hence we only return
@@ -465,10 +596,46 @@ class BaseQuerySet:
             if result.acknowledged:
                 return result.deleted_count
 
+    async def _window_ids(self) -> list:
+        """ Ids of the documents in the skip / limit window of the query. """
+        queryset = self.clone()
+        queryset._loaded_fields = QueryFieldList(fields=["_id"])
+        queryset._cursor_obj = None
+        docs = await queryset._cursor.to_list(length=None)
+        return [doc["_id"] for doc in docs]
+
+    async def _delete_ids(self, ids, write_concern, session, chunk_size, chunk_delay):
+        deleted = 0
+        with set_write_concern(self._collection, write_concern) as collection:
+            for i, chunk in enumerate(chunked(ids, chunk_size)):
+                if i and chunk_delay:
+                    await asyncio.sleep(chunk_delay)
+                started = perf_counter()
+                result = await collection.delete_many({"_id": {"$in": chunk}},
+                                                      session=session)
+                self._check_slow_query("delete", started, SON([
+                    ("delete", collection.name),
+                    ("deletes", [{"q": {"_id": {"$in": chunk}}, "limit": 0}]),
+                ]))
+                if not result.acknowledged:
+                    deleted = None
+                elif deleted is not None:
+                    deleted += result.deleted_count
+        self._invalidate_cache()
+        return deleted
+
     async def update(
-            self, upsert=False, multi=True, write_concern=None, full_result=False, **update
+            self, upsert=False, multi=True, write_concern=None, full_result=False,
+            array_filters=None, **update
     ):
-        """Perform an atomic update on the fields matched by the query.
+        """Perform an atomic update on the fields matched by the query::
+
+            await Post.objects.filter(id=post_id).update(
+                inc__views=1, push__tags={'$each': ['new'], '$slice': -10},
+                set__comments__S__read=True)
+
+        See :func:`~aiomongoengine.query_builder.transform.transform_update`
+        for the update operators and paths.
 
         :param upsert: insert if document doesn't exist (default ``False``)
         :param multi: Update multiple documents.
@@ -480,7 +647,9 @@ class BaseQuerySet:
             will force an fsync on the primary server.
         :param full_result: Return the associated ``pymongo.UpdateResult`` rather than just the number
             updated items
-        :param update: Django-style update keyword arguments
+        :param array_filters: filters of the ``$[name]`` positional operators
+        :param update: Django-style update keyword arguments, or
+            ``__raw__`` with an update document or an update pipeline
 
         :returns the number of updated documents (unless ``full_result`` is True)
         """
@@ -493,21 +662,32 @@ class BaseQuerySet:
         queryset = self.clone()
         query = queryset._query
         # TODO add transaction.update
-        update = transform.update(queryset._document, **update)
+        update = transform_update(queryset._document, **update)
 
         # If doing an atomic upsert on an inheritable class
         # then ensure we add _cls to the update operation
-        if upsert and "_cls" in query:
+        if upsert and "_cls" in query and isinstance(update, dict):
             if "$set" in update:
                 update["$set"]["_cls"] = queryset._document._class_name
             else:
                 update["$set"] = {"_cls": queryset._document._class_name}
+        queryset._record_query_shape(find=False)
         try:
             with set_write_concern(queryset._collection, write_concern) as collection:
                 update_func = collection.update_one
                 if multi:
                     update_func = collection.update_many
-                result = await update_func(query, update, upsert=upsert)
+                started = perf_counter()
+                result = await update_func(query, update, upsert=upsert,
+                                           array_filters=array_filters)
+            queryset._invalidate_cache()
+            statement = {"q": query, "u": update, "multi": multi, "upsert": upsert}
+            if array_filters:
+                statement["arrayFilters"] = array_filters
+            queryset._check_slow_query("update", started, SON([
+                ("update", collection.name),
+                ("updates", [statement]),
+            ]))
             if full_result:
                 return result
             elif result.raw_result:
@@ -520,6 +700,59 @@ class BaseQuerySet:
                 raise OperationError(message)
             raise OperationError(u"Update failed (%s)" % six.text_type(err))
 
+    async def update_in_batches(
+            self, batch_size=JOB_BATCH_SIZE, max_ops_per_sec=None,
+            pause_on_replication_lag=None, write_concern=None, **update
+    ):
+        """Update the matched documents one ``_id`` range of `batch_size`
+        documents at a time, for maintenance jobs on large collections
+        which must not stall the secondaries. See
+        :class:`~aiomongoengine.queryset.batch_jobs.BatchJob`.
+
+        :param batch_size: maximum number of documents per ``update_many``.
+        :param max_ops_per_sec: maximum number of documents updated per
+            second, unlimited by default.
+        :param pause_on_replication_lag: pause while the secondaries are more
+            than this many seconds behind the primary.
+        :param write_concern: write concern of every batch.
+        :param update: Django-style update keyword arguments
+
+        :returns the number of updated documents
+        """
+        if not update:
+            raise OperationError("No update parameters, would remove data")
+        job = BatchJob(self, batch_size, max_ops_per_sec, pause_on_replication_lag)
+        return await job.run(
+            lambda queryset: queryset.update(write_concern=write_concern, **update))
+
+    async def delete_in_batches(
+            self, batch_size=JOB_BATCH_SIZE, max_ops_per_sec=None,
+            pause_on_replication_lag=None, write_concern=None
+    ):
+        """Delete the matched documents one ``_id`` range of `batch_size`
+        documents at a time, see :meth:`update_in_batches`.
+
+        :returns the number of deleted documents
+        """
+        job = BatchJob(self, batch_size, max_ops_per_sec, pause_on_replication_lag)
+        return await job.run(
+            lambda queryset: queryset.delete(write_concern=write_concern))
+
+    def batched_inserter(self, max_batch=MAX_BATCH, max_delay_ms=MAX_DELAY_MS,
+                         validate=True, write_concern=None) -> BatchedInserter:
+        """Coalesce the inserts of many coroutines into
+        ``insert_many(ordered=False)`` calls of up to `max_batch` documents,
+        written at most `max_delay_ms` after being added. ::
+
+            async with Event.objects.batched_inserter() as inserter:
+                event_id = await inserter.add(Event(kind='click'))
+
+        Each `add` returns the id of its document, or raises its own error.
+        Documents still waiting are written when the inserter is closed.
+        """
+        return BatchedInserter(self, max_batch, max_delay_ms, validate,
+                               write_concern)
+
     async def upsert_one(self, write_concern=None, **update):
         """Overwrite or add the first document matched by the query.
 
@@ -548,7 +781,123 @@ class BaseQuerySet:
             document = await self._document.objects.with_id(atomic_update.upserted_id)
         return document
 
-    async def update_one(self, upsert=False, write_concern=None, full_result=False, **update):
+    async def upsert_many(
+            self,
+            docs: List['Document'],
+            key: Union[str, Tuple[str, ...]],
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            ordered: bool = False,
+            write_concern=None,
+            validate: bool = True
+    ) -> List[UpsertBatchDict]:
+        """Insert or update many documents, identified by the `key` fields
+        rather than by their id, with one ``bulk_write`` per `batch_size`
+        documents::
+
+            await Product.objects.upsert_many(rows, key=('tenant', 'sku'))
+
+        The fields with a value are ``$set``. The key fields, the id and the
+        fields without a value (None) are only set when the document is
+        inserted, so a partial row doesn't erase the values stored. Documents
+        without id get the id of the document they were inserted as.
+
+        :param docs: the documents to upsert.
+        :param key: name(s) of the field(s) identifying a document.
+        :param batch_size: number of operations per ``bulk_write``.
+        :param ordered: stop at the first error, see
+            :meth:`~pymongo.collection.Collection.bulk_write`.
+        :param write_concern: options of the write concern, eg. ``{'w': 2}``.
+        :param validate: validate the documents first.
+
+        :returns the counts and upserted ids of each batch
+        :raises BulkWriteError: when a batch failed. The batches are not
+            atomic: the ones before, and the writes of the failed batch that
+            succeeded, are kept and their results are in the `results`
+            attribute of the error, the next batches are not written.
+        """
+        keys = (key,) if isinstance(key, str) else tuple(key)
+        db_keys = []
+        for name in keys:
+            field = self._document._fields.get(name)
+            if field is None:
+                raise LookUpError(f"Cannot resolve field {name!r} of "
+                                  f"{self._document._class_name}")
+            db_keys.append(field.db_field)
+
+        operations = []
+        for doc in docs:
+            if validate:
+                doc.validate()
+            son = doc.to_son(on_save=True)
+            on_insert = {}
+            if "_id" in son:
+                on_insert["_id"] = son.pop("_id")
+            query = {}
+            for name, db_key in zip(keys, db_keys):
+                value = son.pop(db_key, None)
+                if value is None:
+                    raise OperationError(f"Can't upsert {doc!r} without a "
+                                         f"value for its key {name!r}")
+                query[db_key] = value
+            for db_field in [f for f, value in son.items() if value is None]:
+                on_insert[db_field] = son.pop(db_field)
+            update = {"$set": son} if son else {}
+            if on_insert:
+                update["$setOnInsert"] = on_insert
+            operations.append(UpdateOne(query, update or {"$set": query},
+                                        upsert=True))
+
+        if write_concern is None:
+            write_concern = {}
+        results = []
+        with set_write_concern(self._collection, write_concern) as collection:
+            for start in range(0, len(operations), batch_size):
+                batch = operations[start:start + batch_size]
+                try:
+                    result = await collection.bulk_write(batch,
+                                                         ordered=ordered)
+                except pymongo.errors.BulkWriteError as err:
+                    # The batches are not atomic: keep what was written
+                    details = err.details or {}
+                    results.append(self._upsert_batch_result(
+                        docs, start, details.get("nMatched", 0),
+                        details.get("nModified", 0),
+                        {item["index"]: item["_id"]
+                         for item in details.get("upserted", ())}))
+                    message = u"Bulk write error: (%s)"
+                    error = BulkWriteError(message % six.text_type(details))
+                    error.details = details
+                    error.results = results
+                    raise error
+                finally:
+                    self._invalidate_cache()
+                results.append(self._upsert_batch_result(
+                    docs, start, result.matched_count, result.modified_count,
+                    result.upserted_ids))
+        return results
+
+    @staticmethod
+    def _upsert_batch_result(docs: List['Document'], start: int,
+                             matched: int, modified: int,
+                             upserted_ids: Dict[int, object]
+                             ) -> UpsertBatchDict:
+        """ The result of the batch of `docs` from `start`, setting the ids
+        of the inserted documents.
+        """
+        upserted_ids = {start + index: _id
+                        for index, _id in upserted_ids.items()}
+        for index, _id in upserted_ids.items():
+            if docs[index].id is None:
+                docs[index].id = _id
+        return UpsertBatchDict(
+            matched=matched,
+            modified=modified,
+            upserted=len(upserted_ids),
+            upserted_ids=upserted_ids
+        )
+
+    async def update_one(self, upsert=False, write_concern=None, full_result=False,
+                         array_filters=None, **update):
         """Perform an atomic update on the fields of the first document
         matched by the query.
 
@@ -561,6 +910,7 @@ class BaseQuerySet:
             will force an fsync on the primary server.
         :param full_result: Return the associated ``pymongo.UpdateResult`` rather than just the number
             updated items
+        :param array_filters: filters of the ``$[name]`` positional operators
         :param update: Django-style update keyword arguments
             full_result
         :returns the number of updated documents (unless ``full_result`` is True)
@@ -570,11 +920,13 @@ class BaseQuerySet:
             multi=False,
             write_concern=write_concern,
             full_result=full_result,
+            array_filters=array_filters,
             **update
         )
 
     async def modify(
-            self, upsert=False, full_response=False, remove=False, new=False, **update
+            self, upsert=False, full_response=False, remove=False, new=False,
+            array_filters=None, **update
     ):
         """Update and return the updated document.
 
@@ -594,6 +946,7 @@ class BaseQuerySet:
         :param remove: remove rather than updating (default ``False``)
         :param new: return updated rather than original document
             (default ``False``)
+        :param array_filters: filters of the ``$[name]`` positional operators
         :param update: Django-style update keyword arguments
         """
 
@@ -606,7 +959,7 @@ class BaseQuerySet:
         queryset = self.clone()
         query = queryset._query
         if not remove:
-            update = transform.update(queryset._document, **update)
+            update = transform_update(queryset._document, **update)
         sort = queryset._ordering
 
         try:
@@ -628,8 +981,10 @@ class BaseQuerySet:
                     upsert=upsert,
                     sort=sort,
                     return_document=return_doc,
+                    array_filters=array_filters,
                     **self._cursor_args
                 )
+            queryset._invalidate_cache()
         except pymongo.errors.DuplicateKeyError as err:
             raise NotUniqueError(u"Update failed (%s)" % err)
         except pymongo.errors.OperationFailure as err:
@@ -659,27 +1014,49 @@ class BaseQuerySet:
             raise InvalidQueryError(msg)
         return await queryset.filter(pk=object_id).first()
 
-    async def in_bulk(self, object_ids):
+    async def in_bulk(self,
+                      object_ids,
+                      chunk_size: int = IN_CHUNK_SIZE,
+                      concurrency: int = IN_CHUNK_CONCURRENCY,
+                      preserve_order: bool = False):
         """Retrieve a set of documents by their ids.
 
+        Ids are sent in chunks of ``chunk_size`` values, at most
+        ``concurrency`` chunks being fetched at the same time.
+
         :param object_ids: a list or tuple of ``ObjectId``
+        :param chunk_size: maximum number of ids sent in a single ``$in``
+        :param concurrency: maximum number of concurrent sub-queries
+        :param preserve_order: when True, the returned dict follows the order
+            of ``object_ids`` instead of the order the server returned.
         :rtype: dict of ObjectIds as keys and collection-specific
                 Document subclasses as values.
         """
-        doc_map = {}
+        object_ids = list(dict.fromkeys(object_ids))
+
+        async def fetch(ids):
+            cursor = self._collection.find({"_id": {"$in": ids}}, **self._cursor_args)
+            return await cursor.to_list(length=None)
+
+        batches = await gather_with_concurrency(
+            concurrency, *(fetch(ids) for ids in chunked(object_ids, chunk_size))
+        )
+        docs = {doc["_id"]: doc for batch in batches for doc in batch}
+        if preserve_order:
+            docs = {_id: docs[_id] for _id in object_ids if _id in docs}
 
-        docs = await self._collection.find({"_id": {"$in": object_ids}}, **self._cursor_args)
+        doc_map = {}
+        only_fields = self.only_fields
         if self._scalar:
-            for doc in docs:
-                doc_map[doc["_id"]] = self._get_scalar(
-                    self._document._from_son(doc, only_fields=self.only_fields)
+            for _id, doc in docs.items():
+                doc_map[_id] = self._get_scalar(
+                    self._document._from_son(doc, only_fields=only_fields)
                 )
         elif self._as_pymongo:
-            for doc in docs:
-                doc_map[doc["_id"]] = doc
+            doc_map = docs
         else:
-            for doc in docs:
-                doc_map[doc["_id"]] = self._document._from_son(doc, only_fields=self.only_fields)
+            for _id, doc in docs.items():
+                doc_map[_id] = self._document._from_son(doc, only_fields=only_fields)
         return doc_map
 
     def none(self):
@@ -744,10 +1121,12 @@ class BaseQuerySet:
             "_hint",
             "_collation",
             "_search_text",
-            "only_fields",
             "_max_time_ms",
             "_comment",
             "_batch_size",
+            "_cache_ttl",
+            "_profiling",
+            "_profile_sink",
         )
 
         for prop in copy_props:
@@ -938,9 +1317,35 @@ class BaseQuerySet:
         """
 
         fields = {f: QueryFieldList.ONLY for f in fields}
-        self.only_fields = fields.keys()
         return self.fields(True, **fields)
 
+    @property
+    def only_fields(self) -> List[str]:
+        """Names of the fields fully loaded by `only()`, `exclude()` or
+        `fields()`, empty when the whole documents are loaded. A field of
+        which only a part is loaded (eg. `author.name`, or a `$slice`) is
+        not fully loaded.
+        """
+        loaded = self._loaded_fields
+        fields = loaded.fields - loaded.always_include - set(loaded.slice)
+        if not fields and not loaded.slice and loaded._id is None:
+            return []
+        roots = {path.split('.')[0] for path in fields}
+        partial = {path.split('.')[0] for path in loaded.slice}
+        partial.update(path.split('.')[0] for path in fields if '.' in path)
+        db_fields = self._document._db_field_map
+        if loaded.value == QueryFieldList.ONLY and fields:
+            names = {name for name, db_field in db_fields.items()
+                     if db_field in roots - partial}
+            if loaded._id != QueryFieldList.EXCLUDE:
+                names.add('id')
+        else:
+            names = {name for name, db_field in db_fields.items()
+                     if db_field not in roots | partial}
+        if loaded._id == QueryFieldList.EXCLUDE:
+            names.discard('id')
+        return sorted(names)
+
     def exclude(self, *fields):
         """Opposite to .only(), exclude some document's fields. ::
 
@@ -1165,8 +1570,9 @@ class BaseQuerySet:
     def from_json(self, json_data):
         """Converts json data to unsaved objects"""
         son_data = json_util.loads(json_data)
+        only_fields = self.only_fields
         return [
-            self._document._from_son(data, only_fields=self.only_fields)
+            self._document._from_son(data, only_fields=only_fields)
             for data in son_data
         ]
 
@@ -1192,12 +1598,74 @@ class BaseQuerySet:
 
         pipeline = initial_pipeline + list(pipeline)
 
+        collection = self._collection
         if self._read_preference is not None:
-            return await self._collection \
-                .with_options(read_preference=self._read_preference) \
-                .aggregate(pipeline, cursor={}, **kwargs)
+            collection = collection.with_options(
+                read_preference=self._read_preference)
+
+        command = SON([
+            ("aggregate", collection.name),
+            ("pipeline", pipeline),
+            ("cursor", {}),
+        ])
+        capture_query("aggregate", collection.name, pipeline,
+                      partial(self._explain_command, command))
+        started = perf_counter()
+        cursor = collection.aggregate(pipeline, cursor={}, **kwargs)
+        result = await cursor.to_list(length=None)
+        self._check_slow_query("aggregate", started, command)
+        return result
 
-        return await self._collection.aggregate(pipeline, cursor={}, **kwargs)
+    def watch(self,
+              full_document: Union[str, None] = 'updateLookup',
+              resume_after: dict = None,
+              start_after: dict = None,
+              operation_types: List[str] = None,
+              pipeline: List[dict] = None,
+              **kwargs) -> ChangeStream:
+        """Follow the changes of the documents matched by the queryset::
+
+            async for change in User.objects.filter(age__gte=18).watch():
+                print(change.operation_type, change.document)
+                save_token(change.resume_token)
+
+        The query is matched against the ``fullDocument`` of the changes.
+        Deletes, and updates when `full_document` is None, have none: a
+        filtered queryset returns all of them, whether the document matched
+        the query or not.
+
+        :param full_document: ``'updateLookup'`` to decode the current
+            version of updated documents, see
+            :meth:`motor.motor_asyncio.AsyncIOMotorCollection.watch`.
+        :param resume_after: resume token of a previous change.
+        :param start_after: like `resume_after`, also after invalidations.
+        :param operation_types: only return these changes,
+            eg. ``['insert', 'update']``.
+        :param pipeline: extra stages run on the changes.
+        :param kwargs: passed to ``watch``, eg. ``max_await_time_ms``.
+        """
+        match = prefix_query(self._query, "fullDocument")
+        if match:
+            unmatched = ["delete"]
+            if full_document not in ("updateLookup", "whenAvailable",
+                                     "required"):
+                unmatched.append("update")
+            if operation_types:
+                unmatched = [op for op in unmatched if op in operation_types]
+            if unmatched:
+                match = {"$or": [match,
+                                 {"operationType": {"$in": unmatched}}]}
+        if operation_types:
+            match["operationType"] = {"$in": list(operation_types)}
+        stages = [{"$match": match}] if match else []
+        stages.extend(pipeline or ())
+        if full_document is not None:
+            kwargs["full_document"] = full_document
+        if resume_after is not None:
+            kwargs["resume_after"] = resume_after
+        if start_after is not None:
+            kwargs["start_after"] = start_after
+        return ChangeStream(self.clone(), stages, **kwargs)
 
     # JS functionality
     def map_reduce(
@@ -1537,6 +2005,8 @@ class BaseQuerySet:
         if self._comment is not None:
             self._cursor_obj.comment(self._comment)
 
+        capture_query("find", self._document.__collection__, self._query,
+                      self._cursor_obj.explain)
         return self._cursor_obj
 
     def __deepcopy__(self, memo):
@@ -1722,6 +2192,184 @@ class BaseQuerySet:
 
         return db_field_paths
 
+    def _split_in_query(self, chunk_size: int = IN_CHUNK_SIZE) -> Union[List[dict], None]:
+        """Split the query into sub-queries when it filters ``_id`` with an
+        ``$in`` of more than ``chunk_size`` values, eg. ``filter(id__in=ids)``.
+
+        Only ``_id`` is split: documents can't match values of two different
+        chunks, so merging the sub-results never yields duplicates. Returns
+        None when the query can't (or doesn't need to) be split.
+        """
+        if self._none or self._skip or self._where_clause or self._search_text:
+            return None
+
+        query = self._query
+        values = self._id_in_values(query)
+        if values is None:
+            return None
+
+        values = list(dict.fromkeys(values))
+        if len(values) <= chunk_size:
+            return None
+
+        return [
+            self._replace_id_in(query, chunk)
+            for chunk in chunked(values, chunk_size)
+        ]
+
+    @classmethod
+    def _id_in_values(cls, query: dict) -> Union[list, None]:
+        """Values of the ``_id`` ``$in`` of `query`, at its top level or in
+        its ``$and`` (filters compile to ``{'$and': [...]}``).
+        """
+        condition = query.get("_id")
+        if isinstance(condition, dict) and isinstance(condition.get("$in"), (list, tuple)):
+            return condition["$in"]
+        for operand in query.get("$and") or ():
+            values = cls._id_in_values(operand)
+            if values is not None:
+                return values
+        return None
+
+    @classmethod
+    def _replace_id_in(cls, query: dict, values: list) -> Union[dict, None]:
+        """ `query` with the values found by `_id_in_values` replaced. """
+        condition = query.get("_id")
+        if isinstance(condition, dict) and isinstance(condition.get("$in"), (list, tuple)):
+            return dict(query, _id=dict(condition, **{"$in": values}))
+        operands = list(query.get("$and") or ())
+        for index, operand in enumerate(operands):
+            replaced = cls._replace_id_in(operand, values)
+            if replaced is not None:
+                operands[index] = replaced
+                return dict(query, **{"$and": operands})
+        return None
+
+    def _find_in_replica(self) -> Union[List[dict], None]:
+        """Answer the query from the in-memory replica of a collection with
+        ``meta = {'replicated': True}``. Returns None when the collection is
+        not replicated or the query needs the server.
+        """
+        if not self._document._meta.get("replicated"):
+            return None
+
+        replica = get_replica(self._document)
+        if (replica is None or self._none or self._loaded_fields
+                or self._where_clause or self._hint != -1
+                or self._collation is not None):
+            return None
+
+        ordering = self._get_effective_ordering()
+        if ordering and not all(isinstance(d, int) for _, d in ordering):
+            return None
+
+        raw_docs = replica.find(self._query)
+        if raw_docs is None:
+            return None
+
+        if ordering:
+            sort_son_documents(raw_docs, ordering)
+        raw_docs = raw_docs[self._skip or 0:]
+        if self._limit:
+            raw_docs = raw_docs[:self._limit]
+        return raw_docs
+
+    async def _chunked_find(self, queries: List[dict]) -> List[dict]:
+        """Run ``queries`` concurrently with the options of this queryset and
+        merge their raw documents, keeping the requested ordering and limit.
+        """
+
+        async def fetch(query):
+            queryset = self.clone()
+            queryset._mongo_query = query
+            queryset._cursor_obj = None
+            return await queryset._cursor.to_list(length=None)
+
+        batches = await gather_with_concurrency(
+            IN_CHUNK_CONCURRENCY, *(fetch(query) for query in queries)
+        )
+        raw_docs = [doc for batch in batches for doc in batch]
+
+        ordering = self._get_effective_ordering()
+        if ordering and all(isinstance(d, int) for _, d in ordering):
+            sort_son_documents(raw_docs, ordering)
+
+        if self._limit:
+            raw_docs = raw_docs[:self._limit]
+        return raw_docs
+
+    def _get_effective_ordering(self) -> Union[list, None]:
+        """Return the ordering applied to the cursor: the explicit one, or
+        the document's default ``meta['ordering']``.
+        """
+        if self._ordering is None and self._document._meta["ordering"]:
+            return self._get_order_by(self._document._meta["ordering"])
+        return self._ordering
+
+    def _get_cache_key(self) -> Union[str, None]:
+        """Key of this queryset's results in the result cache, None when the
+        results can't be cached.
+        """
+        if self._where_clause:
+            return None
+        return ResultCache.make_key(
+            self._collection.full_name,
+            self._query,
+            self._cursor_args.get("projection"),
+            self._get_effective_ordering(),
+            self._skip,
+            self._limit,
+            self._collation,
+            None if self._hint == -1 else self._hint
+        )
+
+    def _invalidate_cache(self):
+        """Drop the cached results and mark the replica of this queryset's
+        collection stale.
+        """
+        get_result_cache().invalidate(self._document.__collection__)
+        invalidate_replica(self._document)
+
+    def _record_query_shape(self, find: bool = True):
+        """Record the shape of this queryset's query for the index advisor,
+        with its ordering and projection when it is a `find`.
+        """
+        advisor = get_index_advisor()
+        if not advisor.recording:
+            return
+        if find:
+            advisor.record(self._document, self._query,
+                           self._get_effective_ordering(),
+                           self._cursor_args.get("projection"))
+        else:
+            advisor.record(self._document, self._query)
+
+    def _check_slow_query(self, operation: str, started: float,
+                          command: SON = None):
+        """Report this queryset's `operation` if it ran longer than the slow
+        query threshold, see :mod:`aiomongoengine.slow_query`.
+
+        :param started: ``perf_counter()`` when the operation started.
+        :param command: the command to explain, the find of this queryset
+            when None.
+        """
+        duration = perf_counter() - started
+        if not is_slow_query(duration):
+            return
+        if command is None:
+            queryset = self.clone()
+            queryset._cursor_obj = None
+            explain = queryset.explain
+        else:
+            explain = partial(self._explain_command, command)
+        record_slow_query(self._document._class_name,
+                          self._document.__collection__,
+                          operation, duration, self._query, explain)
+
+    async def _explain_command(self, command: SON) -> dict:
+        return await self._collection.database.command(
+            SON([("explain", command), ("verbosity", "executionStats")]))
+
     def _get_order_by(self, keys):
         """Given a list of MongoEngine-style sort keys, return a list
         of sorting tuples that can be applied to a PyMongo cursor. For
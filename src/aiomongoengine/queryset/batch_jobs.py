@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from copy import deepcopy
+from time import monotonic
+from typing import Awaitable
+from typing import Callable
+from typing import TYPE_CHECKING
+from typing import Union
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from aiomongoengine.errors import InvalidQueryError
+from aiomongoengine.query_builder.node import Q
+
+if TYPE_CHECKING:
+    from motor.core import AgnosticClient
+    from aiomongoengine.queryset.base import BaseQuerySet
+
+__all__ = ('BatchJob', 'replication_lag')
+
+logger = logging.getLogger(__name__)
+
+JOB_BATCH_SIZE = 1000
+# Seconds between two replSetGetStatus while waiting for the secondaries
+LAG_CHECK_INTERVAL = 1.0
+
+# Replica set member states
+PRIMARY = 1
+SECONDARY = 2
+
+
+async def replication_lag(client: 'AgnosticClient') -> Union[float, None]:
+    """Seconds the most lagging secondary is behind the primary, from
+    ``replSetGetStatus``.
+
+    :returns: None when the lag can't be known: not a replica set, no
+        primary, or not allowed to run the command.
+    """
+    try:
+        status = await client.admin.command('replSetGetStatus')
+    except OperationFailure:
+        return None
+    members = status.get('members') or []
+    primary = next((member['optimeDate'] for member in members
+                    if member.get('state') == PRIMARY), None)
+    if primary is None:
+        return None
+    secondaries = [member['optimeDate'] for member in members
+                   if member.get('state') == SECONDARY]
+    if not secondaries:
+        return 0.0
+    return max((primary - min(secondaries)).total_seconds(), 0.0)
+
+
+class BatchJob(object):
+    """Apply a write to the documents matched by a queryset one ``_id``
+    range at a time, see
+    :meth:`~aiomongoengine.queryset.BaseQuerySet.update_in_batches`.
+
+    Each batch fetches the next `batch_size` ids (``_id`` only projection,
+    sorted on ``_id``), then writes to the range they span, so a batch is
+    a single ``update_many`` or ``delete_many`` served by the ``_id``
+    index. Between batches the job sleeps to stay under `max_ops_per_sec`
+    documents per second, and waits while the secondaries are more than
+    `pause_on_replication_lag` seconds behind the primary.
+    """
+
+    def __init__(self,
+                 queryset: 'BaseQuerySet',
+                 batch_size: int = JOB_BATCH_SIZE,
+                 max_ops_per_sec: float = None,
+                 pause_on_replication_lag: float = None,
+                 lag_check_interval: float = LAG_CHECK_INTERVAL):
+        """
+        :param queryset: the documents to write to.
+        :param batch_size: maximum number of documents per batch.
+        :param max_ops_per_sec: maximum number of documents written per
+            second, unlimited by default.
+        :param pause_on_replication_lag: maximum replication lag in seconds
+            before pausing, the lag is not checked by default.
+        :param lag_check_interval: seconds between two lag checks while
+            paused.
+        """
+        if queryset._skip or queryset._limit:
+            raise InvalidQueryError(
+                "Batch jobs can't be used with skip() or limit()")
+        self._queryset = queryset
+        self.batch_size = batch_size
+        self.max_ops_per_sec = max_ops_per_sec
+        self.pause_on_replication_lag = pause_on_replication_lag
+        self.lag_check_interval = lag_check_interval
+        self.batches = 0
+        self.documents = 0
+
+    async def run(self,
+                  apply: Callable[['BaseQuerySet'], Awaitable[Union[int, None]]]
+                  ) -> int:
+        """Call `apply` with a queryset restricted to each batch.
+
+        :returns: the sum of what `apply` returned.
+        """
+        started = monotonic()
+        total = 0
+        last_id = None
+        while True:
+            await self._wait_for_replication()
+            ids = await self._next_ids(last_id)
+            if not ids:
+                break
+            count = await apply(
+                self._restrict({'$gte': ids[0], '$lte': ids[-1]}))
+            total += count or 0
+            self.batches += 1
+            self.documents += len(ids)
+            if len(ids) < self.batch_size:
+                break
+            last_id = ids[-1]
+            await self._throttle(started)
+        return total
+
+    def _restrict(self, id_range: dict) -> 'BaseQuerySet':
+        """The queryset of the job restricted to the ``_id`` range
+        `id_range`. ``filter()`` would add the range to the Q shared with the
+        job's queryset, so the range is added to a copy of the Q.
+        """
+        queryset = self._queryset.clone()
+        queryset._query_obj = deepcopy(self._queryset._query_obj) & \
+            Q(raw={'_id': id_range})
+        queryset._mongo_query = None
+        queryset._cursor_obj = None
+        return queryset
+
+    async def _next_ids(self, last_id) -> list:
+        if last_id is not None:
+            queryset = self._restrict({'$gt': last_id})
+        else:
+            queryset = self._queryset.clone()
+        queryset._ordering = [('_id', ASCENDING)]
+        queryset._limit = self.batch_size
+        return await queryset._window_ids()
+
+    async def _throttle(self, started: float):
+        if not self.max_ops_per_sec:
+            return
+        delay = started + self.documents / self.max_ops_per_sec - monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _wait_for_replication(self):
+        if self.pause_on_replication_lag is None:
+            return
+        collection = self._queryset._collection
+        while True:
+            lag = await replication_lag(collection.database.client)
+            if lag is None or lag <= self.pause_on_replication_lag:
+                return
+            logger.info("Secondaries are %.1fs behind, pausing the batch job "
+                        "on %s", lag, collection.name)
+            await asyncio.sleep(self.lag_check_interval)
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+from typing import Dict
+from typing import List
+from typing import Set
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
+
+from pymongo.errors import BulkWriteError
+from pymongo.errors import PyMongoError
+
+from aiomongoengine.context_managers import set_write_concern
+from aiomongoengine.errors import NotUniqueError
+from aiomongoengine.errors import OperationError
+
+if TYPE_CHECKING:
+    from bson import ObjectId
+    from aiomongoengine.document import Document
+    from aiomongoengine.queryset.base import BaseQuerySet
+
+__all__ = ('BatchedInserter', 'BufferedWriter')
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = 500
+MAX_DELAY_MS = 20
+# Error codes of duplicate keys
+DUPLICATE_KEY_CODES = (11000, 11001)
+
+_Pending = Tuple['Document', dict, asyncio.Future]
+
+
+def write_error(error: dict) -> OperationError:
+    """ Exception for a `writeErrors` item of a bulk write. """
+    if error.get('code') in DUPLICATE_KEY_CODES:
+        return NotUniqueError(
+            f"Tried to save duplicate unique keys ({error.get('errmsg')})")
+    return OperationError(f"Could not save document ({error.get('errmsg')})")
+
+
+class BufferedWriter(object):
+    """Base of the writers buffering in memory what they are given, and
+    writing it in the background: once enough is waiting, or a delay after
+    the first item was buffered.
+
+    Subclasses call :meth:`_schedule` after buffering, and implement
+    :meth:`_take_pending` and the coroutine :meth:`_write`.
+    """
+
+    def __init__(self):
+        self._timer = None  # type: Union[asyncio.TimerHandle, None]
+        self._writes = set()  # type: Set[asyncio.Future]
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def flush(self):
+        """ Write what is waiting, and wait for the pending writes. """
+        self._write_pending()
+        while self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def close(self):
+        """ Stop accepting writes, and write what is waiting. """
+        self._closed = True
+        await self.flush()
+
+    def _schedule(self, delay_ms: float, full: bool = False):
+        """ Write what is waiting now when `full`, else within `delay_ms`. """
+        if full:
+            self._write_pending()
+        elif self._timer is None and not self._closed:
+            self._timer = asyncio.get_running_loop().call_later(
+                delay_ms / 1000, self._write_pending)
+
+    def _take_pending(self) -> list:
+        """ Remove what is waiting, as the list of the writes to start. """
+        raise NotImplementedError()
+
+    async def _write(self, pending):
+        raise NotImplementedError()
+
+    def _write_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for pending in self._take_pending():
+            task = asyncio.ensure_future(self._write(pending))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+
+class BatchedInserter(BufferedWriter):
+    """Insert the documents added by many coroutines with a few
+    ``insert_many(ordered=False)``, see
+    :meth:`~aiomongoengine.queryset.BaseQuerySet.batched_inserter`. ::
+
+        async with User.objects.batched_inserter() as inserter:
+            user_id = await inserter.add(User(name='Ann'))
+
+    The documents added are written together once `max_batch` of them are
+    waiting, or `max_delay_ms` after the first one was added. Each
+    :meth:`add` returns once its document was written: with its id, or
+    raising its own error (eg. :class:`~aiomongoengine.errors.NotUniqueError`)
+    without failing the other documents of the batch.
+    """
+
+    def __init__(self,
+                 queryset: 'BaseQuerySet',
+                 max_batch: int = MAX_BATCH,
+                 max_delay_ms: float = MAX_DELAY_MS,
+                 validate: bool = True,
+                 write_concern: dict = None):
+        """
+        :param queryset: queryset of the collection to insert to.
+        :param max_batch: maximum number of documents per insert.
+        :param max_delay_ms: maximum milliseconds a document waits for its
+            batch to be written.
+        :param validate: validate the documents when added.
+        :param write_concern: write concern of the inserts.
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        super().__init__()
+        self._queryset = queryset
+        self.max_batch = max_batch
+        self.max_delay_ms = max_delay_ms
+        self.validate = validate
+        self.write_concern = write_concern or {}
+        self._pending = []  # type: List[_Pending]
+        self.batches = 0
+        self.documents = 0
+
+    async def add(self, document: 'Document') -> 'ObjectId':
+        """ Insert `document` with the next batch, and return its id. """
+        if self._closed:
+            raise OperationError("The batched inserter is closed")
+        if document.id is not None:
+            raise OperationError(
+                "Documents with an id can't be batch inserted, use save()")
+        if self.validate:
+            document.validate()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((document, document.to_son(on_save=True),
+                              future))
+        self._schedule(self.max_delay_ms,
+                       len(self._pending) >= self.max_batch)
+        return await future
+
+    def _take_pending(self) -> List[List[_Pending]]:
+        pending, self._pending = self._pending, []
+        return [pending[start:start + self.max_batch]
+                for start in range(0, len(pending), self.max_batch)]
+
+    async def _write(self, batch: List[_Pending]):
+        sons = [son for _, son, _ in batch]
+        errors = {}  # type: Dict[int, Exception]
+        try:
+            with set_write_concern(self._queryset._collection,
+                                   self.write_concern) as collection:
+                await collection.insert_many(sons, ordered=False)
+        except BulkWriteError as error:
+            details = error.details or {}
+            for item in details.get('writeErrors', ()):
+                errors[item['index']] = write_error(item)
+            concern_errors = details.get('writeConcernErrors')
+            if concern_errors:
+                failure = OperationError(
+                    f"Write concern not satisfied ({concern_errors})")
+                errors.update((index, failure) for index in range(len(batch))
+                              if index not in errors)
+        except PyMongoError as error:
+            failure = OperationError(f"Could not save documents ({error})")
+            errors = dict.fromkeys(range(len(batch)), failure)
+        except Exception as error:
+            errors = dict.fromkeys(range(len(batch)), error)
+        self._queryset._invalidate_cache()
+        self.batches += 1
+        self.documents += len(batch) - len(errors)
+
+        # insert_many sets the _id of the sons
+        for index, (document, son, future) in enumerate(batch):
+            if index not in errors:
+                document.id = son['_id']
+                document._clear_changes()
+            if future.done():
+                # The caller was cancelled
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(son['_id'])
+        if errors:
+            logger.debug("%d of %d batched inserts into %s failed",
+                         len(errors), len(batch),
+                         self._queryset._collection.name)
@@ -0,0 +1,225 @@
+import time
+from collections import defaultdict
+from collections import OrderedDict
+from typing import Dict
+from typing import List
+from typing import Set
+from typing import Union
+
+from bson import BSON
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from pymongo.collation import Collation
+from typing_extensions import TypedDict
+
+from ..errors import InvalidQueryError
+from ..query_builder.predicate import compile_query
+
+__all__ = ('ResultCache', 'ResultCacheStats', 'get_result_cache')
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResultCacheStats(TypedDict):
+    entries: int
+    bytes: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+
+
+class _Entry(object):
+    __slots__ = ('collection', 'expires_at', 'size', 'payload',
+                 'codec_options', 'query', 'ids', '_match')
+
+    def __init__(self, collection, expires_at, payload, codec_options,
+                 query=None, ids=None):
+        self.collection = collection
+        self.expires_at = expires_at
+        self.payload = payload
+        self.size = sum(len(raw) for raw in payload)
+        self.codec_options = codec_options
+        self.query = query
+        self.ids = ids
+        self._match = None
+
+    def is_affected_by(self, son: dict) -> bool:
+        """ Whether writing `son` may change the cached result. """
+        if self.query is None or self.ids is None:
+            return True
+        if son.get('_id') in self.ids:
+            return True
+        if self._match is None:
+            try:
+                self._match = compile_query(self.query)
+            except InvalidQueryError:
+                self.query = None
+                return True
+        return self._match(son)
+
+
+class ResultCache(object):
+    """In-process LRU cache of raw query results, bounded by a number of
+    entries and by the BSON size of the cached documents.
+
+    Entries are stored BSON encoded, so every hit decodes fresh documents that
+    can be mutated freely by the caller. Entries expire after the ttl given
+    when they were stored. Writes drop the entries of their collection through
+    :meth:`invalidate`, or only the entries a single written document may
+    change through :meth:`invalidate_document`.
+    """
+
+    def __init__(self,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param max_entries: maximum number of cached results.
+        :param max_bytes: maximum BSON size of all cached documents.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # type: OrderedDict[str, _Entry]
+        self._collection_keys = defaultdict(set)  # type: Dict[str, Set[str]]
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(collection_name: str,
+                 query: dict,
+                 projection: dict = None,
+                 sort: list = None,
+                 skip: int = None,
+                 limit: int = None,
+                 collation: Union[dict, Collation] = None,
+                 hint: Union[str, list] = None) -> Union[str, None]:
+        """ Build the cache key of a query, None if it can't be cached. """
+        if isinstance(collation, Collation):
+            collation = collation.document
+        try:
+            return json_util.dumps(
+                [collection_name, query, projection, sort, skip, limit,
+                 collation, hint],
+                sort_keys=True
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, key: str) -> Union[List[dict], None]:
+        """ Return the cached documents of `key` or None on a miss. """
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._remove(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return [BSON(raw).decode(entry.codec_options) for raw in entry.payload]
+
+    def set(self,
+            key: str,
+            collection_name: str,
+            docs: List[dict],
+            ttl: float,
+            codec_options: CodecOptions = DEFAULT_CODEC_OPTIONS,
+            query: dict = None):
+        """ Cache `docs` under `key` for `ttl` seconds.
+
+        :param query: the query `docs` are the result of. When given, single
+            document writes (see :meth:`invalidate_document`) only drop the
+            entry if the written document matches it or is part of `docs`.
+            Leave it out for results that depend on documents outside of
+            them, eg. results of a skipped query.
+        """
+        if key in self._entries:
+            self._remove(key)
+
+        payload = [BSON.encode(doc, codec_options=codec_options) for doc in docs]
+        ids = None
+        if query is not None and all('_id' in doc for doc in docs):
+            ids = {doc['_id'] for doc in docs}
+        entry = _Entry(collection_name, time.monotonic() + ttl, payload,
+                       codec_options, query, ids)
+        if entry.size > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self._collection_keys[collection_name].add(key)
+        self.bytes += entry.size
+
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 self.bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, collection_name: str):
+        """ Drop every cached result of `collection_name`. """
+        keys = self._collection_keys.pop(collection_name, set())
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+
+    def invalidate_document(self, collection_name: str, son: dict):
+        """Drop the cached results of `collection_name` that writing the
+        document `son` (with its `_id`) may change.
+        """
+        keys = [key for key in self._collection_keys.get(collection_name, ())
+                if self._entries[key].is_affected_by(son)]
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+
+    def clear(self):
+        """ Drop every cached result and reset the counters. """
+        self._entries.clear()
+        self._collection_keys.clear()
+        self.bytes = self.hits = self.misses = 0
+        self.evictions = self.invalidations = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> ResultCacheStats:
+        return ResultCacheStats(
+            entries=len(self._entries),
+            bytes=self.bytes,
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hit_ratio,
+            evictions=self.evictions,
+            invalidations=self.invalidations
+        )
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        keys = self._collection_keys.get(entry.collection)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._collection_keys[entry.collection]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_result_cache = ResultCache()
+
+
+def get_result_cache() -> ResultCache:
+    """ Return the process wide cache used by `QuerySet.cached()`. """
+    return _result_cache
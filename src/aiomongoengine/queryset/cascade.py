@@ -0,0 +1,271 @@
+from collections import defaultdict
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Set
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from aiomongoengine.connection import get_document
+from aiomongoengine.context_managers import set_write_concern
+from aiomongoengine.errors import OperationError
+from aiomongoengine.fields.reference_field import RECURSIVE_REFERENCE_CONSTANT
+from aiomongoengine.queryset.cache import get_result_cache
+from aiomongoengine.replication import invalidate_replica
+from aiomongoengine.utils import chunked
+from aiomongoengine.utils import gather_with_concurrency
+
+if TYPE_CHECKING:
+    from motor.core import AgnosticClientSession
+    from aiomongoengine import Document
+
+__all__ = ('DO_NOTHING', 'NULLIFY', 'CASCADE', 'DENY', 'PULL',
+           'CascadePlan', 'CascadePlanner', 'register_delete_rule',
+           'register_delete_rules')
+
+# Delete rules
+DO_NOTHING = 0
+NULLIFY = 1
+CASCADE = 2
+DENY = 3
+PULL = 4
+
+# Maximum number of documents a delete may cascade to
+DEFAULT_MAX_CASCADE = 100000
+CASCADE_BATCH_SIZE = 1000
+CASCADE_CONCURRENCY = 4
+
+# Rules waiting for the Document class they reference by name to be defined
+_pending_rules = defaultdict(list)  # type: Dict[str, List[Tuple]]
+
+
+def register_delete_rule(document: 'Document', referencing: 'Document',
+                         field_name: str, rule: int):
+    """ Apply `rule` to `referencing.field_name` when `document`s are
+    deleted.
+    """
+    # Subclasses share their parent's rules until they get their own
+    rules = dict(document._meta.get('delete_rules') or {})
+    rules[(referencing, field_name)] = rule
+    document._meta['delete_rules'] = rules
+
+
+def register_delete_rules(document: 'Document'):
+    """Register the ``reverse_delete_rule`` of the reference fields (and
+    lists of references) of a new Document class, and the pending rules of
+    the fields referencing it by name.
+    """
+    for field_name, field in document._fields.items():
+        if field.owner_document is not document:
+            continue
+        reference = getattr(field, '_base_field', field)
+        rule = getattr(reference, 'reverse_delete_rule', DO_NOTHING)
+        if rule == DO_NOTHING:
+            continue
+        if reference.owner_document is None:
+            reference.owner_document = document
+        name = reference.document_type_obj
+        if isinstance(name, str) and name != RECURSIVE_REFERENCE_CONSTANT \
+                and get_document(name) is None:
+            _pending_rules[name].append((document, field_name, rule))
+        else:
+            register_delete_rule(reference.reference_type, document,
+                                 field_name, rule)
+
+    for referencing, field_name, rule in \
+            _pending_rules.pop(document._class_name, ()):
+        register_delete_rule(document, referencing, field_name, rule)
+
+
+class CascadePlan(object):
+    """The documents a delete removes and updates, found before anything is
+    written:
+
+    * `deletes`: per level (0 being the deleted queryset, 1 the documents
+      it cascades to...), the Document classes and ids to delete.
+    * `updates`: (Document class, field name, rule, ids) of the NULLIFY and
+      PULL rules, `ids` being the deleted ids the field refers to.
+    """
+
+    def __init__(self):
+        self.deletes = []  # type: List[List[Tuple['Document', List[Any]]]]
+        self.updates = []  # type: List[Tuple['Document', str, int, List[Any]]]
+
+    @property
+    def total(self) -> int:
+        """ Number of documents deleted. """
+        return sum(len(ids) for level in self.deletes for _, ids in level)
+
+    @property
+    def cascaded(self) -> int:
+        """ Number of documents deleted by CASCADE rules (level 1 on). """
+        return sum(len(ids) for level in self.deletes[1:] for _, ids in level)
+
+
+class CascadePlanner(object):
+    """Delete documents and apply the delete rules of their class as set
+    operations: the ids of the deleted documents are fetched once (with an
+    ``_id`` only projection), then every rule runs as batched ``$in``
+    queries, the rules of a level concurrently.
+
+    Nothing is written before all the DENY rules passed and the number of
+    cascaded documents is known to be at most `max_documents`. Pass a
+    `session` to run everything in its transaction.
+    """
+
+    def __init__(self,
+                 max_documents: int = DEFAULT_MAX_CASCADE,
+                 batch_size: int = CASCADE_BATCH_SIZE,
+                 concurrency: int = CASCADE_CONCURRENCY,
+                 session: 'AgnosticClientSession' = None):
+        """
+        :param max_documents: maximum number of documents deleted by the
+            CASCADE rules, the deleted queryset excluded.
+        :param batch_size: maximum number of ids per ``$in`` query.
+        :param concurrency: maximum number of queries run at once.
+        :param session: optional session, to run in its transaction.
+        """
+        self.max_documents = max_documents
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.session = session
+
+    async def fetch_ids(self, document: 'Document', query: dict) -> List[Any]:
+        cursor = document._get_collection().find(
+            query, projection={'_id': 1}, session=self.session)
+        return [doc['_id'] for doc in await cursor.to_list(length=None)]
+
+    async def plan(self, document: 'Document', ids: List[Any]) -> CascadePlan:
+        """ Find what deleting the `document`s with `ids` implies. """
+        plan = CascadePlan()
+        seen = defaultdict(set)  # type: Dict[str, Set[Any]]
+        seen[document.__collection__].update(ids)
+        level = [(document, list(ids))]
+        while level:
+            plan.deletes.append(level)
+            self._check_fan_out(plan)
+
+            denies, cascades = [], []
+            for deleted, deleted_ids in level:
+                for (referencing, field_name), rule in \
+                        (deleted._meta.get('delete_rules') or {}).items():
+                    if referencing._meta.get('abstract'):
+                        continue
+                    if rule == DENY:
+                        denies.append(self._deny(
+                            referencing, field_name, deleted_ids))
+                    elif rule == CASCADE:
+                        cascades.append((referencing, self._referencing_ids(
+                            referencing, field_name, deleted_ids)))
+                    elif rule in (NULLIFY, PULL):
+                        plan.updates.append(
+                            (referencing, field_name, rule, deleted_ids))
+            results = await gather_with_concurrency(
+                self.concurrency, *denies,
+                *(check for _, check in cascades))
+
+            found = defaultdict(set)  # type: Dict['Document', Set[Any]]
+            for (referencing, _), result in zip(cascades,
+                                                results[len(denies):]):
+                found[referencing].update(result)
+            level = []
+            for referencing, referencing_ids in found.items():
+                new_ids = referencing_ids - seen[referencing.__collection__]
+                if new_ids:
+                    seen[referencing.__collection__].update(new_ids)
+                    level.append((referencing, list(new_ids)))
+        return plan
+
+    async def execute(self, plan: CascadePlan, write_concern: dict = None):
+        """Apply the NULLIFY and PULL rules, then delete the documents,
+        the deepest level first.
+
+        :returns: the number of documents of level 0 deleted, None for
+            unacknowledged writes.
+        """
+        await gather_with_concurrency(self.concurrency, *(
+            self._update(referencing, field_name, rule, chunk, write_concern)
+            for referencing, field_name, rule, ids in plan.updates
+            for chunk in chunked(ids, self.batch_size)
+        ))
+
+        counts = []
+        for level in reversed(plan.deletes):
+            counts = await gather_with_concurrency(self.concurrency, *(
+                self._delete(document, chunk, write_concern)
+                for document, ids in level
+                for chunk in chunked(ids, self.batch_size)
+            ))
+        return None if None in counts else sum(counts)
+
+    async def delete(self, document: 'Document', query: dict,
+                     write_concern: dict = None, exclude=None):
+        """ Delete the `document`s matched by `query` with their rules. """
+        ids = await self.fetch_ids(document, query)
+        if exclude:
+            ids = [_id for _id in ids if _id not in exclude]
+        plan = await self.plan(document, ids)
+        return await self.execute(plan, write_concern)
+
+    def _check_fan_out(self, plan: CascadePlan):
+        cascaded = plan.cascaded
+        if cascaded > self.max_documents:
+            raise OperationError(
+                f"Could not delete documents, the delete would cascade to "
+                f"{cascaded} documents (more than {self.max_documents})")
+
+    async def _deny(self, referencing: 'Document', field_name: str,
+                    ids: List[Any]):
+        db_field = referencing._fields[field_name].db_field
+        collection = referencing._get_collection()
+
+        async def check(chunk):
+            ref = await collection.find_one({db_field: {'$in': chunk}},
+                                            projection={'_id': 1},
+                                            session=self.session)
+            if ref is not None:
+                raise OperationError(
+                    "Could not delete document (%s.%s refers to it)"
+                    % (referencing.__name__, field_name))
+
+        await gather_with_concurrency(self.concurrency, *(
+            check(chunk) for chunk in chunked(ids, self.batch_size)))
+
+    async def _referencing_ids(self, referencing: 'Document',
+                               field_name: str, ids: List[Any]) -> Set[Any]:
+        db_field = referencing._fields[field_name].db_field
+        collection = referencing._get_collection()
+
+        async def fetch(chunk):
+            cursor = collection.find({db_field: {'$in': chunk}},
+                                     projection={'_id': 1},
+                                     session=self.session)
+            return [doc['_id'] for doc in await cursor.to_list(length=None)]
+
+        batches = await gather_with_concurrency(self.concurrency, *(
+            fetch(chunk) for chunk in chunked(ids, self.batch_size)))
+        return {_id for batch in batches for _id in batch}
+
+    async def _update(self, referencing: 'Document', field_name: str,
+                      rule: int, ids: List[Any], write_concern: dict = None):
+        db_field = referencing._fields[field_name].db_field
+        if rule == NULLIFY:
+            update = {'$unset': {db_field: 1}}
+        else:
+            update = {'$pullAll': {db_field: ids}}
+        with set_write_concern(referencing._get_collection(),
+                               write_concern) as collection:
+            await collection.update_many({db_field: {'$in': ids}}, update,
+                                         session=self.session)
+        get_result_cache().invalidate(referencing.__collection__)
+        invalidate_replica(referencing)
+
+    async def _delete(self, document: 'Document', ids: List[Any],
+                      write_concern: dict = None):
+        with set_write_concern(document._get_collection(),
+                               write_concern) as collection:
+            result = await collection.delete_many({'_id': {'$in': ids}},
+                                                  session=self.session)
+        get_result_cache().invalidate(document.__collection__)
+        invalidate_replica(document)
+        return result.deleted_count if result.acknowledged else None
@@ -0,0 +1,142 @@
+from typing import List
+from typing import TYPE_CHECKING
+from typing import Union
+
+from aiomongoengine.errors import InvalidQueryError
+
+if TYPE_CHECKING:
+    from motor.core import AgnosticChangeStream
+    from aiomongoengine import Document
+    from aiomongoengine.queryset.base import BaseQuerySet
+
+__all__ = ('ChangeEvent', 'ChangeStream', 'prefix_query')
+
+# Operators combining clauses, their fields are prefixed recursively
+_LOGICAL_OPERATORS = ('$and', '$or', '$nor')
+
+
+def prefix_query(query: dict, prefix: str) -> dict:
+    """Rewrite a find query to match the sub document `prefix` of another
+    document, eg. ``{'fullDocument.age': {'$gt': 18}}`` for the
+    ``{'age': {'$gt': 18}}`` query and the ``fullDocument`` prefix.
+
+    The empty clauses of ``$and`` (``filter()`` compiles to
+    ``{'$and': [{}, {...}]}``) are dropped, and a single clause left is
+    merged into the query when its keys don't clash.
+    """
+    taken = {key if key.startswith('$') else f'{prefix}.{key}'
+             for key in query}
+    result = {}
+    for key, value in query.items():
+        if key in _LOGICAL_OPERATORS:
+            clauses = [prefix_query(clause, prefix) for clause in value]
+            if key == '$and':
+                clauses = [clause for clause in clauses if clause]
+                if not clauses:
+                    continue
+                if len(clauses) == 1 and not taken & set(clauses[0]):
+                    result.update(clauses[0])
+                    continue
+            result[key] = clauses
+        elif key.startswith('$'):
+            raise InvalidQueryError(
+                f"{key} queries can't filter a change stream")
+        else:
+            result[f'{prefix}.{key}'] = value
+    return result
+
+
+class ChangeEvent(object):
+    """A change of the watched collection.
+
+    `document` is the changed Document (a dict for ``as_pymongo()``
+    querysets), None for deletes, and for updates unless the stream was
+    opened with ``full_document='updateLookup'``.
+    """
+    __slots__ = ('operation_type', 'document', 'document_key',
+                 'update_description', 'resume_token', 'cluster_time', 'raw')
+
+    def __init__(self, raw: dict, document: Union['Document', dict, None]):
+        self.raw = raw
+        self.document = document
+        self.operation_type = raw.get('operationType')
+        self.document_key = raw.get('documentKey')
+        self.update_description = raw.get('updateDescription')
+        self.resume_token = raw.get('_id')
+        self.cluster_time = raw.get('clusterTime')
+
+    def __repr__(self):
+        return f'<ChangeEvent {self.operation_type} {self.document_key}>'
+
+
+class ChangeStream(object):
+    """Async iterator over the changes of the documents matched by a
+    queryset, see :meth:`~aiomongoengine.queryset.BaseQuerySet.watch`.
+
+    The stream is opened on the first iteration (or by ``async with``) and
+    resumes by itself after transient errors. Persist `resume_token` to
+    resume from the same point after a restart.
+    """
+
+    def __init__(self, queryset: 'BaseQuerySet', pipeline: List[dict],
+                 **kwargs):
+        self._queryset = queryset
+        self._pipeline = pipeline
+        self._kwargs = kwargs
+        self._stream = None  # type: Union[AgnosticChangeStream, None]
+        self._resume_token = kwargs.get('resume_after') or \
+            kwargs.get('start_after')
+
+    @property
+    def pipeline(self) -> List[dict]:
+        return self._pipeline
+
+    @property
+    def resume_token(self) -> Union[dict, None]:
+        """Token of the last change returned, or of the point the stream
+        reached when no change matched since, to be passed as
+        ``resume_after`` to a later ``watch()``.
+        """
+        if self._stream is not None and \
+                self._stream.resume_token is not None:
+            return self._stream.resume_token
+        return self._resume_token
+
+    def _open(self) -> 'AgnosticChangeStream':
+        if self._stream is None:
+            queryset = self._queryset
+            collection = queryset._collection
+            if queryset._read_preference is not None:
+                collection = collection.with_options(
+                    read_preference=queryset._read_preference)
+            self._stream = collection.watch(self._pipeline, **self._kwargs)
+        return self._stream
+
+    def _decode(self, raw: dict) -> ChangeEvent:
+        self._resume_token = raw.get('_id')
+        full_document = raw.get('fullDocument')
+        if full_document is not None and not self._queryset._as_pymongo:
+            full_document = self._queryset._document.from_son(full_document)
+        return ChangeEvent(raw, full_document)
+
+    async def try_next(self) -> Union[ChangeEvent, None]:
+        """ The next change if one is available, None otherwise. """
+        raw = await self._open().try_next()
+        return None if raw is None else self._decode(raw)
+
+    async def close(self):
+        if self._stream is not None:
+            await self._stream.close()
+
+    def __aiter__(self) -> 'ChangeStream':
+        return self
+
+    async def __anext__(self) -> ChangeEvent:
+        return self._decode(await self._open().next())
+
+    async def __aenter__(self) -> 'ChangeStream':
+        self._open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,78 @@
+from typing import Any
+from typing import Dict
+from typing import Type
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from aiomongoengine.fields.base_field import BaseField
+
+__all__ = ('QueryOperator', 'UpdateOperator', 'QUERY_OPERATORS',
+           'STRING_OPERATORS', 'UPDATE_OPERATORS', 'add_query_operator',
+           'add_string_operator', 'add_update_operator')
+
+# Operators by the name used in keyword queries, eg. `gt` for `age__gt`
+QUERY_OPERATORS = {}  # type: Dict[str, Type['QueryOperator']]
+STRING_OPERATORS = {}  # type: Dict[str, Type['QueryOperator']]
+# Operators by the name used in keyword updates, eg. `inc` for `inc__age`
+UPDATE_OPERATORS = {}  # type: Dict[str, Type['UpdateOperator']]
+
+
+class QueryOperator(object):
+    """ Compile a `field__op=value` filter into a query document. """
+    op = None  # type: str
+
+    def to_query(self, field_name: str, value) -> dict:
+        raise NotImplementedError()
+
+    def get_value(self, field: 'BaseField', value) -> Any:
+        if field is None or not hasattr(field, 'to_query'):
+            return value
+        return field.to_query(value)
+
+
+class UpdateOperator(object):
+    """Compile an `op__field=value` update into an update document.
+
+    `aliases` are other names the operator is registered under, eg. the
+    MongoDB name of `add_to_set`.
+    """
+    op = None  # type: str
+    aliases = ()
+
+    def to_update(self, field_name: str, value, **kwargs) -> dict:
+        raise NotImplementedError()
+
+    def get_value(self, field: 'BaseField', value) -> Any:
+        """ Convert `value` for `field` (the field of the updated path). """
+        return to_son(field, value)
+
+
+def to_son(field: 'BaseField', value) -> Any:
+    """ `field.to_son(value)`, for values which are not already raw. """
+    from aiomongoengine.fields.embedded_document_field import \
+        EmbeddedDocumentField
+
+    if field is None or value is None:
+        return value
+    if isinstance(value, dict) and isinstance(field, EmbeddedDocumentField):
+        return value
+    return field.to_son(value)
+
+
+def add_query_operator(operator: Type[QueryOperator]) \
+        -> Type[QueryOperator]:
+    QUERY_OPERATORS[operator.op] = operator
+    return operator
+
+
+def add_string_operator(operator: Type[QueryOperator]) \
+        -> Type[QueryOperator]:
+    STRING_OPERATORS[operator.op] = operator
+    return add_query_operator(operator)
+
+
+def add_update_operator(operator: Type[UpdateOperator]) \
+        -> Type[UpdateOperator]:
+    for name in (operator.op,) + tuple(operator.aliases):
+        UPDATE_OPERATORS[name] = operator
+    return operator
@@ -1,18 +1,209 @@
-from .base import UpdateOperator
+from aiomongoengine.errors import InvalidQueryError
+
 from .base import add_update_operator
+from .base import to_son
+from .base import UpdateOperator
+
+
+def item_field(field):
+    """ Field of the items of `field` when it is a list field. """
+    return getattr(field, '_base_field', field)
+
+
+def _each(field, values) -> list:
+    field = item_field(field)
+    return [to_son(field, value) for value in values]
 
 
 @add_update_operator
-class AddToSetOperator(UpdateOperator):
-    op = 'addToSet'
+class SetOperator(UpdateOperator):
+    op = 'set'
 
     def to_update(self, field_name, value, **kwargs):
-        return {'$addToSet': {field_name: value}}
+        return {'$set': {field_name: value}}
 
 
 @add_update_operator
-class AddToSetOperator(UpdateOperator):
+class SetOnInsertOperator(SetOperator):
+    op = 'set_on_insert'
+    aliases = ('setOnInsert',)
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$setOnInsert': {field_name: value}}
+
+
+@add_update_operator
+class UnsetOperator(UpdateOperator):
+    op = 'unset'
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$unset': {field_name: ''}}
+
+    def get_value(self, field, value):
+        return ''
+
+
+@add_update_operator
+class IncOperator(UpdateOperator):
     op = 'inc'
 
     def to_update(self, field_name, value, **kwargs):
         return {'$inc': {field_name: value}}
+
+    def get_value(self, field, value):
+        return value
+
+
+@add_update_operator
+class DecOperator(IncOperator):
+    op = 'dec'
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$inc': {field_name: -value}}
+
+
+@add_update_operator
+class MulOperator(IncOperator):
+    op = 'mul'
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$mul': {field_name: value}}
+
+
+@add_update_operator
+class MinOperator(UpdateOperator):
+    op = 'min'
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$min': {field_name: value}}
+
+
+@add_update_operator
+class MaxOperator(UpdateOperator):
+    op = 'max'
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$max': {field_name: value}}
+
+
+@add_update_operator
+class RenameOperator(UpdateOperator):
+    """ `rename__old_name='new_name'`, both mapped to their db fields. """
+    op = 'rename'
+
+    def to_update(self, field_name, value, document=None, **kwargs):
+        from aiomongoengine.query_builder.transform import resolve_path
+
+        path, _ = resolve_path(document, value.split('.'))
+        return {'$rename': {field_name: '.'.join(path)}}
+
+    def get_value(self, field, value):
+        if not isinstance(value, str):
+            raise InvalidQueryError("rename expects the new field name")
+        return value
+
+
+@add_update_operator
+class CurrentDateOperator(UpdateOperator):
+    """ `current_date__field=True` (a date) or `'timestamp'`. """
+    op = 'current_date'
+    aliases = ('currentDate',)
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$currentDate': {field_name: value}}
+
+    def get_value(self, field, value):
+        if value in ('date', 'timestamp'):
+            return {'$type': value}
+        return True
+
+
+@add_update_operator
+class PushOperator(UpdateOperator):
+    """Append a value, or the values of a list, tuple or set (with
+    ``$each``). A dict with an ``$each`` key is passed with its modifiers
+    (``$slice``, ``$sort``, ``$position``). A trailing index inserts at
+    that position, eg. ``push__tags__0='first'``.
+    """
+    op = 'push'
+
+    def to_update(self, field_name, value, **kwargs):
+        prefix, _, position = field_name.rpartition('.')
+        if prefix and position.isdigit():
+            if not isinstance(value, dict):
+                value = {'$each': [value]}
+            value = dict(value, **{'$position': int(position)})
+            field_name = prefix
+        return {'$push': {field_name: value}}
+
+    def get_value(self, field, value):
+        if isinstance(value, dict) and '$each' in value:
+            return dict(value, **{'$each': _each(field, value['$each'])})
+        if isinstance(value, (list, tuple, set)):
+            return {'$each': _each(field, value)}
+        return to_son(item_field(field), value)
+
+
+@add_update_operator
+class PushAllOperator(PushOperator):
+    op = 'push_all'
+    aliases = ('pushAll',)
+
+    def get_value(self, field, value):
+        return {'$each': _each(field, value)}
+
+
+@add_update_operator
+class AddToSetOperator(UpdateOperator):
+    op = 'add_to_set'
+    aliases = ('addToSet',)
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$addToSet': {field_name: value}}
+
+    def get_value(self, field, value):
+        if isinstance(value, (list, tuple, set)):
+            return {'$each': _each(field, value)}
+        return to_son(item_field(field), value)
+
+
+@add_update_operator
+class PullOperator(UpdateOperator):
+    """Remove the items equal to a value, or matching a condition, eg.
+    ``pull__scores__lt=50`` or ``pull__comments__author='bob'``.
+    """
+    op = 'pull'
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$pull': {field_name: value}}
+
+    def get_value(self, field, value):
+        if isinstance(value, dict):
+            return value
+        return to_son(item_field(field), value)
+
+
+@add_update_operator
+class PullAllOperator(UpdateOperator):
+    op = 'pull_all'
+    aliases = ('pullAll',)
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$pullAll': {field_name: value}}
+
+    def get_value(self, field, value):
+        return _each(field, value)
+
+
+@add_update_operator
+class PopOperator(UpdateOperator):
+    """ `pop__field=1` removes the last item, `-1` the first one. """
+    op = 'pop'
+
+    def to_update(self, field_name, value, **kwargs):
+        return {'$pop': {field_name: value}}
+
+    def get_value(self, field, value):
+        if value not in (1, -1):
+            raise InvalidQueryError("pop expects 1 (last) or -1 (first)")
+        return value
@@ -1,8 +1,10 @@
+from typing import Callable
 from typing import List
 from typing import TYPE_CHECKING
 from typing import Union
 
 from aiomongoengine.errors import OperationError
+from aiomongoengine.profiling import QueryProfile
 from aiomongoengine.queryset.base import BaseQuerySet
 from typing_extensions import TypedDict
 
@@ -43,12 +45,41 @@ class QuerySet(BaseQuerySet):
         async for doc in self._cursor:
             yield doc
 
+    def cached(self, ttl: float = 60):
+        """Serve ``all()`` from the process wide result cache for ``ttl``
+        seconds (see :func:`~aiomongoengine.queryset.cache.get_result_cache`).
+
+        Cached results of a collection are dropped as soon as this process
+        writes to it through ``Document.save``, ``update``, ``delete``,
+        ``insert`` or ``modify``; writes made by other processes are only
+        seen once the entry expires.
+
+        :param ttl: number of seconds the results stay cached.
+        """
+        queryset = self.clone()
+        queryset._cache_ttl = ttl
+        return queryset
+
+    def profile(self, sink: Callable[[QueryProfile], None] = None):
+        """Record the time spent building, fetching and decoding the results
+        of ``all()`` (and ``get()``, ``first()``) in ``last_profile``, see
+        :class:`~aiomongoengine.profiling.QueryProfile`.
+
+        :param sink: optional callable, also called with each profile.
+        """
+        queryset = self.clone()
+        queryset._profiling = True
+        queryset._profile_sink = sink
+        return queryset
+
     def no_cache(self):
         """Convert to a non-caching queryset """
         if self._result_cache is not None:
             raise OperationError("QuerySet already cached")
 
-        return self._clone_into(QuerySetNoCache(self._document, self._collection))
+        queryset = self._clone_into(QuerySetNoCache(self._document, self._collection))
+        queryset._cache_ttl = None
+        return queryset
 
     async def pagination(self,
                          limit: int = 10,
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+from copy import deepcopy
+from typing import Dict
+from typing import List
+from typing import TYPE_CHECKING
+from typing import Union
+
+from pymongo.errors import OperationFailure
+from pymongo.errors import PyMongoError
+
+from .connection import get_collection_list
+from .errors import InvalidQueryError
+from .query_builder.predicate import compile_query
+
+if TYPE_CHECKING:
+    from .document import Document
+
+__all__ = ('ReplicaCache', 'get_replica', 'invalidate_replica',
+           'start_replication', 'stop_replication')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RELOAD_INTERVAL = 60
+RETRY_INTERVAL = 1
+
+_replicas = {}  # type: Dict[type, 'ReplicaCache']
+
+
+class ReplicaCache(object):
+    """In-memory copy of a whole (small) collection.
+
+    The copy is loaded once, then kept fresh by consuming a change stream on
+    the collection. When change streams are not available (standalone
+    mongod), the collection is reloaded every `reload_interval` seconds.
+
+    The writes of this process mark the copy stale (see :meth:`invalidate`)
+    until it is reloaded, so they are read back from the database.
+    """
+
+    def __init__(self,
+                 document: 'Document',
+                 reload_interval: float = DEFAULT_RELOAD_INTERVAL):
+        """
+        :param document: the replicated Document class.
+        :param reload_interval: seconds between two reloads when change
+            streams are not available.
+        """
+        self._document = document
+        self.reload_interval = reload_interval
+        self._docs = {}  # type: Dict[object, dict]
+        self._task = None
+        self._reload_task = None
+        # Writes of this process, and the ones before the last load
+        self._writes = 0
+        self._loaded_writes = 0
+        self.loaded = False
+        self.watching = False
+
+    @property
+    def _collection(self):
+        return self._document._get_collection()
+
+    @property
+    def stale(self) -> bool:
+        """ Whether this process wrote to the collection since the load. """
+        return self._loaded_writes != self._writes
+
+    async def load(self):
+        """ (Re)load the whole collection. """
+        writes = self._writes
+        docs = await self._collection.find({}).to_list(length=None)
+        self._docs = {doc['_id']: doc for doc in docs}
+        self._loaded_writes = writes
+        self.loaded = True
+
+    def invalidate(self):
+        """Mark the copy stale after a write of this process, and reload it
+        in the background. The change stream may deliver the write later than
+        the next read.
+        """
+        self._writes += 1
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.ensure_future(self._reload())
+
+    async def start(self):
+        """ Load the collection and start following its changes. """
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._follow())
+
+    async def stop(self):
+        """ Stop following changes, the loaded copy is kept. """
+        for task in (self._task, self._reload_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._reload_task = None
+        self.watching = False
+
+    def find(self, query: dict) -> Union[List[dict], None]:
+        """Return copies of the documents matching `query`, or None when the
+        query uses operators that can't be evaluated locally.
+        """
+        try:
+            match = compile_query(query)
+        except InvalidQueryError:
+            return None
+        return [deepcopy(doc) for doc in self._docs.values() if match(doc)]
+
+    async def _follow(self):
+        while True:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                logger.info("Change streams unavailable on %s (%s), reloading "
+                            "every %ss instead.", self._document.__collection__,
+                            e, self.reload_interval)
+                self.watching = False
+                await self._poll()
+            except PyMongoError as e:
+                logger.warning("Replica of %s lost its change stream: %s",
+                               self._document.__collection__, e)
+                self.watching = False
+                await asyncio.sleep(RETRY_INTERVAL)
+
+    async def _watch(self):
+        async with self._collection.watch(full_document='updateLookup') as stream:
+            # Open the stream before reloading so no change is missed
+            # between the load and the first event.
+            change = await stream.try_next()
+            await self.load()
+            self.watching = True
+            if change is not None:
+                self._apply(change)
+            async for change in stream:
+                self._apply(change)
+
+    async def _reload(self):
+        while self.stale:
+            try:
+                await self.load()
+            except PyMongoError as e:
+                logger.warning("Failed to reload replica of %s: %s",
+                               self._document.__collection__, e)
+                await asyncio.sleep(RETRY_INTERVAL)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.load()
+            except PyMongoError as e:
+                logger.warning("Failed to reload replica of %s: %s",
+                               self._document.__collection__, e)
+
+    def _apply(self, change: dict):
+        operation = change['operationType']
+        if operation in ('insert', 'replace', 'update'):
+            doc = change.get('fullDocument')
+            if doc is None:
+                # Deleted before the update could be looked up
+                self._docs.pop(change['documentKey']['_id'], None)
+            else:
+                self._docs[doc['_id']] = doc
+        elif operation == 'delete':
+            self._docs.pop(change['documentKey']['_id'], None)
+        elif operation in ('drop', 'dropDatabase', 'rename', 'invalidate'):
+            self._docs = {}
+
+
+def get_replica(document: 'Document') -> Union[ReplicaCache, None]:
+    """Return the loaded replica of `document`, None if not replicated or
+    stale.
+    """
+    replica = _replicas.get(document)
+    if replica is None or not replica.loaded or replica.stale:
+        return None
+    return replica
+
+
+def invalidate_replica(document: 'Document'):
+    """ Mark the replica of `document` stale after writing to it. """
+    replica = _replicas.get(document)
+    if replica is not None:
+        replica.invalidate()
+
+
+async def start_replication(reload_interval: float = None):
+    """Load every registered Document with ``meta = {'replicated': True}``
+    and keep them fresh. To call once at startup, after `connect()`.
+
+    :param reload_interval: seconds between two reloads when change streams
+        are not available, defaults to ``meta['replica_reload_interval']``.
+    """
+    replicas = []
+    for document in get_collection_list():
+        if not document._meta.get('replicated') or document in _replicas:
+            continue
+        interval = reload_interval or document._meta.get(
+            'replica_reload_interval', DEFAULT_RELOAD_INTERVAL)
+        _replicas[document] = ReplicaCache(document, interval)
+        replicas.append(_replicas[document])
+    await asyncio.gather(*(replica.start() for replica in replicas))
+
+
+async def stop_replication():
+    """ Stop and drop every replica, queries go to the database again. """
+    replicas = list(_replicas.values())
+    _replicas.clear()
+    await asyncio.gather(*(replica.stop() for replica in replicas))
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import traceback
+from typing import Awaitable
+from typing import Callable
+from typing import List
+from typing import Set
+from typing import Union
+
+from typing_extensions import TypedDict
+
+from .explain import ExplainSummary
+from .explain import summarize_explain
+from .utils import query_shape
+
+__all__ = ('SlowQueryDict', 'set_slow_query_threshold',
+           'get_slow_query_threshold', 'is_slow_query', 'record_slow_query',
+           'flush_slow_queries')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STACK_DEPTH = 5
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+class SlowQueryDict(TypedDict):
+    document: str
+    collection: str
+    operation: str
+    duration: float
+    shape: dict
+    stack: List[str]
+    explain: Union[ExplainSummary, None]
+    error: Union[str, None]
+
+
+Sink = Callable[[SlowQueryDict], None]
+
+
+class _Settings(object):
+    threshold = None  # type: Union[float, None]
+    sink = None  # type: Union[Sink, None]
+    explain = True
+    stack_depth = DEFAULT_STACK_DEPTH
+
+
+_settings = _Settings()
+_pending = set()  # type: Set[asyncio.Future]
+
+
+def set_slow_query_threshold(threshold: Union[float, None],
+                             sink: Sink = None,
+                             explain: bool = True,
+                             stack_depth: int = DEFAULT_STACK_DEPTH):
+    """Report queryset evaluations (`all`, `count`, `aggregate`, `update`,
+    `delete`) taking more than `threshold` seconds.
+
+    Slow queries are logged as warnings on ``aiomongoengine.slow_query``
+    and passed to `sink`. When `explain` is set, they are first re-run
+    through explain in the background, so the report tells whether the
+    query used an index (``explain['collscan']``) and how many keys and
+    documents were examined.
+
+    :param threshold: seconds, None disables the reports.
+    :param sink: optional callable, called with each SlowQueryDict.
+    :param explain: explain the slow queries.
+    :param stack_depth: number of caller frames kept in the report.
+    """
+    _settings.threshold = threshold
+    _settings.sink = sink
+    _settings.explain = explain
+    _settings.stack_depth = stack_depth
+
+
+def get_slow_query_threshold() -> Union[float, None]:
+    return _settings.threshold
+
+
+def is_slow_query(duration: float) -> bool:
+    return _settings.threshold is not None and duration >= _settings.threshold
+
+
+def record_slow_query(document_name: str,
+                      collection_name: str,
+                      operation: str,
+                      duration: float,
+                      query: dict,
+                      explain: Callable[[], Awaitable[dict]] = None):
+    """Report a slow query. The stack is captured now, `explain` (when
+    enabled) is awaited in a background task before the report is emitted.
+    """
+    record = SlowQueryDict(
+        document=document_name,
+        collection=collection_name,
+        operation=operation,
+        duration=duration,
+        shape=query_shape(query or {}),
+        stack=_stack_excerpt(_settings.stack_depth),
+        explain=None,
+        error=None
+    )
+    if explain is None or not _settings.explain:
+        _emit(record)
+        return
+    task = asyncio.ensure_future(_explain_and_emit(record, explain))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def flush_slow_queries():
+    """ Wait for the slow queries being explained to be reported. """
+    while _pending:
+        await asyncio.gather(*_pending, return_exceptions=True)
+
+
+async def _explain_and_emit(record: SlowQueryDict,
+                            explain: Callable[[], Awaitable[dict]]):
+    try:
+        record['explain'] = summarize_explain(await explain())
+    except Exception as e:
+        record['error'] = f'{e.__class__.__name__}: {e}'
+    _emit(record)
+
+
+def _emit(record: SlowQueryDict):
+    summary = record['explain']
+    if summary is None:
+        plan = record['error'] or 'not explained'
+    else:
+        plan = (f"{'COLLSCAN' if summary['collscan'] else 'IXSCAN'} "
+                f"{','.join(summary['indexes'])} "
+                f"keys={summary['keys_examined']} "
+                f"docs={summary['docs_examined']} "
+                f"returned={summary['returned']}"
+                f"{' in-memory SORT' if summary['in_memory_sort'] else ''}")
+    logger.warning("Slow %s on %s (%.1fms) %s: %s\n%s",
+                   record['operation'], record['collection'],
+                   record['duration'] * 1e3, record['shape'], plan,
+                   ''.join(record['stack']))
+
+    sink = _settings.sink
+    if sink is not None:
+        try:
+            sink(record)
+        except Exception:
+            logger.exception("Slow query sink %r failed", sink)
+
+
+def _stack_excerpt(depth: int) -> List[str]:
+    """ The last `depth` frames of the caller, outside of this package. """
+    frames = [frame for frame in traceback.extract_stack()
+              if not os.path.abspath(frame.filename).startswith(_PACKAGE_DIR)]
+    return traceback.format_list(frames[-depth:]) if depth else []
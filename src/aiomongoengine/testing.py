@@ -0,0 +1,94 @@
+from contextvars import ContextVar
+from typing import Awaitable
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+from .explain import ExplainSummary
+from .explain import summarize_explain
+
+__all__ = ('assert_no_collscan', 'capture_query')
+
+Explain = Callable[[], Awaitable[dict]]
+
+DEFAULT_MAX_RATIO = 10.0
+
+_captured = ContextVar('aiomongoengine_captured_queries', default=None)
+
+
+def capture_query(operation: str, collection: str, query,
+                  explain: Explain):
+    """Hand a query about to run to the active `assert_no_collscan`, if any.
+
+    :param operation: eg. ``find`` or ``aggregate``.
+    :param query: the filter or pipeline, to describe the query.
+    :param explain: coroutine function returning the explain of the query.
+    """
+    captured = _captured.get()
+    if captured is not None:
+        captured.append((f'{operation} {collection} {query}', explain))
+
+
+class assert_no_collscan(object):
+    """Explain every cursor and aggregation created by a queryset inside the
+    block, and fail if one of them is not backed by an index::
+
+        async with assert_no_collscan():
+            await User.objects.filter(email=email).first()
+
+    A query fails when its plan has a COLLSCAN stage, a SORT stage (sort in
+    memory, unless `allow_in_memory_sort`) or when it examines more than
+    `max_ratio` index keys per document returned.
+
+    The queries are explained when the block exits, so the block runs at
+    full speed. Queries started by tasks created inside the block are
+    captured too.
+    """
+
+    def __init__(self, max_ratio: float = DEFAULT_MAX_RATIO,
+                 allow_in_memory_sort: bool = False):
+        """
+        :param max_ratio: maximum keys examined per document returned.
+        :param allow_in_memory_sort: don't fail on SORT stages.
+        """
+        self.max_ratio = max_ratio
+        self.allow_in_memory_sort = allow_in_memory_sort
+        # (description, summary) of every captured query
+        self.summaries = []  # type: List[Tuple[str, ExplainSummary]]
+        self._queries = []  # type: List[Tuple[str, Explain]]
+        self._token = None
+
+    async def __aenter__(self) -> 'assert_no_collscan':
+        self._queries = []
+        self._token = _captured.set(self._queries)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        _captured.reset(self._token)
+        self._token = None
+        if exc_type is not None:
+            return
+
+        failures = []
+        for description, explain in self._queries:
+            summary = summarize_explain(await explain())
+            self.summaries.append((description, summary))
+            problems = self.check(summary)
+            if problems:
+                failures.append(f"{description}: {', '.join(problems)}")
+        if failures:
+            raise AssertionError(
+                "Queries not backed by an index:\n  " + "\n  ".join(failures))
+
+    def check(self, summary: ExplainSummary) -> List[str]:
+        """ Problems of the plan summarized by `summary`, if any. """
+        problems = []
+        if summary['collscan']:
+            problems.append('COLLSCAN')
+        if summary['in_memory_sort'] and not self.allow_in_memory_sort:
+            problems.append('in-memory SORT')
+        ratio = summary['keys_examined'] / max(summary['returned'], 1)
+        if ratio > self.max_ratio:
+            problems.append(f"{summary['keys_examined']} keys examined for "
+                            f"{summary['returned']} documents returned")
+        return problems
@@ -1,9 +1,16 @@
+import asyncio
 from copy import deepcopy
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Iterable
 from typing import List
 from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import Union
 
+from bson import Binary
+from bson import ObjectId
 from pymongo import ASCENDING
 from pymongo import DESCENDING
 from pymongo import HASHED
@@ -39,6 +46,27 @@ def parse_single_index(index_str) -> Tuple[str, Union[str, int]]:
         return index_str, ASCENDING
 
 
+def index_keys(index: Union[IndexModel, dict]) -> List[Tuple[str, Any]]:
+    """ Keys of an IndexModel or of an index document (from list_indexes). """
+    if isinstance(index, IndexModel):
+        index = index.document
+    return list(index['key'].items())
+
+
+def index_key_name(keys: List[Tuple[str, Any]]) -> str:
+    """ Default name of an index on `keys`, eg. 'name_1_age_-1'. """
+    return '_'.join(f'{key}_{direction}' for key, direction in keys)
+
+
+def is_index_prefix(prefix: List[Tuple[str, Any]],
+                    keys: List[Tuple[str, Any]]) -> bool:
+    """ Whether the index on `keys` can serve every query of the index on
+    `prefix`, ie. `prefix` is a prefix of `keys`.
+    """
+    return len(prefix) <= len(keys) and list(keys[:len(prefix)]) == \
+        list(prefix)
+
+
 def parse_indexes(indexes: list,
                   collection: 'Document' = None) -> List[IndexModel]:
     index_model_list = []
@@ -105,3 +133,96 @@ def _import_class(cls_name):
 
 async def async_iteritems(async_iterator):
     return [i async for i in async_iterator]
+
+
+def chunked(iterable: Iterable, size: int) -> Iterable[list]:
+    """ Yield successive lists of at most `size` items from `iterable`. """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def gather_with_concurrency(limit: int, *aws) -> list:
+    """ Same as `asyncio.gather` but never awaits more than `limit`
+    awaitables at the same time. Results keep the order of `aws`.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(_run(aw) for aw in aws))
+
+
+_MISSING = object()
+
+
+def get_son_value(son: dict, path: str, default=None) -> Any:
+    """ Get the value of a dotted db path (eg. `author.name`) from a son. """
+    value = son
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            index = int(part)
+            value = value[index] if index < len(value) else _MISSING
+        else:
+            value = _MISSING
+        if value is _MISSING:
+            return default
+    return value
+
+
+def bson_sort_key(value) -> tuple:
+    """ Key that orders python values like MongoDB orders BSON types. """
+    if value is None:
+        return 1, 0
+    if isinstance(value, bool):
+        return 8, value
+    if isinstance(value, (int, float)):
+        return 2, value
+    if isinstance(value, str):
+        return 3, value
+    if isinstance(value, dict):
+        return 4, tuple((k, bson_sort_key(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 5, tuple(bson_sort_key(v) for v in value)
+    if isinstance(value, (bytes, Binary)):
+        return 6, bytes(value)
+    if isinstance(value, ObjectId):
+        return 7, value.binary
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return 9, value
+    return 10, str(value)
+
+
+def sort_son_documents(docs: List[dict], ordering) -> List[dict]:
+    """ Sort raw documents in place by pymongo style `ordering`,
+    eg. `[('age', -1), ('name', 1)]`.
+    """
+    for key, direction in reversed(ordering):
+        docs.sort(key=lambda doc: bson_sort_key(get_son_value(doc, key)),
+                  reverse=direction == DESCENDING)
+    return docs
+
+
+def query_shape(query: Any) -> Any:
+    """ Shape of a mongo query: its fields and operators, with every value
+    replaced by 1, eg. `{'age': {'$gt': 1}}` for `{'age': {'$gt': 18}}`.
+    Queries of the same shape are served by the same indexes.
+    """
+    if isinstance(query, dict):
+        return {key: query_shape(value) for key, value in query.items()}
+    if isinstance(query, (list, tuple)) and query and \
+            all(isinstance(value, dict) for value in query):
+        # $and/$or/$nor clauses
+        return [query_shape(value) for value in query]
+    return 1
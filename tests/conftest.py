@@ -1,4 +1,5 @@
 import asyncio
+import os
 from typing import Type
 
 import pytest
@@ -51,6 +52,8 @@ def event_loop():
 
 @pytest.fixture(autouse=True, scope='session')
 def connect_mongo(event_loop):
+    if os.environ.get('AIOMONGOENGINE_TEST_BACKEND') == 'memory':
+        return connect('test', backend='memory')
     db = connect('test',
                  port=20000,
                  username='user',
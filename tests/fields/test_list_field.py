@@ -7,6 +7,7 @@ from aiomongoengine import IntField
 from aiomongoengine import StringField
 from aiomongoengine import UUIDField
 from aiomongoengine.fields import ListField
+from aiomongoengine.fields.list_field import TrackedList
 
 from tests.utils import get_as_son
 
@@ -31,3 +32,62 @@ async def test_storage(field, value):
     group.validate()
     # await group.save()
     # assert await get_as_son(group) == {'_id': group.id, 'members': value}
+
+
+async def test_tracked_list():
+    field = ListField(StringField())
+    tags = TrackedList(['a', 'b', 'a'])
+    tags.append('c')
+    tags += ['d']
+    assert tags.updates(field, 'tags') == {'$push': {'tags': {'$each': ['c', 'd']}}}
+
+    tags._clear_changes()
+    assert tags.updates(field, 'tags') == {}
+    tags.remove('b')
+    assert tags.updates(field, 'tags') == {'$pullAll': {'tags': ['b']}}
+    # $pullAll would remove the other 'a' too
+    tags.remove('a')
+    assert tags.updates(field, 'tags') is None
+
+    tags._clear_changes()
+    tags[-1] = 'e'
+    assert tags.updates(field, 'tags') == {'$set': {'tags.2': 'e'}}
+    tags.append('f')
+    assert tags.updates(field, 'tags') is None
+
+    tags._clear_changes()
+    tags.sort()
+    assert tags.updates(field, 'tags') is None
+
+
+async def test_save_list_changes(user_cls):
+    user = user_cls(name='Tracked', like=['swim', 'run'])
+    await user.save()
+    user = await user_cls.objects.get(id=user.id)
+    assert isinstance(user.like, TrackedList)
+
+    user.like.append('read')
+    assert user._list_updates({}) == {'$push': {'like': {'$each': ['read']}}}
+    # Appended concurrently, kept by $push
+    await user_cls.objects.filter(id=user.id).update(push__like='climb')
+    await user.save()
+    assert (await user_cls.objects.get(id=user.id)).like == \
+        ['swim', 'run', 'climb', 'read']
+
+    user.like.remove('swim')
+    user.like[0] = 'walk'
+    await user.save()
+    assert (await user_cls.objects.get(id=user.id)).like == ['walk', 'read']
+    await user.delete()
+
+
+async def test_save_list_loaded_null(user_cls):
+    inserted = await user_cls._get_collection().insert_one(
+        {'name': 'Null list', 'like': None})
+    user = await user_cls.objects.get(id=inserted.inserted_id)
+    user.like.append('swim')
+    # $push can't add to null, the list is set whole
+    assert user._list_updates({}) == {}
+    await user.save()
+    assert (await user_cls.objects.get(id=user.id)).like == ['swim']
+    await user.delete()
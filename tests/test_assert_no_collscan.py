@@ -0,0 +1,61 @@
+import pytest
+
+from aiomongoengine.indexes import ensure_all_indexes
+from aiomongoengine.testing import assert_no_collscan
+from aiomongoengine.testing import capture_query
+
+
+def _explain(stage, keys=1, returned=1):
+    async def explain():
+        return {'queryPlanner': {'winningPlan': stage},
+                'executionStats': {'totalKeysExamined': keys,
+                                   'nReturned': returned}}
+    return explain
+
+
+IXSCAN = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN',
+                                           'indexName': 'name_1'}}
+
+
+@pytest.mark.asyncio
+async def test_capture_query():
+    capture_query('find', 'user', {}, _explain({'stage': 'COLLSCAN'}))
+
+    async with assert_no_collscan() as checker:
+        capture_query('find', 'user', {'name': 1}, _explain(IXSCAN))
+    assert [d for d, _ in checker.summaries] == ["find user {'name': 1}"]
+
+    with pytest.raises(AssertionError, match='COLLSCAN'):
+        async with assert_no_collscan():
+            capture_query('find', 'user', {}, _explain({'stage': 'COLLSCAN'}))
+
+    with pytest.raises(AssertionError, match='in-memory SORT'):
+        async with assert_no_collscan():
+            capture_query('find', 'user', {},
+                          _explain({'stage': 'SORT', 'inputStage': IXSCAN}))
+
+    with pytest.raises(AssertionError, match='100 keys examined'):
+        async with assert_no_collscan(max_ratio=10):
+            capture_query('find', 'user', {}, _explain(IXSCAN, keys=100))
+
+    async with assert_no_collscan(max_ratio=100, allow_in_memory_sort=True):
+        capture_query('find', 'user', {},
+                      _explain({'stage': 'SORT', 'inputStage': IXSCAN}, 100))
+
+
+@pytest.mark.asyncio
+async def test_assert_no_collscan(user_cls, mock_users):
+    await ensure_all_indexes(documents=[user_cls])
+
+    async with assert_no_collscan() as checker:
+        await user_cls.objects.filter(name='Lisa Bruce').all()
+    assert len(checker.summaries) == 1
+
+    with pytest.raises(AssertionError, match='COLLSCAN'):
+        async with assert_no_collscan():
+            await user_cls.objects.filter(age__gt=20).all()
+
+    with pytest.raises(AssertionError, match='aggregate'):
+        async with assert_no_collscan():
+            await user_cls.objects.filter(age__gt=20).aggregate(
+                {'$group': {'_id': '$order'}})
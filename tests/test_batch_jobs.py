@@ -0,0 +1,68 @@
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from aiomongoengine.errors import InvalidQueryError
+from aiomongoengine.queryset.batch_jobs import BatchJob
+from aiomongoengine.queryset.batch_jobs import replication_lag
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeAdmin(object):
+
+    def __init__(self, status):
+        self.status = status
+
+    async def command(self, name):
+        assert name == 'replSetGetStatus'
+        if self.status is None:
+            raise OperationFailure("not running with --replSet", code=76)
+        return self.status
+
+
+class FakeClient(object):
+
+    def __init__(self, status):
+        self.admin = FakeAdmin(status)
+
+
+async def test_replication_lag():
+    now = datetime.utcnow()
+    status = {'members': [
+        {'state': 1, 'optimeDate': now},
+        {'state': 2, 'optimeDate': now - timedelta(seconds=3)},
+        {'state': 2, 'optimeDate': now - timedelta(seconds=12)},
+        # Arbiters have no optime
+        {'state': 7},
+    ]}
+    assert await replication_lag(FakeClient(status)) == 12
+    assert await replication_lag(FakeClient({'members': status['members'][:1]})) == 0
+    assert await replication_lag(FakeClient({'members': status['members'][1:]})) is None
+    assert await replication_lag(FakeClient(None)) is None
+
+
+async def test_update_and_delete_in_batches(user_cls, mock_users):
+    await user_cls.objects.insert(
+        [user_cls(name=f'Batch {i}', age=i) for i in range(5)])
+    batch = user_cls.objects.filter(name__startswith='Batch')
+
+    job = BatchJob(user_cls.objects.filter(name__startswith='Batch',
+                                           age__gte=1), batch_size=2,
+                   max_ops_per_sec=1000, pause_on_replication_lag=10)
+    assert await job.run(lambda queryset: queryset.update(inc__age=10)) == 4
+    assert (job.batches, job.documents) == (2, 4)
+    # The batch ranges are not added to the queryset of the job
+    assert await job._queryset.count() == 4
+    assert sorted(user.age for user in await batch.all()) == [0, 11, 12, 13, 14]
+
+    assert await batch.update_in_batches(batch_size=3, set__order=9) == 5
+    assert await user_cls.objects.filter(name__startswith='Batch',
+                                         order=9).count() == 5
+    assert await batch.delete_in_batches(batch_size=2) == 5
+    assert await batch.count() == 0
+
+    with pytest.raises(InvalidQueryError):
+        await batch.limit(2).delete_in_batches()
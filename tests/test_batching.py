@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from aiomongoengine.errors import NotUniqueError
+from aiomongoengine.errors import OperationError
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_batched_inserter(user_cls):
+    await user_cls.ensure_index()
+    await user_cls(name='Batched 0').save()
+
+    users = [user_cls(name=f'Batched {i}') for i in range(5)]
+    async with user_cls.objects.batched_inserter(max_batch=2) as inserter:
+        results = await asyncio.gather(
+            *(inserter.add(user) for user in users), return_exceptions=True)
+    # The duplicate fails alone
+    assert isinstance(results[0], NotUniqueError)
+    assert users[0].id is None
+    assert results[1:] == [user.id for user in users[1:]]
+    assert (inserter.batches, inserter.documents) == (3, 4)
+
+    with pytest.raises(OperationError):
+        await inserter.add(user_cls(name='Closed'))
+    batched = user_cls.objects.filter(name__startswith='Batched')
+    assert await batched.count() == 5
+    await batched.delete()
+
+
+async def test_batched_inserter_delay(user_cls):
+    inserter = user_cls.objects.batched_inserter(max_batch=100,
+                                                 max_delay_ms=5)
+    user_id = await inserter.add(user_cls(name='Delayed'))
+    assert inserter.batches == 1
+    assert (await user_cls.objects.get(id=user_id)).name == 'Delayed'
+    await inserter.close()
+    await user_cls.objects.filter(id=user_id).delete()
@@ -0,0 +1,126 @@
+import pytest
+
+from aiomongoengine import Document
+from aiomongoengine import fields
+from aiomongoengine.backends.memory import MemoryClient
+from aiomongoengine.errors import OperationError
+from aiomongoengine.queryset.cascade import CASCADE
+from aiomongoengine.queryset.cascade import DENY
+from aiomongoengine.queryset.cascade import NULLIFY
+from aiomongoengine.queryset.cascade import PULL
+
+pytestmark = pytest.mark.asyncio
+
+
+class CascadeAuthor(Document):
+    name = fields.StringField()
+
+
+class CascadePost(Document):
+    author = fields.ReferenceField(CascadeAuthor, reverse_delete_rule=CASCADE)
+    reviewer = fields.ReferenceField(CascadeAuthor,
+                                     reverse_delete_rule=NULLIFY)
+    likers = fields.ListField(fields.ReferenceField(
+        CascadeAuthor, reverse_delete_rule=PULL))
+
+
+class CascadeComment(Document):
+    post = fields.ReferenceField('CascadePost', reverse_delete_rule=CASCADE)
+
+
+class CascadeLock(Document):
+    comment = fields.ReferenceField(CascadeComment, reverse_delete_rule=DENY)
+
+
+@pytest.fixture
+async def authors():
+    for document in (CascadeAuthor, CascadePost, CascadeComment, CascadeLock):
+        await document.drop_collection()
+    alice, bob = CascadeAuthor(name='alice'), CascadeAuthor(name='bob')
+    await CascadeAuthor.objects.insert([alice, bob])
+    return alice, bob
+
+
+def test_delete_rules():
+    assert CascadeAuthor._meta['delete_rules'] == {
+        (CascadePost, 'author'): CASCADE,
+        (CascadePost, 'reviewer'): NULLIFY,
+        (CascadePost, 'likers'): PULL,
+    }
+    # Registered once CascadePost, referenced by name, was defined
+    assert CascadePost._meta['delete_rules'] == {
+        (CascadeComment, 'post'): CASCADE}
+
+
+async def test_cascade(authors):
+    alice, bob = authors
+    posts = [CascadePost(author=alice, reviewer=bob, likers=[alice, bob]),
+             CascadePost(author=bob, reviewer=alice, likers=[alice, bob])]
+    await CascadePost.objects.insert(posts)
+    await CascadeComment.objects.insert(
+        [CascadeComment(post=posts[0]), CascadeComment(post=posts[1])])
+
+    assert await CascadeAuthor.objects.filter(name='alice').delete() == 1
+    assert await CascadeAuthor.objects.count() == 1
+    post = await CascadePost.objects.get()
+    assert post.id == posts[1].id
+    assert post.reviewer is None
+    assert post.likers == [bob.id]
+    comment = await CascadeComment.objects.get()
+    assert comment.post == posts[1].id
+
+
+async def test_deny(authors):
+    alice, _ = authors
+    post = CascadePost(author=alice)
+    await post.save()
+    comment = CascadeComment(post=post)
+    await comment.save()
+    await CascadeLock(comment=comment).save()
+
+    with pytest.raises(OperationError):
+        await alice.delete()
+    # Nothing is written before the DENY rules are checked
+    assert await CascadeAuthor.objects.count() == 2
+    assert await CascadePost.objects.count() == 1
+
+
+async def test_max_cascade(authors):
+    alice, _ = authors
+    await CascadePost.objects.insert(
+        [CascadePost(author=alice) for _ in range(5)])
+
+    with pytest.raises(OperationError):
+        await alice.delete(max_cascade=4)
+    assert await CascadePost.objects.count() == 5
+
+    # The deleted documents themselves are not counted
+    assert await CascadeAuthor.objects.filter(name='bob').delete(
+        max_cascade=0) == 1
+    assert await alice.delete(max_cascade=5) == 1
+    assert await CascadePost.objects.count() == 0
+
+
+async def test_memory_transaction():
+    client = MemoryClient()
+    collection = client['test']['user']
+    await collection.insert_one({'_id': 1, 'name': 'alice'})
+    await collection.create_index('name')
+
+    async with await client.start_session() as session:
+        with pytest.raises(ValueError):
+            async with session.start_transaction():
+                await collection.delete_one({'_id': 1}, session=session)
+                await client['test']['other'].insert_one({'_id': 2})
+                raise ValueError
+        assert not session.in_transaction
+
+        async with session.start_transaction():
+            await collection.insert_one({'_id': 3, 'name': 'bob'},
+                                        session=session)
+
+    assert await collection.find({}, sort=[('_id', 1)]).to_list(None) == \
+        [{'_id': 1, 'name': 'alice'}, {'_id': 3, 'name': 'bob'}]
+    assert await collection.find_one({'name': 'alice'}) == \
+        {'_id': 1, 'name': 'alice'}
+    assert await client['test']['other'].count_documents({}) == 0
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from aiomongoengine.errors import InvalidQueryError
+from aiomongoengine.queryset.change_stream import prefix_query
+
+
+def test_prefix_query():
+    assert prefix_query(
+        {'age': {'$gt': 18}, '$or': [{'name': 'a'}, {'like': 'swim'}]},
+        'fullDocument'
+    ) == {'fullDocument.age': {'$gt': 18},
+          '$or': [{'fullDocument.name': 'a'}, {'fullDocument.like': 'swim'}]}
+    assert prefix_query({'$and': [{}, {'age': 1}]}, 'fullDocument') == \
+        {'fullDocument.age': 1}
+    assert prefix_query({'age': 1, '$and': [{}, {'age': 2}]}, 'fullDocument') == \
+        {'fullDocument.age': 1, '$and': [{'fullDocument.age': 2}]}
+    with pytest.raises(InvalidQueryError):
+        prefix_query({'$where': 'this.age > 18'}, 'fullDocument')
+
+
+def test_watch_pipeline(user_cls):
+    stream = user_cls.objects.filter(age__gt=20).watch(
+        operation_types=['insert'], pipeline=[{'$project': {'ns': 0}}])
+    assert stream.pipeline == [
+        {'$match': {'fullDocument.age': {'$gt': 20},
+                    'operationType': {'$in': ['insert']}}},
+        {'$project': {'ns': 0}},
+    ]
+    # Deletes have no fullDocument to match
+    stream = user_cls.objects.filter(age__gt=20).watch()
+    assert stream.pipeline == [
+        {'$match': {'$or': [{'fullDocument.age': {'$gt': 20}},
+                            {'operationType': {'$in': ['delete']}}]}}]
+    assert user_cls.watch(resume_after={'_data': '1'}).resume_token == \
+        {'_data': '1'}
+
+
+@pytest.mark.asyncio
+async def test_watch(user_cls):
+    stream = user_cls.objects.filter(age__gt=100).watch()
+    try:
+        await stream.__aenter__()
+        await stream.try_next()
+    except OperationFailure as e:
+        pytest.skip(f'Change streams are not available: {e}')
+
+    async with stream:
+        await user_cls(name='Old Timer', age=101).save()
+        await user_cls(name='Young Timer', age=1).save()
+        change = await asyncio.wait_for(stream.__anext__(), 10)
+    assert change.operation_type == 'insert'
+    assert isinstance(change.document, user_cls)
+    assert change.document.name == 'Old Timer'
+    assert stream.resume_token == change.resume_token
+    await user_cls.objects.filter(age__gte=100).delete()
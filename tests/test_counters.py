@@ -0,0 +1,101 @@
+import pytest
+from pymongo.errors import AutoReconnect
+
+from aiomongoengine import close_counters
+from aiomongoengine import CounterAggregator
+from aiomongoengine.errors import InvalidQueryError
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_counter_aggregator(user_cls):
+    user = await user_cls(name='Counted', age=0, order=0).save()
+
+    counters = CounterAggregator(user_cls, interval_ms=60000, max_pending=100)
+    for _ in range(20):
+        counters.inc(user.id, age=1)
+    counters.inc(user.id, order=3)
+    assert counters.pending(user.id, 'age') == 20
+    with pytest.raises(InvalidQueryError):
+        counters.inc(user.id, unknown=1)
+
+    # Written with a single update
+    await counters.flush()
+    assert (counters.flushes, counters.increments) == (1, 21)
+    assert counters.pending(user.id, 'age') == 0
+    await user.reload()
+    assert (user.age, user.order) == (20, 3)
+
+    counters.inc(user.id, age=2)
+    await close_counters()
+    assert (await user_cls.objects.get(id=user.id)).age == 22
+    with pytest.raises(RuntimeError):
+        counters.inc(user.id, age=1)
+    await user.delete()
+
+
+async def test_counter_aggregator_max_pending(user_cls):
+    user = await user_cls(name='Counted max', age=0).save()
+    async with CounterAggregator(user_cls, interval_ms=60000,
+                                 max_pending=5) as counters:
+        for _ in range(5):
+            counters.inc(user.id, age=1)
+        # The write started with the 5th increment
+        assert counters.pending(user.id, 'age') == 0
+        await counters.flush()
+        assert counters.flushes == 1
+        assert (await user_cls.objects.get(id=user.id)).age == 5
+        counters.inc(user.id, age=1)
+    assert (await user_cls.objects.get(id=user.id)).age == 6
+    await user.delete()
+
+
+class FlakyCollection(object):
+    """ Applies the bulk writes, then loses the connection. """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = 0
+
+    async def bulk_write(self, requests, **kwargs):
+        self.calls += 1
+        await self.collection.bulk_write(requests, **kwargs)
+        raise AutoReconnect('connection closed')
+
+
+async def test_counter_aggregator_not_doubled(user_cls, monkeypatch):
+    user = await user_cls(name='Counted once', age=0).save()
+    flaky = FlakyCollection(user_cls._get_collection())
+    monkeypatch.setattr(user_cls, '_get_collection',
+                        lambda alias=None: flaky)
+
+    counters = CounterAggregator(user_cls, interval_ms=60000)
+    counters.inc(user.id, age=1)
+    await counters.flush()
+    # The write may have been applied: it is not retried
+    assert counters.pending(user.id, 'age') == 0
+    await counters.close()
+    assert flaky.calls == 1
+    monkeypatch.undo()
+    assert (await user_cls.objects.get(id=user.id)).age == 1
+    await user.delete()
+
+
+async def test_counter_aggregator_retries(user_cls):
+    await user_cls.objects.insert(user_cls(name='Not a number', age=0))
+    collection = user_cls._get_collection()
+    await collection.update_one({'name': 'Not a number'},
+                                {'$set': {'age': 'old'}})
+    user = await user_cls.objects.as_pymongo().get(name='Not a number')
+
+    counters = CounterAggregator(user_cls, interval_ms=60000, max_retries=2)
+    counters.inc(user['_id'], age=1)
+    for retries in (1, 2):
+        await counters.flush()
+        # Rejected by the server, so not applied: retried
+        assert counters.pending(user['_id'], 'age') == 1
+        assert counters._retries[user['_id']] == retries
+    await counters.flush()
+    assert counters.pending(user['_id'], 'age') == 0
+    await counters.close()
+    await user_cls.objects.filter(name='Not a number').delete()
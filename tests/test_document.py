@@ -1,6 +1,9 @@
 import pytest
+from pymongo import ReturnDocument
+from aiomongoengine import Document
 from aiomongoengine import get_collection_list
 from aiomongoengine import get_collections
+from aiomongoengine.errors import PartlyLoadedDocumentError
 
 
 def test_get_collection_list(user_cls):
@@ -37,3 +40,67 @@ async def test_document_crud(user_cls):
 async def test_create_indexes(user_cls):
     ret = await user_cls.ensure_index()
     return 'name_1' in ret
+
+
+@pytest.mark.asyncio
+async def test_save_partly_loaded(user_cls):
+    user = await user_cls(name='Partly', age=22, like=['book']).save()
+
+    partly = await user_cls.objects.only('age', 'like').get(id=user.id)
+    assert partly.is_partly_loaded
+    partly.age = 23
+    partly.like.append('film')
+    await user_cls.objects.filter(id=user.id).update(name='Renamed')
+    await partly.save()
+    await user.reload()
+    assert (user.name, user.age, user.like) == ('Renamed', 23, ['book', 'film'])
+
+    partly = await user_cls.objects.exclude('like').get(id=user.id)
+    assert 'like' not in partly._loaded_fields
+    partly.like.append('music')
+    with pytest.raises(PartlyLoadedDocumentError):
+        await partly.save()
+    partly.like = ['music']
+    await partly.save()
+    await user.reload()
+    assert user.like == ['music']
+    await user.delete()
+
+
+@pytest.mark.asyncio
+async def test_save_partly_loaded_without_fields(user_cls):
+    user = await user_cls(name='Unknown fields', like=['book']).save()
+
+    # The loaded fields are unknown: they are all loaded
+    partly = user_cls.from_son(user.to_son(on_save=True),
+                               _is_partly_loaded=True)
+    partly.like.append('film')
+    await partly.save()
+    await user.reload()
+    assert user.like == ['book', 'film']
+    await user.delete()
+
+
+@pytest.mark.asyncio
+async def test_save_write_concern_and_return_document(user_cls):
+    user = await user_cls(name='Saved', age=1).save(write_concern={'w': 1})
+
+    user.age = 2
+    assert await user.save(write_concern={'w': 1, 'j': False}) is user
+    user.age = 3
+    before = await user.save(return_document=ReturnDocument.BEFORE)
+    assert (before.age, user.age) == (2, 3)
+    user.age = 4
+    after = await user.save(return_document=ReturnDocument.AFTER)
+    assert after.age == 4 and after.id == user.id
+    await user.delete()
+
+
+def test_meta_options():
+    class MetaOptions(Document):
+        meta = {'write_concern': {'w': 1}, 'replica_reload_interval': 5}
+
+    # Not overridden by the defaults of Document
+    assert MetaOptions._meta['write_concern'] == {'w': 1}
+    assert MetaOptions._meta['replica_reload_interval'] == 5
+    assert not MetaOptions._meta.get('replicated')
@@ -0,0 +1,70 @@
+import re
+
+import pytest
+
+from aiomongoengine.index_advisor import format_index_report
+from aiomongoengine.index_advisor import get_index_advisor
+from aiomongoengine.index_advisor import IndexAdvisor
+from aiomongoengine.index_advisor import query_shapes
+from aiomongoengine.index_advisor import QueryShape
+
+
+def test_query_shapes():
+    shape, = query_shapes(
+        {'order': 1, 'age': {'$gt': 20}, 'name': re.compile('^Li')},
+        ordering=[('order', 1), ('age', -1)],
+        projection={'name': 1, '_id': 0})
+    assert shape == QueryShape(equality=('order',), sort=(('age', -1),),
+                               range=('name',), projection=('name',))
+    assert shape.index_keys() == [('order', 1), ('age', -1), ('name', 1)]
+
+    shapes = query_shapes({'order': 1, '$or': [{'age': 1}, {'name': 'a'}]})
+    assert [s.equality for s in shapes] == [('age', 'order'),
+                                            ('name', 'order')]
+
+
+def test_shape_served_by():
+    shape, = query_shapes({'a': 1, 'b': {'$in': [1, 2]}, 'c': {'$lt': 3}},
+                          ordering=[('d', 1)])
+    assert shape.served_by([('b', 1), ('a', 1), ('d', 1), ('c', 1)])
+    assert shape.served_by([('a', 1), ('b', 1), ('d', -1), ('c', 1), ('e', 1)])
+    # range before sort: the results are sorted in memory
+    assert not shape.served_by([('a', 1), ('b', 1), ('c', 1), ('d', 1)])
+    assert not shape.served_by([('a', 1), ('d', 1)])
+    assert shape.uses([('a', 1), ('d', 1)])
+    assert shape.uses([('d', 1)])
+    assert not shape.uses([('e', 1), ('a', 1)])
+
+
+@pytest.mark.asyncio
+async def test_index_report(user_cls):
+    advisor = IndexAdvisor()
+    for _ in range(3):
+        advisor.record(user_cls, {'order': 1, 'age': {'$gte': 18}},
+                       [('name', 1)])
+    advisor.record(user_cls, {'_id': 1})
+
+    report, = await advisor.report([user_cls])
+    assert report['collection'] == user_cls.__collection__
+    shape, = report['shapes']
+    assert shape['count'] == 3
+    assert shape['keys'] == [('order', 1), ('name', 1), ('age', 1)]
+    assert shape['declared'] is None
+    # the unique index on name is a constraint, never reported as unused
+    assert report['unused'] == []
+    assert 'order_1_name_1_age_1' in format_index_report([report])
+
+
+@pytest.mark.asyncio
+async def test_queryset_records_shapes(user_cls, mock_users):
+    advisor = get_index_advisor()
+    advisor.start()
+    try:
+        await user_cls.objects.filter(age__gt=20).order_by('-order').all()
+        await user_cls.objects.filter(age__gt=20).count()
+    finally:
+        advisor.stop()
+    shapes = advisor.shapes(user_cls)
+    advisor.reset()
+    assert shapes[QueryShape((), (('order', -1),), ('age',), ())] == 1
+    assert shapes[QueryShape((), (), ('age',), ())] == 1
@@ -0,0 +1,55 @@
+import pytest
+from pymongo import IndexModel
+
+from aiomongoengine.indexes import diff_indexes
+from aiomongoengine.indexes import ensure_all_indexes
+from aiomongoengine.indexes import index_usage_report
+
+
+def test_diff_indexes():
+    declared = [
+        IndexModel([('name', 1)], unique=True, sparse=False),
+        IndexModel([('age', 1)], unique=True),
+        IndexModel([('order', 1), ('age', -1)]),
+        IndexModel([('bio', 'text')], name='bio_text'),
+    ]
+    existing = [
+        {'v': 2, 'key': {'_id': 1}, 'name': '_id_'},
+        {'v': 2, 'key': {'name': 1}, 'name': 'name_1', 'unique': True},
+        {'v': 2, 'key': {'age': 1}, 'name': 'age_1'},
+        {'v': 2, 'key': {'_fts': 'text', '_ftsx': 1}, 'name': 'bio_text',
+         'weights': {'bio': 1}, 'textIndexVersion': 3},
+        {'v': 2, 'key': {'like': 1}, 'name': 'like_1'},
+    ]
+    missing, mismatched, extra = diff_indexes(declared, existing)
+    assert [model.document['name'] for model in missing] == ['order_1_age_-1']
+    assert mismatched == [{'name': 'age_1', 'keys': [('age', 1)],
+                           'options': {'unique': (True, None)}}]
+    assert extra == ['like_1']
+
+
+@pytest.mark.asyncio
+async def test_ensure_all_indexes(user_cls):
+    report, = await ensure_all_indexes(documents=[user_cls])
+    assert report['collection'] == user_cls.__collection__
+    assert report['documents'] == [user_cls._class_name]
+    assert 'name_1' in await user_cls._get_collection().index_information()
+
+    report, = await ensure_all_indexes(documents=[user_cls], dry_run=True)
+    assert report['created'] == report['mismatched'] == []
+
+
+@pytest.mark.asyncio
+async def test_index_usage(user_cls, mock_users):
+    await ensure_all_indexes(documents=[user_cls])
+    await user_cls.objects.filter(name='Lisa Bruce').all()
+
+    usage = {index['name']: index for index in await user_cls.index_usage()}
+    assert usage['name_1']['declared'] and usage['name_1']['exists']
+    assert usage['name_1']['ops'] >= 1
+    assert not usage['name_1']['unused']
+    assert not usage['_id_']['declared']
+
+    report, = await index_usage_report(documents=[user_cls])
+    assert report['documents'] == [user_cls._class_name]
+    assert report['total_size'] == sum(i['size'] for i in report['indexes'])
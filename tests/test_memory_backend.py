@@ -0,0 +1,139 @@
+import pytest
+from pymongo import IndexModel
+from pymongo import ReturnDocument
+from pymongo import UpdateOne
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError
+from pymongo.errors import DuplicateKeyError
+from pymongo.errors import OperationFailure
+
+from aiomongoengine.backends.memory import MemoryClient
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def collection():
+    collection = MemoryClient()['test']['user']
+    await collection.insert_many([
+        {'_id': 1, 'name': 'Lisa', 'age': 10, 'like': ['swim', 'run']},
+        {'_id': 2, 'name': 'Michael', 'age': 14, 'like': ['swim']},
+        {'_id': 3, 'name': 'Jason', 'age': 32, 'like': []},
+        {'_id': 4, 'name': 'Stephanie', 'age': 44},
+    ])
+    return collection
+
+
+async def test_find(collection):
+    docs = await collection.find({'age': {'$gt': 12}}) \
+        .sort([('age', -1)]).skip(1).limit(1).to_list(None)
+    assert docs == [{'_id': 3, 'name': 'Jason', 'age': 32, 'like': []}]
+
+    docs = [doc async for doc in collection.find({'like': 'swim'},
+                                                 projection={'name': 1})]
+    assert docs == [{'_id': 1, 'name': 'Lisa'}, {'_id': 2, 'name': 'Michael'}]
+
+    assert await collection.count_documents({'like': {'$exists': False}}) == 1
+    assert await collection.find_one({'name': 'Nobody'}) is None
+
+
+async def test_find_returns_copies(collection):
+    doc = await collection.find_one({'_id': 1})
+    doc['like'].append('climb')
+    assert (await collection.find_one({'_id': 1}))['like'] == ['swim', 'run']
+
+
+async def test_update(collection):
+    result = await collection.update_many({'age': {'$lt': 20}},
+                                          {'$inc': {'age': 1},
+                                           '$push': {'like': 'climb'}})
+    assert (result.matched_count, result.modified_count) == (2, 2)
+    assert (await collection.find_one({'_id': 2}))['like'] == ['swim', 'climb']
+
+    await collection.update_one({'_id': 1, 'like': 'run'},
+                                {'$set': {'like.$': 'walk'}})
+    assert (await collection.find_one({'_id': 1}))['like'] == \
+        ['swim', 'walk', 'climb']
+
+    result = await collection.update_one({'name': 'Anna'},
+                                         {'$set': {'age': 5}}, upsert=True)
+    assert await collection.find_one({'_id': result.upserted_id},
+                                     projection={'_id': 0}) == \
+        {'name': 'Anna', 'age': 5}
+
+    doc = await collection.find_one_and_update(
+        {'_id': 4}, {'$unset': {'age': ''}},
+        return_document=ReturnDocument.AFTER)
+    assert doc == {'_id': 4, 'name': 'Stephanie'}
+
+
+async def test_delete(collection):
+    result = await collection.delete_many({'age': {'$gte': 14}})
+    assert result.deleted_count == 3
+    assert await collection.distinct('name') == ['Lisa']
+
+
+async def test_aggregate(collection):
+    docs = await collection.aggregate([
+        {'$unwind': '$like'},
+        {'$group': {'_id': '$like', 'count': {'$sum': 1},
+                    'age': {'$max': '$age'}}},
+        {'$sort': {'count': -1}},
+    ]).to_list(None)
+    assert docs == [{'_id': 'swim', 'count': 2, 'age': 14},
+                    {'_id': 'run', 'count': 1, 'age': 10}]
+
+
+async def test_unique_index(collection):
+    await collection.create_indexes([IndexModel('name', unique=True)])
+    with pytest.raises(DuplicateKeyError):
+        await collection.insert_one({'name': 'Lisa'})
+    with pytest.raises(DuplicateKeyError):
+        await collection.update_one({'_id': 2}, {'$set': {'name': 'Lisa'}})
+    with pytest.raises(BulkWriteError) as e:
+        await collection.bulk_write([
+            UpdateOne({'_id': 2}, {'$set': {'age': 15}}),
+            UpdateOne({'_id': 3}, {'$set': {'name': 'Lisa'}}),
+        ])
+    assert e.value.details['nModified'] == 1
+    assert e.value.details['writeErrors'][0]['code'] == 11000
+
+    names = [index['name'] async for index in collection.list_indexes()]
+    assert names == ['_id_', 'name_1']
+
+
+async def test_explain(collection):
+    await collection.create_index('age')
+    plan = (await collection.find({'age': 10}).explain())['queryPlanner']
+    assert plan['winningPlan']['inputStage']['stage'] == 'IXSCAN'
+
+    stats = (await collection.find({'name': 'Lisa'}).sort('name', 1)
+             .explain())['executionStats']
+    assert stats['executionStages']['stage'] == 'SORT'
+    assert stats['executionStages']['inputStage']['stage'] == 'COLLSCAN'
+    assert stats['totalDocsExamined'] == 4
+
+    # Like mongod, the operands of $and are planned
+    plan = (await collection.find({'$and': [{}, {'age': 10}]})
+            .explain())['queryPlanner']
+    assert plan['winningPlan']['inputStage']['stage'] == 'IXSCAN'
+    await collection.update_one({'$and': [{}, {'like': 'run'}]},
+                                {'$set': {'like.$': 'bike'}})
+    assert (await collection.find_one({'_id': 1}))['like'] == ['swim', 'bike']
+
+
+async def test_with_options(collection):
+    view = collection.with_options(write_concern=WriteConcern(w=2))
+    assert view.write_concern.document == {'w': 2}
+    assert collection.write_concern.document == {}
+    await view.insert_one({'_id': 5})
+    assert await collection.count_documents({}) == 5
+    with pytest.raises(TypeError):
+        collection.with_options(slave_okay=True)
+
+
+async def test_unsupported(collection):
+    with pytest.raises(OperationFailure):
+        collection.watch()
+    with pytest.raises(OperationFailure):
+        await collection.database.command('replSetGetStatus')
@@ -0,0 +1,61 @@
+import uuid
+from datetime import timedelta
+
+from pymongo import monitoring
+
+from aiomongoengine.monitoring import CommandMonitor
+from aiomongoengine.monitoring import Histogram
+
+
+def _command(monitor, name, command, reply=None, request_id=1,
+             duration=timedelta(milliseconds=1)):
+    monitor.started(monitoring.CommandStartedEvent(
+        command, 'test', request_id, ('localhost', 27017), 1))
+    if reply is None:
+        monitor.failed(monitoring.CommandFailedEvent(
+            duration, {'ok': 0, 'errmsg': 'boom'}, name, request_id,
+            ('localhost', 27017), 1))
+    else:
+        monitor.succeeded(monitoring.CommandSucceededEvent(
+            duration, reply, name, request_id, ('localhost', 27017), 1))
+
+
+def test_histogram():
+    histogram = Histogram((1, 2, 4))
+    for value in (0.5, 1, 1.5, 3, 10):
+        histogram.observe(value)
+    assert histogram.cumulative() == [2, 3, 4, 5]
+    assert histogram.sum == 16
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1) == 4
+
+
+def test_command_monitor(user_cls):
+    monitor = CommandMonitor()
+    collection = user_cls.__collection__
+    # Not the collection of a registered Document
+    other = f'other_{uuid.uuid4().hex}'
+    _command(monitor, 'find', {'find': collection, 'filter': {}},
+             {'ok': 1, 'cursor': {'firstBatch': [], 'id': 0}})
+    _command(monitor, 'find', {'find': collection, 'filter': {}},
+             request_id=2)
+    _command(monitor, 'getMore', {'getMore': 1, 'collection': other},
+             {'ok': 1}, request_id=3)
+    _command(monitor, 'ping', {'ping': 1}, {'ok': 1}, request_id=4)
+
+    ping, get_more, find = monitor.snapshot()
+    assert (find['document'], find['collection'], find['operation']) == \
+        (user_cls._class_name, collection, 'find')
+    assert (find['count'], find['errors']) == (2, 1)
+    assert find['latency_sum'] == 0.002
+    assert find['reply_bytes'] > 0
+    assert (get_more['document'], get_more['collection']) == ('', other)
+    assert ping['collection'] == ''
+
+    text = monitor.prometheus_text()
+    assert (f'aiomongoengine_command_errors_total{{document="{user_cls._class_name}",'
+            f'collection="{collection}",operation="find"}} 1') in text
+    assert 'aiomongoengine_command_duration_seconds_count' in text
+
+    monitor.reset()
+    assert monitor.snapshot() == []
@@ -0,0 +1,64 @@
+import re
+
+import pytest
+from aiomongoengine import Q
+from aiomongoengine import QNot
+from aiomongoengine.errors import InvalidQueryError
+from aiomongoengine.query_builder.predicate import compile_query
+
+DOCS = [
+    {'_id': 1, 'name': 'Lisa Bruce', 'age': 10, 'like': ['swim', 'run']},
+    {'_id': 2, 'name': 'Michael Adams', 'age': 14, 'like': ['swim']},
+    {'_id': 3, 'name': 'Jason Smith', 'age': 32, 'like': []},
+    {'_id': 4, 'name': 'Stephanie Flores', 'age': None},
+    {'_id': 5, 'name': 'Lisa Brown', 'address': {'city': 'Paris'}},
+]
+
+
+def match_ids(query):
+    match = compile_query(query)
+    return [doc['_id'] for doc in DOCS if match(doc)]
+
+
+@pytest.mark.parametrize(
+    "query,ids",
+    [
+        ({'age': 14}, [2]),
+        ({'age': {'$gt': 10}}, [2, 3]),
+        ({'age': {'$gte': 10, '$lt': 32}}, [1, 2]),
+        ({'age': {'$ne': 14}}, [1, 3, 4, 5]),
+        ({'age': None}, [4, 5]),
+        ({'age': {'$exists': True, '$ne': None}}, [1, 2, 3]),
+        ({'age': {'$in': [10, 32]}}, [1, 3]),
+        ({'age': {'$nin': [10, 32]}}, [2, 4, 5]),
+        ({'like': 'run'}, [1]),
+        ({'like': {'$all': ['swim', 'run']}}, [1]),
+        ({'like': {'$size': 0}}, [3]),
+        ({'name': {'$regex': re.compile('^lisa', re.I)}}, [1, 5]),
+        ({'name': {'$not': re.compile('Smith$')}}, [1, 2, 4, 5]),
+        ({'address.city': 'Paris'}, [5]),
+        ({'$or': [{'age': 10}, {'age': 32}]}, [1, 3]),
+        ({'$and': [{'like': 'swim'}, {'age': {'$gt': 10}}]}, [2]),
+        ({'$nor': [{'like': 'swim'}, {'age': None}]}, [3]),
+    ]
+)
+def test_compile_query(query, ids):
+    assert match_ids(query) == ids
+
+
+def test_unsupported_operator():
+    with pytest.raises(InvalidQueryError):
+        compile_query({'$where': 'this.age > 1'})
+
+
+def test_q_predicate(user_cls):
+    match = (Q(name__icontains='lisa') & Q(age__gt=10)).to_predicate(user_cls)
+    assert match(user_cls(name='Lisa Brown', age=38))
+    assert not match(user_cls(name='Lisa Bruce', age=10))
+    assert match({'name': 'Lisa Brown', 'age': 38})
+
+
+def test_q_not_predicate(user_cls):
+    match = QNot(Q(name='Jason Smith')).to_predicate(user_cls)
+    assert not match(user_cls(name='Jason Smith'))
+    assert match(user_cls(name='Lisa Brown'))
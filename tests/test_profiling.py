@@ -0,0 +1,67 @@
+import pytest
+
+from aiomongoengine.profiling import add_profile_sink
+from aiomongoengine.profiling import finish_profile
+from aiomongoengine.profiling import get_profiler
+from aiomongoengine.profiling import Profiler
+from aiomongoengine.profiling import QueryProfile
+from aiomongoengine.profiling import remove_profile_sink
+from aiomongoengine.profiling import start_profile
+
+
+def test_profile_marks():
+    profile = QueryProfile('user')
+    profile.mark('build')
+    profile.mark('network')
+    profile.mark('network')
+    assert profile.build > 0
+    assert profile.cursor == 0
+    assert profile.total == pytest.approx(
+        profile.build + profile.network + profile.decode)
+    assert profile.as_dict()['collection'] == 'user'
+
+
+def test_profiler_context():
+    assert start_profile('user') is None
+    assert start_profile('user', force=True) is not None
+
+    received = []
+    with Profiler(sink=received.append) as profiler:
+        assert get_profiler() is profiler
+        profile = start_profile('user')
+        profile.documents = 3
+        finish_profile(profile)
+    assert get_profiler() is None
+
+    assert profiler.profiles == received == [profile]
+    assert profiler.totals()['queries'] == 1
+    assert profiler.totals()['documents'] == 3
+
+
+def test_global_sink():
+    def failing_sink(profile):
+        raise ValueError()
+
+    received = []
+    add_profile_sink(failing_sink)
+    add_profile_sink(received.append)
+    try:
+        profile = start_profile('user')
+        finish_profile(profile)
+    finally:
+        remove_profile_sink(failing_sink)
+        remove_profile_sink(received.append)
+    assert received == [profile]
+    assert start_profile('user') is None
+
+
+@pytest.mark.asyncio
+async def test_queryset_profile(user_cls, mock_users):
+    received = []
+    queryset = user_cls.objects.filter(age__gt=20).profile(received.append)
+    docs = await queryset.all()
+    profile = queryset.last_profile
+    assert received == [profile]
+    assert profile.documents == len(docs)
+    assert profile.source == 'database'
+    assert profile.network > 0
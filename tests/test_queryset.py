@@ -1,6 +1,9 @@
 import pytest
 from bson import ObjectId
 
+from aiomongoengine.errors import BulkWriteError
+from aiomongoengine.queryset.base import IN_CHUNK_SIZE
+
 pytestmark = pytest.mark.asyncio
 
 
@@ -36,3 +39,80 @@ async def test_filter_exclude_fields(user_cls):
     assert isinstance(u.like, list)
     assert not u.id
     assert not u.name
+
+
+async def test_upsert_many(user_cls, mock_users):
+    docs = [user_cls(name=f'Upsert {i}', age=i) for i in range(3)]
+    docs.append(user_cls(name='Lisa Bruce', age=10, order=1,
+                         like=['swim', 'run']))
+    results = await user_cls.objects.upsert_many(docs, key='name',
+                                                 batch_size=2)
+    assert [r['upserted'] for r in results] == [2, 1]
+    assert [r['matched'] for r in results] == [0, 1]
+    assert [r['modified'] for r in results] == [0, 0]
+    assert docs[2].id == results[1]['upserted_ids'][2]
+    assert docs[3].id is None
+
+    docs[0].age = 42
+    result, = await user_cls.objects.upsert_many(docs[:3], key=('name',))
+    assert (result['matched'], result['modified'], result['upserted']) == \
+        (3, 1, 0)
+    assert (await user_cls.objects.get(name='Upsert 0')).age == 42
+    await user_cls.objects.filter(name__startswith='Upsert').delete()
+
+
+async def test_upsert_many_missing_fields(user_cls, mock_users):
+    user = await user_cls(name='Catalogue', age=30, order=5).save()
+    # A row without an age nor an order
+    row = user_cls(name='Catalogue', like=['swim'])
+    result, = await user_cls.objects.upsert_many([row], key='name')
+    assert (result['matched'], result['modified']) == (1, 1)
+    stored = await user_cls.objects.get(id=user.id)
+    assert (stored.age, stored.order, stored.like) == (30, 5, ['swim'])
+
+    new = user_cls(name='Catalogue new')
+    result, = await user_cls.objects.upsert_many([new], key='name')
+    assert result['upserted'] == 1
+    raw = await user_cls.objects.as_pymongo().get(id=new.id)
+    assert raw['age'] is None
+    await user_cls.objects.filter(name__startswith='Catalogue').delete()
+
+
+async def test_upsert_many_partial(user_cls, mock_users):
+    await user_cls.ensure_index()
+    docs = [user_cls(name=f'Partial {i}', age=1000 + i) for i in range(3)]
+    # A new age, with the unique name of another user
+    docs.append(user_cls(name='Lisa Bruce', age=1003))
+    with pytest.raises(BulkWriteError) as info:
+        await user_cls.objects.upsert_many(docs, key='age', batch_size=3)
+    assert [r['upserted'] for r in info.value.results] == [3, 0]
+    assert docs[2].id == info.value.results[0]['upserted_ids'][2]
+    assert await user_cls.objects.filter(name__startswith='Partial').count() == 3
+    await user_cls.objects.filter(name__startswith='Partial').delete()
+
+
+async def test_delete_window(user_cls, mock_users):
+    await user_cls.objects.insert(
+        [user_cls(name=f'Purge {i}', age=i) for i in range(5)])
+    purge = user_cls.objects.filter(name__startswith='Purge')
+    assert await purge.order_by('age').skip(1).limit(3).delete(
+        chunk_size=2) == 3
+    assert [user.age for user in await purge.order_by('age').all()] == [0, 4]
+    assert await purge.delete() == 2
+
+
+async def test_filter_id_in_chunks(user_cls, mock_users):
+    ids = [user.id for user in mock_users]
+    # Ids matching nothing, so the list needs two chunks
+    padding = [ObjectId() for _ in range(IN_CHUNK_SIZE)]
+    users = user_cls.objects.filter(id__in=padding + ids)
+    assert len(users._split_in_query()) == 2
+    assert sorted(user.id for user in await users.all()) == sorted(ids)
+
+
+async def test_count_id_in_chunks(user_cls, mock_users):
+    ids = [user.id for user in mock_users]
+    padding = [ObjectId() for _ in range(IN_CHUNK_SIZE)]
+    users = user_cls.objects.filter(id__in=ids + padding, age__gte=30)
+    assert len(users._split_in_query()) == 2
+    assert await users.count() == 4
@@ -0,0 +1,74 @@
+import uuid
+
+import pytest
+
+from aiomongoengine import Document
+from aiomongoengine import fields
+from aiomongoengine import replication
+from aiomongoengine import start_replication
+from aiomongoengine import stop_replication
+
+pytestmark = pytest.mark.asyncio
+
+
+class Price(Document):
+    name = fields.StringField()
+    price = fields.IntField()
+    meta = {'replicated': True,
+            'collection': f'price_{uuid.uuid4().hex[:8]}'}
+
+
+@pytest.fixture
+async def prices():
+    await Price.drop_collection()
+    await Price.objects.insert([Price(name='apple', price=3),
+                                Price(name='pear', price=4)])
+    await start_replication()
+    yield replication._replicas[Price]
+    await stop_replication()
+    await Price.drop_collection()
+
+
+async def test_replica_hit(prices):
+    queryset = Price.objects.profile().filter(price__gte=4)
+    assert [price.name for price in await queryset.all()] == ['pear']
+    assert queryset.last_profile.source == 'replica'
+
+
+async def test_replica_miss(prices):
+    # Hints need the server
+    queryset = Price.objects.profile().hint([('_id', 1)]).filter(name='pear')
+    assert [price.price for price in await queryset.all()] == [4]
+    assert queryset.last_profile.source == 'database'
+
+
+async def test_replica_read_after_write(prices):
+    apple = await Price.objects.get(name='apple')
+    apple.price = 5
+    await apple.save()
+    assert prices.stale
+    queryset = Price.objects.profile().filter(name='apple')
+    assert (await queryset.get()).price == 5
+    assert queryset.last_profile.source == 'database'
+
+    await Price.objects.filter(name='pear').update(set__price=6)
+    assert (await Price.objects.get(name='pear')).price == 6
+    await Price.objects.insert(Price(name='plum', price=7))
+    assert await Price.objects.filter(price__gte=5).count() == 3
+    await Price.objects.filter(name='plum').delete()
+    assert [price.name for price in await Price.objects.all()] == [
+        'apple', 'pear']
+
+    # Reloaded, the replica answers again with the writes
+    await prices.load()
+    assert not prices.stale
+    queryset = Price.objects.profile().filter(price__gte=5)
+    assert [price.price for price in await queryset.all()] == [5, 6]
+    assert queryset.last_profile.source == 'replica'
+
+
+async def test_replica_stop_reloading(prices):
+    await Price(name='fig', price=1).save()
+    reload_task = prices._reload_task
+    await prices.stop()
+    assert reload_task.done()
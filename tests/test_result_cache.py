@@ -0,0 +1,107 @@
+import time
+
+import pytest
+from pymongo.collation import Collation
+
+from aiomongoengine.errors import NotUniqueError
+from aiomongoengine.queryset.cache import ResultCache
+from aiomongoengine.queryset.cache import get_result_cache
+
+
+def test_get_set():
+    cache = ResultCache()
+    key = ResultCache.make_key('test.user', {'age': {'$gt': 10}})
+    assert cache.get(key) is None
+
+    cache.set(key, 'user', [{'_id': 1, 'tags': ['a']}], ttl=60)
+    docs = cache.get(key)
+    assert docs == [{'_id': 1, 'tags': ['a']}]
+
+    # Every hit returns fresh documents
+    docs[0]['tags'].append('b')
+    assert cache.get(key) == [{'_id': 1, 'tags': ['a']}]
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_key():
+    key = ResultCache.make_key('test.user', {'a': 1, 'b': 2}, None, [('a', 1)])
+    assert key == ResultCache.make_key('test.user', {'b': 2, 'a': 1}, None, [('a', 1)])
+    assert key != ResultCache.make_key('test.user', {'a': 1, 'b': 2}, None, [('a', -1)])
+    assert key != ResultCache.make_key('test.user', {'a': 1, 'b': 2}, None, [('a', 1)], limit=1)
+    assert key != ResultCache.make_key('test.user', {'a': 1, 'b': 2}, None, [('a', 1)],
+                                       collation=Collation('en', strength=2))
+    assert key != ResultCache.make_key('test.user', {'a': 1, 'b': 2}, None, [('a', 1)],
+                                       hint=[('a', 1)])
+
+
+def test_ttl():
+    cache = ResultCache()
+    cache.set('key', 'user', [{'_id': 1}], ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.set('a', 'user', [{'_id': 1}], ttl=60)
+    cache.set('b', 'user', [{'_id': 2}], ttl=60)
+    cache.get('a')
+    cache.set('c', 'user', [{'_id': 3}], ttl=60)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.evictions == 1
+
+
+def test_byte_limit():
+    cache = ResultCache(max_bytes=100)
+    cache.set('a', 'user', [{'_id': 1, 'name': 'x' * 60}], ttl=60)
+    cache.set('b', 'user', [{'_id': 2, 'name': 'y' * 60}], ttl=60)
+    assert cache.get('a') is None
+    assert cache.get('b') is not None
+    assert cache.bytes <= 100
+
+    cache.set('c', 'user', [{'_id': 3, 'name': 'z' * 200}], ttl=60)
+    assert cache.get('c') is None
+
+
+def test_invalidate():
+    cache = ResultCache()
+    cache.set('a', 'user', [{'_id': 1}], ttl=60)
+    cache.set('b', 'role', [{'_id': 2}], ttl=60)
+    cache.invalidate('user')
+    assert cache.get('a') is None
+    assert cache.get('b') is not None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_invalidate_document():
+    cache = ResultCache()
+    cache.set('adults', 'user', [{'_id': 1, 'age': 30}], ttl=60,
+              query={'age': {'$gte': 18}})
+    cache.set('children', 'user', [{'_id': 2, 'age': 10}], ttl=60,
+              query={'age': {'$lt': 18}})
+    cache.set('page', 'user', [{'_id': 1, 'age': 30}], ttl=60)
+
+    # A new child doesn't change the adults
+    cache.invalidate_document('user', {'_id': 3, 'age': 12})
+    assert cache.get('adults') is not None
+    assert cache.get('children') is None
+    assert cache.get('page') is None
+
+    # A cached adult becoming a child
+    cache.invalidate_document('user', {'_id': 1, 'age': 12})
+    assert cache.get('adults') is None
+
+
+@pytest.mark.asyncio
+async def test_failed_insert_invalidates(user_cls, mock_users):
+    await user_cls.ensure_index()
+    cache = get_result_cache()
+    await user_cls.objects.cached(60).filter(age__gte=30).all()
+    invalidations = cache.invalidations
+
+    with pytest.raises(NotUniqueError):
+        await user_cls.objects.insert(user_cls(name=mock_users[0].name))
+    assert cache.invalidations == invalidations + 1
@@ -0,0 +1,86 @@
+import pytest
+
+from aiomongoengine.backends import MemoryClient
+from aiomongoengine.explain import summarize_explain
+from aiomongoengine.slow_query import flush_slow_queries
+from aiomongoengine.slow_query import is_slow_query
+from aiomongoengine.slow_query import record_slow_query
+from aiomongoengine.slow_query import set_slow_query_threshold
+from aiomongoengine.utils import query_shape
+
+
+def test_query_shape():
+    assert query_shape({'age': {'$gt': 18}, 'name': 'bob'}) == \
+        {'age': {'$gt': 1}, 'name': 1}
+    assert query_shape({'$or': [{'a': 1}, {'b': {'$in': [1, 2]}}]}) == \
+        {'$or': [{'a': 1}, {'b': {'$in': 1}}]}
+
+
+def test_summarize_sharded_explain():
+    explain = {
+        'queryPlanner': {'winningPlan': {
+            'stage': 'SINGLE_SHARD',
+            'shards': [{'winningPlan': {
+                'stage': 'FETCH',
+                'inputStage': {'stage': 'IXSCAN', 'indexName': 'age_1'},
+            }}],
+        }},
+        'executionStats': {'nReturned': 2, 'totalKeysExamined': 2,
+                           'totalDocsExamined': 2},
+    }
+    summary = summarize_explain(explain)
+    assert summary['stages'] == ['SINGLE_SHARD', 'FETCH', 'IXSCAN']
+    assert summary['indexes'] == ['age_1']
+    assert not summary['collscan']
+    assert summary['returned'] == 2
+
+
+@pytest.mark.asyncio
+async def test_summarize_memory_explain():
+    collection = MemoryClient()['test']['slow']
+    await collection.insert_many([{'_id': i, 'name': str(i)} for i in range(5)])
+    summary = summarize_explain(
+        await collection.find({'name': '3'}).sort('name').explain())
+    assert summary['collscan']
+    assert summary['in_memory_sort']
+    assert summary['docs_examined'] == 5
+    assert summary['returned'] == 1
+
+
+@pytest.mark.asyncio
+async def test_record_slow_query():
+    async def explain():
+        return {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}},
+                'executionStats': {'nReturned': 1, 'totalDocsExamined': 10}}
+
+    received = []
+    set_slow_query_threshold(0.1, sink=received.append)
+    try:
+        assert not is_slow_query(0.05)
+        assert is_slow_query(0.2)
+        record_slow_query('User', 'user', 'find', 0.2, {'age': 18}, explain)
+        await flush_slow_queries()
+    finally:
+        set_slow_query_threshold(None)
+    assert not is_slow_query(0.2)
+
+    record, = received
+    assert record['shape'] == {'age': 1}
+    assert record['explain']['collscan']
+    assert record['explain']['docs_examined'] == 10
+    assert record['error'] is None
+    assert any(__file__ in line for line in record['stack'])
+
+
+@pytest.mark.asyncio
+async def test_queryset_slow_query(user_cls, mock_users):
+    received = []
+    set_slow_query_threshold(0, sink=received.append)
+    try:
+        await user_cls.objects.filter(age__gt=20).all()
+        await user_cls.objects.filter(age__gt=20).count()
+        await flush_slow_queries()
+    finally:
+        set_slow_query_threshold(None)
+    assert [r['operation'] for r in received] == ['find', 'count']
+    assert all(r['explain'] is not None for r in received)
@@ -0,0 +1,68 @@
+import pytest
+
+from aiomongoengine.errors import InvalidQueryError
+from aiomongoengine.query_builder.transform import transform_update
+
+
+def test_transform_update(user_cls):
+    assert transform_update(user_cls, name='a', inc__age=1, dec__order=2) == \
+        {'$set': {'name': 'a'}, '$inc': {'age': 1, 'order': -2}}
+    assert transform_update(user_cls, unset__name=True, mul__age=2,
+                            set_on_insert__order=0,
+                            current_date__ts='timestamp') == {
+        '$unset': {'name': ''}, '$mul': {'age': 2},
+        '$setOnInsert': {'order': 0},
+        '$currentDate': {'ts': {'$type': 'timestamp'}}}
+    assert transform_update(
+        user_cls, push__like={'$each': ['a', 'b'], '$slice': -5},
+        add_to_set__tags=['c', 'd'], pull_all__seen=[1]) == {
+        '$push': {'like': {'$each': ['a', 'b'], '$slice': -5}},
+        '$addToSet': {'tags': {'$each': ['c', 'd']}},
+        '$pullAll': {'seen': [1]}}
+    assert transform_update(user_cls, push__like__0='first') == \
+        {'$push': {'like': {'$each': ['first'], '$position': 0}}}
+    assert transform_update(user_cls, pull__scores__lt=50) == \
+        {'$pull': {'scores': {'$lt': 50}}}
+    assert transform_update(user_cls, set__like__S='run', **{
+        'set__items__$[item]__qty': 0, 'inc__items__$[]__seen': 1}) == {
+        '$set': {'like.$': 'run', 'items.$[item].qty': 0},
+        '$inc': {'items.$[].seen': 1}}
+    pipeline = [{'$set': {'age': {'$add': ['$age', 1]}}}]
+    assert transform_update(user_cls, __raw__=pipeline) == pipeline
+
+    # Only pull reads a query operator, the others update embedded fields
+    assert transform_update(user_cls, set__meta__type='x',
+                            inc__stats__size=1, unset__meta__exists=True) == {
+        '$set': {'meta.type': 'x'}, '$inc': {'stats.size': 1},
+        '$unset': {'meta.exists': ''}}
+    with pytest.raises(InvalidQueryError):
+        transform_update(user_cls, __raw__=pipeline, name='a')
+
+
+@pytest.mark.asyncio
+async def test_update_operators(user_cls, mock_users):
+    user = user_cls(name='Operators', age=10, like=['swim', 'run', 'read'])
+    await user.save()
+    users = user_cls.objects.filter(id=user.id)
+
+    await users.update(push__like={'$each': ['climb', 'bike'], '$slice': -4},
+                       inc__age=5, max__order=3)
+    user = await users.get()
+    assert user.like == ['run', 'read', 'climb', 'bike']
+    assert (user.age, user.order) == (15, 3)
+
+    await users.update(pull__like='read', min__age=12)
+    await users.update(pop__like=-1)
+    user = await users.get()
+    assert user.like == ['climb', 'bike']
+    assert user.age == 12
+
+    await user_cls.objects.filter(id=user.id, like='bike').update(
+        set__like__S='ride')
+    await users.update(**{'set__like__$[item]': 'hike'},
+                       array_filters=[{'item': 'climb'}])
+    assert (await users.get()).like == ['hike', 'ride']
+
+    await users.update(__raw__=[{'$set': {'age': {'$multiply': ['$age', 2]}}}])
+    assert (await users.get()).age == 24
+    await users.delete()